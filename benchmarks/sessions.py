@@ -0,0 +1,209 @@
+"""Compares the NETCONF session engines, how many sessions one process keeps open and how much CPU time
+every session costs with ncclient (a transport thread per session) and asyncio (one event loop)
+
+A mock NETCONF server (asyncssh) runs in a separate process so only the client side is measured. Every
+session is established, sends one <get-config> and is kept open until all sessions are established.
+
+    python benchmarks/sessions.py --sessions 500 --concurrency 100
+"""
+
+import asyncio
+import json
+import multiprocessing
+import resource
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import click
+
+from netconf_tool.aio import (
+    BASE_1_0,
+    BASE_1_1,
+    NETCONF_BASE_NS,
+    FrameDecoder,
+    frame,
+    root_element,
+    session_connect,
+)
+
+DATA = "".join(
+    f"<interface><name>eth{i}</name><description>Interface {i}</description><enabled>true</enabled></interface>"
+    for i in range(50)
+)
+
+
+def serve(port: int, ready) -> None:
+    import asyncssh
+
+    class MockNetconfSession(asyncssh.SSHServerSession):
+        session_ids = iter(range(1, 1 << 31))
+
+        def connection_made(self, channel):
+            self.channel = channel
+            self.decoder = FrameDecoder()
+            self.hello = False
+
+        def subsystem_requested(self, subsystem):
+            return subsystem == "netconf"
+
+        def session_started(self):
+            capabilities = "".join(
+                f"<capability>{capability}</capability>"
+                for capability in (BASE_1_0, BASE_1_1)
+            )
+            self.channel.write(
+                frame(
+                    f'<hello xmlns="{NETCONF_BASE_NS}"><capabilities>{capabilities}</capabilities><session-id>{next(self.session_ids)}</session-id></hello>',
+                    chunked=False,
+                )
+            )
+
+        def data_received(self, data, datatype):
+            self.decoder.feed(data)
+            while True:
+                message = self.decoder.next_message()
+                if message is None:
+                    return
+                if not self.hello:
+                    self.hello = True
+                    self.decoder.chunked = BASE_1_1 in message
+                    continue
+
+                _, attrs = root_element(message)
+                # ncclient prefixes the operations (nc:get-config)
+                if "close-session" not in message and "get" in message:
+                    body = f'<data xmlns="{NETCONF_BASE_NS}"><interfaces xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces">{DATA}</interfaces></data>'
+                else:
+                    body = "<ok/>"
+                self.channel.write(
+                    frame(
+                        f'<rpc-reply xmlns="{NETCONF_BASE_NS}" message-id="{attrs.get("message-id")}">{body}</rpc-reply>',
+                        chunked=self.decoder.chunked,
+                    )
+                )
+                if "close-session" in message:
+                    self.channel.exit(0)
+
+    class MockNetconfServer(asyncssh.SSHServer):
+        def begin_auth(self, username):
+            return True
+
+        def password_auth_supported(self):
+            return True
+
+        def validate_password(self, username, password):
+            return True
+
+        def session_requested(self):
+            return MockNetconfSession()
+
+    async def _main():
+        await asyncssh.create_server(
+            MockNetconfServer,
+            "127.0.0.1",
+            port,
+            server_host_keys=[asyncssh.generate_private_key("ssh-ed25519")],
+            encoding=None,
+            line_editor=False,
+            backlog=4096,
+        )
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(_main())
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run(engine: str, port: int, sessions: int, concurrency: int) -> dict:
+    connect = session_connect(engine)
+    options = {
+        "host": "127.0.0.1",
+        "port": port,
+        "username": "bench",
+        "password": "bench",
+        "hostkey_verify": False,
+        "timeout": 60,
+    }
+    if engine == "ncclient":
+        options.update({"allow_agent": False, "look_for_keys": False})
+
+    def _session():
+        m = connect(**options)
+        m.get_config(source="running")
+        return m
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        managers = list(executor.map(lambda _: _session(), range(sessions)))
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    threads = threading.active_count()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(lambda m: m.close_session(), managers))
+
+    return {
+        "engine": engine,
+        "sessions": sessions,
+        "seconds": round(elapsed, 3),
+        "cpu_seconds": round(cpu, 3),
+        "sessions_per_cpu_second": round(sessions / cpu, 1),
+        "threads": threads,
+        "max_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+@click.command()
+@click.option("--sessions", help="Sessions held open per engine", type=int, default=200)
+@click.option(
+    "--concurrency", help="Sessions established concurrently", type=int, default=50
+)
+@click.option(
+    "--engine",
+    "engines",
+    help="Engines to benchmark",
+    type=click.Choice(["ncclient", "asyncio"]),
+    multiple=True,
+    default=["ncclient", "asyncio"],
+)
+@click.option("--json", "as_json", help="Print the results as JSON", is_flag=True)
+def main(sessions: int, concurrency: int, engines: tuple, as_json: bool):
+    port = free_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=serve, args=(port, ready), daemon=True)
+    server.start()
+    ready.wait(30)
+
+    # Every engine runs in its own process so the thread and memory counts are not shared
+    results = []
+    try:
+        with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+            for engine in engines:
+                results.append(pool.apply(run, (engine, port, sessions, concurrency)))
+    finally:
+        server.terminate()
+
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+        return
+
+    click.echo(
+        f"{'ENGINE':<10} {'SESSIONS':>8} {'SECONDS':>8} {'CPU':>8} {'SESSIONS/CPU-S':>15} {'THREADS':>8} {'MAX RSS':>9}"
+    )
+    for result in results:
+        click.echo(
+            f"{result['engine']:<10} {result['sessions']:>8} {result['seconds']:>7.2f}s {result['cpu_seconds']:>7.2f}s {result['sessions_per_cpu_second']:>15.1f} {result['threads']:>8} {result['max_rss_mb']:>7.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
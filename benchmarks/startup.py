@@ -0,0 +1,89 @@
+"""Measures the startup time of netconf-tool and guards against startup regressions
+
+Every scenario is run in a fresh interpreter, the script exits with a non zero status when the median
+startup time of a scenario exceeds --max-ms or when a scenario imports a module it should not.
+
+    python benchmarks/startup.py --runs 20 --max-ms 250
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+import time
+import click
+
+# Arguments, modules which must not be imported
+SCENARIOS = {
+    "--help": (["--help"], ["ncclient", "paramiko", "pika", "redis", "xmltodict"]),
+    "operations --help": (
+        ["operations", "--help"],
+        ["ncclient", "paramiko", "pika", "redis", "xmltodict"],
+    ),
+    "subscription local --help": (
+        ["subscription", "local", "--help"],
+        ["pika", "redis"],
+    ),
+    "subscription redis-pubsub --help": (
+        ["subscription", "redis-pubsub", "--help"],
+        ["pika"],
+    ),
+}
+
+RUNNER = """
+import sys
+sys.argv = ["netconf-tool"] + sys.argv[1:]
+from netconf_tool.cli import cli
+try:
+    cli()
+except SystemExit:
+    pass
+sys.stderr.write("\\n" + __import__("json").dumps(sorted(sys.modules)))
+"""
+
+
+def run(args: list) -> tuple:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", RUNNER] + args, capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - started
+    modules = json.loads(result.stderr.strip().splitlines()[-1])
+    return elapsed, modules
+
+
+@click.command()
+@click.option("--runs", help="Runs per scenario", type=int, default=10)
+@click.option(
+    "--max-ms",
+    help="Fail when the median startup time of a scenario exceeds this (0 to disable)",
+    type=float,
+    default=0,
+)
+def main(runs: int, max_ms: float):
+    failed = False
+    click.echo(f"{'SCENARIO':<36} {'MIN':>9} {'MEDIAN':>9}  RESULT")
+    for name, (args, forbidden) in SCENARIOS.items():
+        timings = []
+        for _ in range(runs):
+            elapsed, modules = run(args)
+            timings.append(elapsed * 1000)
+
+        imported = [module for module in forbidden if module in modules]
+        median = statistics.median(timings)
+        errors = []
+        if imported:
+            errors.append(f"imported {', '.join(imported)}")
+        if max_ms and median > max_ms:
+            errors.append(f"median above {max_ms:.0f}ms")
+        failed = failed or bool(errors)
+
+        click.echo(
+            f"{name:<36} {min(timings):>7.1f}ms {median:>7.1f}ms  {'; '.join(errors) or 'ok'}"
+        )
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,635 @@
+import asyncio
+import concurrent.futures
+import importlib
+import itertools
+import re
+import threading
+import time
+from typing import Callable, List, Optional
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape, quoteattr
+
+from loguru import logger
+from ncclient import manager
+from ncclient.operations import RPCError
+from ncclient.operations.errors import TimeoutExpiredError
+from ncclient.transport.errors import (
+    AuthenticationError,
+    NetconfFramingError,
+    SSHError,
+    TransportError,
+)
+from ncclient.xml_ import qualify, to_ele, to_xml
+
+from netconf_tool import timings
+
+ENGINES = ["ncclient", "asyncio"]
+NETCONF_BASE_NS = "urn:ietf:params:xml:ns:netconf:base:1.0"
+NETCONF_NOTIFICATION_NS = "urn:ietf:params:xml:ns:netconf:notification:1.0"
+NETCONF_MONITORING_NS = "urn:ietf:params:xml:ns:yang:ietf-netconf-monitoring"
+BASE_1_0 = "urn:ietf:params:netconf:base:1.0"
+BASE_1_1 = "urn:ietf:params:netconf:base:1.1"
+CLIENT_CAPABILITIES = [
+    BASE_1_0,
+    BASE_1_1,
+    "urn:ietf:params:netconf:capability:notification:1.0",
+    "urn:ietf:params:netconf:capability:interleave:1.0",
+]
+END_OF_MESSAGE = b"]]>]]>"
+# chunk-size is at most 4294967295 (RFC 6242 4.2)
+MAX_CHUNK_HEADER = len(b"\n#4294967295\n")
+RPC_TIMEOUT = 30
+
+_START_TAG_PATTERN = re.compile(r"<(?![?!])([^\s/>]+)([^>]*)>")
+_ATTRIBUTE_PATTERN = re.compile(r"""([\w:.-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+
+
+def frame(message: str, chunked: bool) -> bytes:
+    """Frames a NETCONF message with chunked framing (RFC 6242 4.2) or the end-of-message marker (4.3)"""
+    data = message.encode()
+    if chunked:
+        return b"\n#%d\n%s\n##\n" % (len(data), data)
+    return data + END_OF_MESSAGE
+
+
+class FrameDecoder:
+    """Splits the bytes received on a NETCONF session into messages
+
+    Messages use the end-of-message framing until the hello exchange sets chunked, so the bytes
+    are fed first and messages are then taken one by one with next_message().
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.chunks = bytearray()
+        self.chunked = False
+        # Position the end-of-message marker search continues from
+        self._searched = 0
+
+    def feed(self, data: bytes) -> None:
+        self.buffer += data
+
+    def next_message(self) -> Optional[str]:
+        """Returns the next complete message, None when more bytes are needed
+
+        Raises:
+            NetconfFramingError: Invalid chunk header
+        """
+        if not self.chunked:
+            end = self.buffer.find(END_OF_MESSAGE, self._searched)
+            if end < 0:
+                self._searched = max(len(self.buffer) - len(END_OF_MESSAGE) + 1, 0)
+                return None
+            message = self.buffer[:end].decode()
+            del self.buffer[: end + len(END_OF_MESSAGE)]
+            self._searched = 0
+            return message
+
+        buffer = self.buffer
+        while len(buffer) >= 4:
+            if buffer.startswith(b"\n##\n"):
+                del buffer[:4]
+                message = self.chunks.decode()
+                self.chunks = bytearray()
+                return message
+            if not buffer.startswith(b"\n#"):
+                raise NetconfFramingError(f"Invalid chunk header {bytes(buffer[:16])}")
+            newline = buffer.find(b"\n", 2, MAX_CHUNK_HEADER)
+            if newline < 0:
+                if len(buffer) >= MAX_CHUNK_HEADER:
+                    raise NetconfFramingError(
+                        f"Invalid chunk header {bytes(buffer[:16])}"
+                    )
+                return None
+            size = buffer[2:newline]
+            if not size.isdigit() or size.startswith(b"0"):
+                raise NetconfFramingError(f"Invalid chunk size {bytes(size)}")
+            end = newline + 1 + int(size)
+            if len(buffer) < end:
+                return None
+            self.chunks += buffer[newline + 1 : end]
+            del buffer[:end]
+        return None
+
+
+def root_element(message: str) -> tuple:
+    """Returns the qualified tag ({namespace}name) and attributes of the root element of a message
+    without parsing the whole message"""
+    match = _START_TAG_PATTERN.search(message)
+    if match is None:
+        return None, {}
+    name, attributes = match.groups()
+    attrs = {
+        key: a if a is not None else b
+        for key, a, b in _ATTRIBUTE_PATTERN.findall(attributes)
+    }
+    prefix, _, local_name = name.rpartition(":")
+    namespace = attrs.get(f"xmlns:{prefix}" if prefix else "xmlns")
+    return (f"{{{namespace}}}{local_name}" if namespace else local_name), attrs
+
+
+def filter_xml(filter) -> str:
+    """Returns the <filter/> element of a subtree filter (XML string) or a (type, criteria) tuple like ncclient"""
+    if filter is None:
+        return ""
+    filter_type, criteria = filter if isinstance(filter, tuple) else ("subtree", filter)
+    if filter_type == "xpath":
+        return f'<filter xmlns="{NETCONF_BASE_NS}" type="xpath" select={quoteattr(criteria)}/>'
+    return f'<filter xmlns="{NETCONF_BASE_NS}" type="subtree">{criteria}</filter>'
+
+
+class RPCReply:
+    """Reply of an RPC sent on an AsyncSession, the reply is only parsed when the data is used
+
+    Args:
+        xml:    <rpc-reply/> as received
+    """
+
+    def __init__(self, xml: str):
+        self.xml = xml
+        self._root = None
+
+    @property
+    def root(self):
+        if self._root is None:
+            self._root = to_ele(self.xml, huge_tree=True)
+        return self._root
+
+    @property
+    def ok(self) -> bool:
+        return self.root.find(qualify("ok")) is not None
+
+    @property
+    def data_ele(self):
+        return self.root.find(qualify("data"))
+
+    @property
+    def data_xml(self) -> str:
+        return to_xml(self.data_ele)
+
+    @property
+    def data(self):
+        return self.data_ele
+
+    def raise_for_error(self) -> None:
+        if "rpc-error" not in self.xml:
+            return
+        errors = self.root.findall(qualify("rpc-error"))
+        if errors:
+            raise RPCError(errors[0], errs=[RPCError(error) for error in errors])
+
+
+class SchemaReply(RPCReply):
+    """Reply of <get-schema/>, data is the schema text like ncclient"""
+
+    @property
+    def data_ele(self):
+        # RFC 6022 qualifies <data> with the monitoring namespace
+        return self.root.find(qualify("data", NETCONF_MONITORING_NS))
+
+    @property
+    def data(self) -> str:
+        return self.data_ele.text
+
+
+class AsyncSession:
+    """NETCONF session over an asyncssh channel, all sessions share one event loop instead of running a
+    transport thread per session
+
+    RPCs are matched to replies by message-id so several RPCs can be in flight, notifications are passed to
+    the listeners (ncclient SessionListener interface) from the event loop.
+
+    Args:
+        host:           NETCONF Server
+        port:           Port of the NETCONF Server
+        rpc_timeout:    Seconds to wait for an RPC reply
+    """
+
+    def __init__(self, host: str, port: int, rpc_timeout: float = RPC_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.rpc_timeout = rpc_timeout
+        self.decoder = FrameDecoder()
+        self.message_ids = itertools.count(101)
+        self.pending = {}
+        self.listeners = []
+        self.session_id = None
+        self.server_capabilities = []
+        self.connected = False
+        self.closing = False
+        self.channel = None
+        self.connection = None
+        self.hello = asyncio.get_running_loop().create_future()
+
+    # asyncssh SSHClientSession callbacks
+    def connection_made(self, channel) -> None:
+        self.channel = channel
+
+    def session_started(self) -> None:
+        hello = "".join(
+            f"<capability>{escape(capability)}</capability>"
+            for capability in CLIENT_CAPABILITIES
+        )
+        self.channel.write(
+            frame(
+                f'<?xml version="1.0" encoding="UTF-8"?><hello xmlns="{NETCONF_BASE_NS}"><capabilities>{hello}</capabilities></hello>',
+                chunked=False,
+            )
+        )
+
+    def data_received(self, data: bytes, datatype) -> None:
+        self.decoder.feed(data)
+        try:
+            while True:
+                message = self.decoder.next_message()
+                if message is None:
+                    return
+                self.message_received(message)
+        except NetconfFramingError as err:
+            logger.error(f"NETCONF session to {self.host}:{self.port} failed: {err}")
+            self.channel.close()
+
+    def eof_received(self) -> bool:
+        return False
+
+    def pause_writing(self) -> None:
+        pass
+
+    def resume_writing(self) -> None:
+        pass
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.connected = False
+        error = TransportError(str(exc) if exc else "Not connected to NETCONF server")
+        if not self.hello.done():
+            self.hello.set_exception(error)
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+        if self.closing:
+            return
+        for listener in self.listeners:
+            listener.errback(error)
+
+    def message_received(self, message: str) -> None:
+        timings.received(message)
+        if not self.hello.done():
+            self.server_hello(message)
+            return
+
+        tag, attrs = root_element(message)
+        if tag == qualify("rpc-reply"):
+            future = self.pending.pop(attrs.get("message-id"), None)
+            if future is not None and not future.done():
+                future.set_result(message)
+            return
+        for listener in self.listeners:
+            try:
+                listener.callback((tag, attrs), message)
+            except Exception as err:
+                logger.error(f"Error in NETCONF session listener: {err}")
+
+    def server_hello(self, message: str) -> None:
+        try:
+            root = ElementTree.fromstring(message)
+        except ElementTree.ParseError as err:
+            self.hello.set_exception(SSHError(f"Invalid <hello> received: {err}"))
+            return
+        self.server_capabilities = [
+            capability.text.strip()
+            for capability in root.iter(f"{{{NETCONF_BASE_NS}}}capability")
+            if capability.text
+        ]
+        session_id = root.find(f"{{{NETCONF_BASE_NS}}}session-id")
+        self.session_id = session_id.text if session_id is not None else None
+        self.decoder.chunked = BASE_1_1 in self.server_capabilities
+        self.connected = True
+        self.hello.set_result(None)
+
+    # ncclient Session listener interface
+    def add_listener(self, listener) -> None:
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener) -> None:
+        self.listeners.remove(listener)
+
+    def get_listener_instance(self, cls):
+        for listener in self.listeners:
+            if isinstance(listener, cls):
+                return listener
+        return None
+
+    async def rpc(self, operation: str, reply_class=RPCReply) -> RPCReply:
+        """Sends an RPC and returns the reply
+
+        Args:
+            operation:      XML of the operation element
+            reply_class:    RPCReply class of the operation
+
+        Raises:
+            RPCError:               The reply contains an <rpc-error/>
+            TimeoutExpiredError:    No reply within rpc_timeout seconds
+            TransportError:         The session is closed
+        """
+        if not self.connected:
+            raise TransportError("Not connected to NETCONF server")
+        message_id = str(next(self.message_ids))
+        future = asyncio.get_running_loop().create_future()
+        self.pending[message_id] = future
+        sent = time.perf_counter()
+        self.channel.write(
+            frame(
+                f'<rpc message-id="{message_id}" xmlns="{NETCONF_BASE_NS}">{operation}</rpc>',
+                chunked=self.decoder.chunked,
+            )
+        )
+        try:
+            xml = await asyncio.wait_for(future, self.rpc_timeout)
+        except asyncio.TimeoutError:
+            self.pending.pop(message_id, None)
+            raise TimeoutExpiredError(
+                f"No reply to message-id {message_id} within {self.rpc_timeout} seconds"
+            )
+        timings.record("rpc", time.perf_counter() - sent)
+        reply = reply_class(xml)
+        reply.raise_for_error()
+        return reply
+
+    async def get_config(self, source: str, filter=None) -> RPCReply:
+        return await self.rpc(
+            f"<get-config><source><{source}/></source>{filter_xml(filter)}</get-config>"
+        )
+
+    async def get(self, filter=None) -> RPCReply:
+        return await self.rpc(f"<get>{filter_xml(filter)}</get>")
+
+    async def get_schema(
+        self, identifier: str, version: str = None, format: str = None
+    ) -> SchemaReply:
+        operation = f'<get-schema xmlns="{NETCONF_MONITORING_NS}"><identifier>{escape(identifier)}</identifier>'
+        if version:
+            operation += f"<version>{escape(version)}</version>"
+        if format:
+            operation += f"<format>{escape(format)}</format>"
+        return await self.rpc(f"{operation}</get-schema>", reply_class=SchemaReply)
+
+    async def create_subscription(
+        self, filter=None, stream_name: str = None, start_time: str = None
+    ) -> RPCReply:
+        operation = f'<create-subscription xmlns="{NETCONF_NOTIFICATION_NS}">{filter_xml(filter)}'
+        if stream_name is not None:
+            operation += f"<stream>{escape(stream_name)}</stream>"
+        if start_time is not None:
+            operation += f"<startTime>{escape(start_time)}</startTime>"
+        return await self.rpc(f"{operation}</create-subscription>")
+
+    async def dispatch(self, rpc_command) -> RPCReply:
+        if not isinstance(rpc_command, str):
+            rpc_command = to_xml(rpc_command)
+        return await self.rpc(rpc_command)
+
+    async def close_session(self) -> None:
+        self.closing = True
+        try:
+            if self.connected:
+                self.rpc_timeout = min(self.rpc_timeout, 5)
+                await self.rpc("<close-session/>")
+        except (RPCError, TransportError, TimeoutExpiredError):
+            pass
+        finally:
+            self.connected = False
+            if self.connection is not None:
+                self.connection.close()
+
+
+def _timings_client(asyncssh, stamps: dict):
+    """Returns an asyncssh client factory which stores when the TCP connection, key exchange and authentication
+    completed in stamps"""
+
+    class TimingsClient(asyncssh.SSHClient):
+        def connection_made(self, conn) -> None:
+            stamps["tcp-connect"] = time.perf_counter()
+
+        def begin_auth(self, username: str) -> bool:
+            stamps["ssh-handshake"] = time.perf_counter()
+            return True
+
+        def auth_completed(self) -> None:
+            stamps["ssh-auth"] = time.perf_counter()
+
+    return TimingsClient
+
+
+async def connect(
+    host: str,
+    port: int = 830,
+    username: str = None,
+    password: str = None,
+    timeout: float = 10,
+    hostkey_verify: bool = True,
+    rpc_timeout: float = RPC_TIMEOUT,
+) -> AsyncSession:
+    """Establishes a NETCONF session with asyncssh and exchanges the <hello/> messages
+
+    Raises:
+        AuthenticationError:    Authentication failed
+        SSHError:               Unable to establish the SSH connection or the netconf subsystem
+    """
+    import asyncssh
+
+    options = {} if hostkey_verify else {"known_hosts": None}
+    stamps = {"started": time.perf_counter()}
+    if timings.active():
+        options["client_factory"] = _timings_client(asyncssh, stamps)
+    try:
+        connection = await asyncio.wait_for(
+            asyncssh.connect(
+                host, port, username=username, password=password, **options
+            ),
+            timeout,
+        )
+    except asyncssh.PermissionDenied as err:
+        raise AuthenticationError(err)
+    except (asyncssh.Error, OSError, asyncio.TimeoutError) as err:
+        raise SSHError(f"Could not open socket to {host}:{port}: {err or 'timed out'}")
+
+    try:
+        _, session = await connection.create_session(
+            lambda: AsyncSession(host, port, rpc_timeout),
+            subsystem="netconf",
+            encoding=None,
+        )
+        session.connection = connection
+        await asyncio.wait_for(session.hello, timeout)
+        if timings.active():
+            stamps["hello"] = time.perf_counter()
+            previous = stamps["started"]
+            for name in ("tcp-connect", "ssh-handshake", "ssh-auth", "hello"):
+                if name in stamps:
+                    timings.record(name, stamps[name] - previous)
+                    previous = stamps[name]
+    except (asyncssh.Error, asyncio.TimeoutError) as err:
+        connection.close()
+        raise SSHError(
+            f"Unable to start the netconf subsystem on {host}:{port}: {err or 'timed out'}"
+        )
+    except Exception:
+        connection.close()
+        raise
+    return session
+
+
+class EventLoopThread:
+    """Event loop running in a daemon thread which runs the coroutines of all AsyncSessions of the process"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="netconf-asyncio", daemon=True
+        )
+        self.thread.start()
+
+    def run(self, coroutine):
+        """Runs a coroutine on the event loop and returns its result"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+
+_event_loop_thread = None
+_event_loop_lock = threading.Lock()
+
+
+def event_loop_thread() -> EventLoopThread:
+    global _event_loop_thread
+    with _event_loop_lock:
+        if _event_loop_thread is None:
+            _event_loop_thread = EventLoopThread()
+        return _event_loop_thread
+
+
+class Manager:
+    """Blocking ncclient Manager compatible interface of an AsyncSession, the RPCs run on the shared event
+    loop thread so any number of threads can use their sessions without a transport thread per session
+
+    Args:
+        session:    Established AsyncSession
+        runner:     Event loop thread of the session
+    """
+
+    def __init__(self, session: AsyncSession, runner: EventLoopThread):
+        self._session = session
+        self._runner = runner
+
+    @property
+    def session(self) -> AsyncSession:
+        return self._session
+
+    @property
+    def session_id(self) -> str:
+        return self._session.session_id
+
+    @property
+    def server_capabilities(self) -> List[str]:
+        return self._session.server_capabilities
+
+    @property
+    def connected(self) -> bool:
+        return self._session.connected
+
+    def get_config(self, source: str, filter=None) -> RPCReply:
+        return self._runner.run(self._session.get_config(source, filter=filter))
+
+    def get(self, filter=None) -> RPCReply:
+        return self._runner.run(self._session.get(filter=filter))
+
+    def get_schema(
+        self, identifier: str, version: str = None, format: str = None
+    ) -> SchemaReply:
+        return self._runner.run(
+            self._session.get_schema(identifier, version=version, format=format)
+        )
+
+    def create_subscription(
+        self, filter=None, stream_name: str = None, start_time: str = None
+    ) -> RPCReply:
+        return self._runner.run(
+            self._session.create_subscription(
+                filter=filter, stream_name=stream_name, start_time=start_time
+            )
+        )
+
+    def dispatch(self, rpc_command) -> RPCReply:
+        return self._runner.run(self._session.dispatch(rpc_command))
+
+    def submit(self, operation: str, *args, **kwargs) -> concurrent.futures.Future:
+        """Sends an RPC (AsyncSession method name) without waiting and returns a future of the reply"""
+        return asyncio.run_coroutine_threadsafe(
+            getattr(self._session, operation)(*args, **kwargs), self._runner.loop
+        )
+
+    def close_session(self) -> None:
+        self._runner.run(self._session.close_session())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close_session()
+        return False
+
+
+def asyncio_connect(
+    host: str,
+    port: int = 830,
+    timeout: float = 10,
+    username: str = None,
+    password: str = None,
+    device_params: dict = None,
+    hostkey_verify: bool = True,
+) -> Manager:
+    """Drop in replacement of ncclient manager.connect which establishes the session on the asyncio engine,
+    ncclient device handlers are not supported and the default handler is always used"""
+    if device_params and device_params.get("name", "default") != "default":
+        logger.warning(
+            f"Device handler {device_params['name']} is not supported by the asyncio engine, using the default handler"
+        )
+    runner = event_loop_thread()
+    session = runner.run(
+        connect(
+            host,
+            port,
+            username=username,
+            password=password,
+            timeout=timeout,
+            hostkey_verify=hostkey_verify,
+        )
+    )
+    return Manager(session, runner)
+
+
+def session_connect(engine: str = "ncclient") -> Callable:
+    """Returns the manager.connect function of a NETCONF session engine
+
+    Args:
+        engine:     ncclient (a transport thread per session) or asyncio (sessions share one event loop)
+
+    Raises:
+        ImportError:    asyncssh is not installed for the asyncio engine
+    """
+    if engine == "asyncio":
+        try:
+            importlib.import_module("asyncssh")
+        except ImportError:
+            raise ImportError(
+                "The asyncio engine requires asyncssh (pip install netconf_tool[asyncio])"
+            )
+        return asyncio_connect
+    if timings.active():
+        return timings.timed_connect(manager.connect)
+    return manager.connect
+
+
+def manager_session(m):
+    """Returns the session (listeners, transport) of a Manager of either engine, ncclient 0.7 replaced the
+    Manager.session property with a method raising NotImplementedError"""
+    return m._session
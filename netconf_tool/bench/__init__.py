@@ -0,0 +1,21 @@
+import click
+from netconf_tool.lazy import LazyGroup
+
+
+# Commands are imported once they are used
+@click.group(
+    "bench",
+    cls=LazyGroup,
+    lazy_subcommands={
+        "run": (
+            "netconf_tool.bench.commands:cli_bench_run",
+            "Run the benchmark scenarios against the bundled mock NETCONF server",
+        ),
+        "server": (
+            "netconf_tool.bench.commands:cli_bench_server",
+            "Run the bundled mock NETCONF server in the foreground",
+        ),
+    },
+)
+def netconf_tool_cli_bench() -> None:
+    """Reproducible benchmarks of netconf-tool against a mock NETCONF server on localhost"""
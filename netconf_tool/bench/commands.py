@@ -0,0 +1,258 @@
+import json
+import time
+import click
+from loguru import logger
+
+from netconf_tool.decorators import (
+    common_pipeline_options,
+    common_session_engine_options,
+)
+
+
+@click.command("run")
+@click.option(
+    "--scenario",
+    "scenarios",
+    help="Scenario to run, can be used multiple times (defaults to all scenarios)",
+    type=click.Choice(["connect", "get-config", "get-yang-models", "notifications"]),
+    multiple=True,
+)
+@click.option(
+    "--iterations",
+    help="Measured runs of every connect, get-config and get-yang-models measurement, after one warm up run",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+)
+@click.option(
+    "--sessions",
+    help="Sessions established one after the other by the connect scenario",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+)
+@click.option(
+    "--payload-size",
+    "payload_sizes",
+    help="Size in bytes of the data returned by the mock server in the get-config scenario, can be used multiple times",
+    type=click.IntRange(min=1),
+    multiple=True,
+    default=[10_000, 100_000, 1_000_000],
+    show_default=True,
+)
+@click.option(
+    "--modules",
+    "module_counts",
+    help="Number of YANG modules advertised by the mock server in the get-yang-models scenario, can be used multiple times",
+    type=click.IntRange(min=1),
+    multiple=True,
+    default=[10, 100],
+    show_default=True,
+)
+@click.option(
+    "--notifications",
+    help="Notifications forwarded by the notifications scenario",
+    type=click.IntRange(min=1),
+    default=5000,
+    show_default=True,
+)
+@click.option(
+    "--notification-rate",
+    help="Notifications sent per second by the mock server, 0 sends as fast as possible",
+    type=click.FloatRange(min=0),
+    default=0,
+    show_default=True,
+)
+@click.option(
+    "--batch-size",
+    help="Maximum number of notifications passed to the sink at once in the notifications scenario",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--latency",
+    help="Milliseconds the mock server delays every RPC reply by",
+    type=click.FloatRange(min=0),
+    default=0,
+    show_default=True,
+)
+@click.option(
+    "--output",
+    help="Write the results and the environment they were measured in to this JSON file",
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "--baseline",
+    help="JSON file written by a previous --output, the change of every result is shown next to it",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option("--json", "as_json", help="Print the results as JSON", is_flag=True)
+@common_session_engine_options
+@common_pipeline_options
+def cli_bench_run(
+    scenarios: tuple,
+    iterations: int,
+    sessions: int,
+    payload_sizes: tuple,
+    module_counts: tuple,
+    notifications: int,
+    notification_rate: float,
+    batch_size: int,
+    latency: float,
+    output: str,
+    baseline: str,
+    as_json: bool,
+    session_engine: str,
+    pipeline: int,
+):
+    """Runs reproducible scenarios against a mock NETCONF server on localhost and reports the results, use --output and --baseline to compare versions"""
+    from netconf_tool.bench.scenarios import (
+        SCENARIOS,
+        bench_connect,
+        bench_get_config,
+        bench_get_yang_models,
+        bench_notifications,
+        compare,
+        environment,
+        headline,
+    )
+
+    baseline_results = []
+    if baseline:
+        try:
+            with open(baseline) as baseline_file:
+                baseline_results = json.load(baseline_file)["results"]
+        except (ValueError, KeyError) as err:
+            logger.error(f"Unable to read benchmark results from {baseline}: {err}")
+            exit()
+
+    # The commands log every session and RPC, only the benchmark progress is shown
+    logger.disable("netconf_tool")
+    logger.enable("netconf_tool.bench")
+
+    latency = latency / 1000
+    runs = {
+        "connect": lambda: bench_connect(session_engine, sessions, latency),
+        "get-config": lambda: bench_get_config(
+            session_engine, list(payload_sizes), iterations, latency
+        ),
+        "get-yang-models": lambda: bench_get_yang_models(
+            session_engine, list(module_counts), iterations, pipeline, latency
+        ),
+        "notifications": lambda: bench_notifications(
+            session_engine, notifications, notification_rate, batch_size
+        ),
+    }
+
+    results = []
+    for scenario in [
+        scenario for scenario in SCENARIOS if scenario in scenarios or not scenarios
+    ]:
+        logger.info(f"Running scenario {scenario} using the {session_engine} engine")
+        started = time.perf_counter()
+        try:
+            results += runs[scenario]()
+        except Exception as err:
+            logger.error(f"Scenario {scenario} failed: {err}")
+            continue
+        logger.info(f"Scenario {scenario} took {time.perf_counter() - started:.2f}s")
+
+    report = {"environment": environment(session_engine), "results": results}
+    if output:
+        with open(output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+        logger.success(f"Exported benchmark results to {output}")
+
+    if as_json:
+        click.echo(json.dumps(report, indent=2))
+        return
+
+    changes = compare(results, baseline_results)
+    click.echo(
+        f"{'SCENARIO':<16} {'PARAMETERS':<58} {'METRIC':<25} {'VALUE':>12}  CHANGE"
+    )
+    for result, change in zip(results, changes):
+        metric, value, _ = headline(result)
+        parameters = " ".join(
+            f"{key}={value}" for key, value in result["parameters"].items()
+        )
+        click.echo(
+            f"{result['scenario']:<16} {parameters:<58} {metric:<25} {value:>12.3f}  {'' if change is None else f'{change:+.1f}%'}"
+        )
+
+
+@click.command("server")
+@click.option(
+    "--port", help="Port to listen on", type=click.IntRange(min=0), default=8300
+)
+@click.option(
+    "--payload-size",
+    help="Size in bytes of the data returned by get-config and get",
+    type=click.IntRange(min=1),
+    default=10_000,
+    show_default=True,
+)
+@click.option(
+    "--modules",
+    help="Number of YANG modules advertised in the hello and served by get-schema",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+)
+@click.option(
+    "--notifications",
+    help="Notifications sent per subscription, 0 sends until the session is closed",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+)
+@click.option(
+    "--notification-rate",
+    help="Notifications sent per second after create-subscription, 0 sends as fast as possible",
+    type=click.FloatRange(min=0),
+    default=1,
+    show_default=True,
+)
+@click.option(
+    "--latency",
+    help="Milliseconds every RPC reply is delayed by",
+    type=click.FloatRange(min=0),
+    default=0,
+    show_default=True,
+)
+def cli_bench_server(
+    port: int,
+    payload_size: int,
+    modules: int,
+    notifications: int,
+    notification_rate: float,
+    latency: float,
+):
+    """Runs the mock NETCONF server used by bench run in the foreground so any command can be pointed at it"""
+    from netconf_tool.bench.server import MockNetconfServer
+
+    server = MockNetconfServer(
+        port=port,
+        payload_size=payload_size,
+        modules=modules,
+        notification_rate=notification_rate,
+        notifications=notifications,
+        latency=latency / 1000,
+    )
+    try:
+        server.start()
+    except OSError as err:
+        logger.error(f"Unable to listen on {server.host}:{port}: {err}")
+        exit()
+
+    logger.success(
+        f"Mock NETCONF server listening on {server.host}:{server.port}, any username and password is accepted, you can exit out of here using Ctrl+C"
+    )
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("Stopping mock NETCONF server")
+    finally:
+        server.stop()
@@ -0,0 +1,339 @@
+import os
+import platform
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+from pathlib import Path
+from typing import List, Optional
+
+from loguru import logger
+
+from netconf_tool.aio import session_connect
+from netconf_tool.bench.server import MockNetconfServer
+from netconf_tool.helpers import build_module_index
+from netconf_tool.operations.get_config import fetch_config
+from netconf_tool.operations.get_yang import export_schemas
+from netconf_tool.pipeline import DEFAULT_PIPELINE_DEPTH
+from netconf_tool.streaming import export_data
+from netconf_tool.subscription.engine import DeviceSubscription, ForwardingEngine
+
+SCENARIOS = ["connect", "get-config", "get-yang-models", "notifications"]
+NETCONF_OPTIONS = {
+    "timeout": 30,
+    "username": "bench",
+    "password": "bench",
+    "device_handler": "default",
+    "hostkey_verify": False,
+}
+
+
+def summarize(samples: List[float]) -> dict:
+    """Returns the run count and min/median/p95/max in milliseconds of durations in seconds"""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def environment(engine: str) -> dict:
+    """Versions and machine the results were measured with, stored next to the results"""
+
+    def _version(package: str) -> str:
+        try:
+            return metadata.version(package)
+        except metadata.PackageNotFoundError:
+            return "unknown"
+
+    return {
+        "netconf_tool": _version("netconf_tool"),
+        "ncclient": _version("ncclient"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "engine": engine,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def _connect(server: MockNetconfServer, engine: str):
+    return session_connect(engine)(
+        host=server.host,
+        port=server.port,
+        timeout=NETCONF_OPTIONS["timeout"],
+        username=NETCONF_OPTIONS["username"],
+        password=NETCONF_OPTIONS["password"],
+        device_params={"name": NETCONF_OPTIONS["device_handler"]},
+        hostkey_verify=NETCONF_OPTIONS["hostkey_verify"],
+    )
+
+
+def bench_connect(engine: str, sessions: int, latency: float = 0) -> List[dict]:
+    """Establishes and closes sessions one after the other, measures the session setup (TCP, SSH and
+    the hello exchange) and <close-session>
+
+    Args:
+        engine:     NETCONF session engine
+        sessions:   Number of sessions established
+        latency:    Seconds the mock server delays every RPC reply
+    """
+    connects, closes = [], []
+    with MockNetconfServer(latency=latency) as server:
+        # The first session also imports and initialises the engine
+        _connect(server, engine).close_session()
+        for _ in range(sessions):
+            started = time.perf_counter()
+            m = _connect(server, engine)
+            connected = time.perf_counter()
+            m.close_session()
+            connects.append(connected - started)
+            closes.append(time.perf_counter() - connected)
+
+    result = {"scenario": "connect", "parameters": {"latency": latency}}
+    result.update(summarize(connects))
+    result["close_median_ms"] = round(statistics.median(closes) * 1000, 3)
+    return [result]
+
+
+def bench_get_config(
+    engine: str, payload_sizes: List[int], iterations: int, latency: float = 0
+) -> List[dict]:
+    """Runs the get-config command path (connect, <get-config>, close and pretty printing the reply to a
+    file) for every payload size
+
+    Args:
+        engine:         NETCONF session engine
+        payload_sizes:  Sizes in bytes of the data returned by the mock server
+        iterations:     Measured runs per payload size, after one warm up run
+        latency:        Seconds the mock server delays every RPC reply
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix="netconf-tool-bench-") as directory:
+        export_xml = str(Path(directory) / "get-config.xml")
+        for payload_size in payload_sizes:
+            with MockNetconfServer(
+                payload_size=payload_size, latency=latency
+            ) as server:
+                totals, fetches, exports = [], [], []
+                size = 0
+                for n in range(iterations + 1):
+                    started = time.perf_counter()
+                    data_xml = fetch_config(
+                        host=server.host,
+                        port=server.port,
+                        datastore="running",
+                        engine=engine,
+                        **NETCONF_OPTIONS,
+                    )
+                    fetched = time.perf_counter()
+                    export_data(data_xml, "get-config", False, export_xml, None)
+                    exported = time.perf_counter()
+                    if n:
+                        totals.append(exported - started)
+                        fetches.append(fetched - started)
+                        exports.append(exported - fetched)
+                    size = len(data_xml)
+
+            result = {
+                "scenario": "get-config",
+                "parameters": {"payload_size": payload_size, "latency": latency},
+            }
+            result.update(summarize(totals))
+            result.update(
+                {
+                    "fetch_median_ms": round(statistics.median(fetches) * 1000, 3),
+                    "export_median_ms": round(statistics.median(exports) * 1000, 3),
+                    "bytes": size,
+                    "mb_per_second": round(
+                        size / statistics.median(totals) / 1_000_000, 3
+                    ),
+                }
+            )
+            results.append(result)
+    return results
+
+
+def bench_get_yang_models(
+    engine: str,
+    module_counts: List[int],
+    iterations: int,
+    pipeline: int = DEFAULT_PIPELINE_DEPTH,
+    latency: float = 0,
+) -> List[dict]:
+    """Runs the get-yang-models command path without the schema cache (connect, parse the advertised
+    modules and download every module using <get-schema>) for every module count
+
+    Args:
+        engine:         NETCONF session engine
+        module_counts:  Number of modules advertised by the mock server
+        iterations:     Measured runs per module count, after one warm up run
+        pipeline:       Number of <get-schema> RPCs kept in flight
+        latency:        Seconds the mock server delays every RPC reply
+    """
+    results = []
+    for modules in module_counts:
+        with MockNetconfServer(modules=modules, latency=latency) as server:
+            samples = []
+            for n in range(iterations + 1):
+                with tempfile.TemporaryDirectory(
+                    prefix="netconf-tool-bench-"
+                ) as directory:
+                    started = time.perf_counter()
+                    with _connect(server, engine) as m:
+                        module_index = build_module_index(m.server_capabilities)
+                        exported = export_schemas(
+                            m,
+                            [
+                                (module_name, module["revision"])
+                                for module_name, module in module_index.items()
+                            ],
+                            Path(directory),
+                            1,
+                            pipeline=pipeline,
+                        )
+                    if n:
+                        samples.append(time.perf_counter() - started)
+
+        result = {
+            "scenario": "get-yang-models",
+            "parameters": {
+                "modules": modules,
+                "pipeline": pipeline,
+                "latency": latency,
+            },
+        }
+        result.update(summarize(samples))
+        result["modules_per_second"] = round(exported / statistics.median(samples), 1)
+        results.append(result)
+    return results
+
+
+class CountingSink:
+    """In-process forwarder sink which only counts the published notifications
+
+    Args:
+        target: Number of published notifications which sets done
+    """
+
+    def __init__(self, target: int):
+        self.target = target
+        self.published = 0
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def publish(self, notifications: list) -> None:
+        with self.lock:
+            self.published += len(notifications)
+            if self.published >= self.target:
+                self.done.set()
+
+    def close(self) -> None:
+        pass
+
+
+def bench_notifications(
+    engine: str,
+    notifications: int,
+    notification_rate: float = 0,
+    batch_size: int = 1,
+) -> List[dict]:
+    """Forwards notifications from a subscription to an in-process sink using the forwarding engine of
+    the subscription commands, measures the throughput and the lag between receiving and publishing
+
+    Args:
+        engine:             NETCONF session engine
+        notifications:      Number of notifications sent by the mock server
+        notification_rate:  Notifications per second sent by the mock server, 0 sends as fast as possible
+        batch_size:         Maximum number of notifications passed to the sink at once
+    """
+    sink = CountingSink(notifications)
+    forwarder = ForwardingEngine(lambda: sink, batch_size=batch_size)
+    forwarder.start()
+    timeout = max(60, 2 * notifications / notification_rate if notification_rate else 0)
+    elapsed: Optional[float] = None
+    with MockNetconfServer(
+        notifications=notifications, notification_rate=notification_rate
+    ) as server:
+        subscription = DeviceSubscription(
+            forwarder,
+            server.host,
+            server.port,
+            NETCONF_OPTIONS,
+            session_engine=engine,
+        )
+        try:
+            started = time.perf_counter()
+            subscription.connect()
+            if sink.done.wait(timeout):
+                elapsed = time.perf_counter() - started
+            else:
+                logger.warning(
+                    f"Only {sink.published} of {notifications} notifications were forwarded within {timeout:.0f}s"
+                )
+        finally:
+            subscription.close()
+            forwarder.stop()
+
+    stats = forwarder.stats.snapshot()
+    return [
+        {
+            "scenario": "notifications",
+            "parameters": {
+                "notifications": notifications,
+                "notification_rate": notification_rate,
+                "batch_size": batch_size,
+            },
+            "published": sink.published,
+            "seconds": round(elapsed, 3) if elapsed is not None else None,
+            "notifications_per_second": (
+                round(sink.published / elapsed, 1) if elapsed else 0.0
+            ),
+            "lag_avg_ms": round(stats["lag_avg"] * 1000, 3),
+            "lag_max_ms": round(stats["lag_max"] * 1000, 3),
+            "queue_depth_max": stats["queue_depth_max"],
+        }
+    ]
+
+
+def headline(result: dict) -> tuple:
+    """Returns the metric a result is compared by, its value and True when higher values are better"""
+    if "median_ms" in result:
+        return "median_ms", result["median_ms"], False
+    return "notifications_per_second", result["notifications_per_second"], True
+
+
+def compare(results: List[dict], baseline: List[dict]) -> List[Optional[float]]:
+    """Returns the change in percent of the headline metric of every result against the baseline result
+    with the same scenario and parameters, positive is an improvement and None when there is no baseline
+
+    Args:
+        results:    Results of this run
+        baseline:   Results of a previous run (the results key of its JSON output)
+    """
+    previous = {
+        (result["scenario"], tuple(sorted(result["parameters"].items()))): result
+        for result in baseline
+    }
+    changes = []
+    for result in results:
+        match = previous.get(
+            (result["scenario"], tuple(sorted(result["parameters"].items())))
+        )
+        if match is None:
+            changes.append(None)
+            continue
+        _, value, higher_is_better = headline(result)
+        _, before, _ = headline(match)
+        if not before:
+            changes.append(None)
+            continue
+        change = (value - before) / before * 100
+        changes.append(round(change if higher_is_better else -change, 1))
+    return changes
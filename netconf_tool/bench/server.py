@@ -0,0 +1,307 @@
+import logging
+import re
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+import paramiko
+from loguru import logger
+from ncclient.transport.errors import NetconfFramingError
+
+from netconf_tool.aio import (
+    BASE_1_0,
+    BASE_1_1,
+    NETCONF_BASE_NS,
+    NETCONF_MONITORING_NS,
+    NETCONF_NOTIFICATION_NS,
+    FrameDecoder,
+    frame,
+)
+
+BENCH_NS = "urn:netconf-tool:bench"
+MODULE_REVISION = "2024-01-01"
+SERVER_CAPABILITIES = [
+    BASE_1_0,
+    BASE_1_1,
+    "urn:ietf:params:netconf:capability:notification:1.0",
+    "urn:ietf:params:netconf:capability:interleave:1.0",
+    "urn:ietf:params:netconf:capability:xpath:1.0",
+    f"{NETCONF_MONITORING_NS}?module=ietf-netconf-monitoring&revision=2010-10-04",
+]
+# Paramiko logs every connection reset by a client at ERROR level
+LOG_CHANNEL = "netconf_tool.bench.server"
+logging.getLogger(LOG_CHANNEL).setLevel(logging.CRITICAL)
+
+_OPERATION_PATTERN = re.compile(r"<(?![?!/])(?:[\w.-]+:)?([\w.-]+)")
+_IDENTIFIER_PATTERN = re.compile(r"<(?:[\w.-]+:)?identifier>([^<]+)<")
+
+
+def rpc_operation(message: str) -> str:
+    """Returns the name of the operation (first child of <rpc>) of an RPC without parsing the message"""
+    names = _OPERATION_PATTERN.findall(message, 0, 4096)
+    return names[1] if len(names) > 1 else ""
+
+
+def module_name(n: int) -> str:
+    return f"bench-module-{n}"
+
+
+def generate_payload(size: int) -> str:
+    """Returns a deterministic <interfaces> tree of at least size bytes"""
+    entries = []
+    length = 0
+    n = 0
+    while length < size:
+        entry = (
+            f"<interface><name>GigabitEthernet0/0/{n}</name><description>Bench interface {n}</description>"
+            f'<type xmlns:ianaift="urn:ietf:params:xml:ns:yang:iana-if-type">ianaift:ethernetCsmacd</type>'
+            f"<enabled>{'true' if n % 2 else 'false'}</enabled></interface>"
+        )
+        entries.append(entry)
+        length += len(entry)
+        n += 1
+    return f'<interfaces xmlns="urn:ietf:params:xml:ns:yang:ietf-interfaces">{"".join(entries)}</interfaces>'
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    """Accepts any username with any password or key and the netconf subsystem"""
+
+    def __init__(self):
+        self.subsystem = threading.Event()
+
+    def check_channel_request(self, kind: str, chanid: int) -> int:
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def get_allowed_auths(self, username: str) -> str:
+        return "password,publickey"
+
+    def check_auth_password(self, username: str, password: str) -> int:
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_auth_publickey(self, username: str, key) -> int:
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_subsystem_request(self, channel, name: str) -> bool:
+        if name != "netconf":
+            return False
+        self.subsystem.set()
+        return True
+
+
+class MockSession:
+    """One NETCONF session of the mock server, runs in the thread of its SSH connection
+
+    Args:
+        server:     MockNetconfServer the session belongs to
+        channel:    paramiko channel of the netconf subsystem
+        session_id: NETCONF session-id sent in the hello
+    """
+
+    def __init__(self, server: "MockNetconfServer", channel, session_id: int):
+        self.server = server
+        self.channel = channel
+        self.session_id = session_id
+        self.decoder = FrameDecoder()
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+
+    def send(self, message: str) -> None:
+        with self.lock:
+            self.channel.sendall(frame(message, chunked=self.decoder.chunked))
+
+    def run(self) -> None:
+        capabilities = "".join(
+            f"<capability>{escape(capability)}</capability>"
+            for capability in self.server.capabilities
+        )
+        self.send(
+            f'<hello xmlns="{NETCONF_BASE_NS}"><capabilities>{capabilities}</capabilities>'
+            f"<session-id>{self.session_id}</session-id></hello>"
+        )
+        hello = False
+        try:
+            while not self.closed.is_set():
+                data = self.channel.recv(65536)
+                if not data:
+                    return
+                self.decoder.feed(data)
+                while not self.closed.is_set():
+                    message = self.decoder.next_message()
+                    if message is None:
+                        break
+                    if not hello:
+                        hello = True
+                        # The hello of both peers uses end-of-message framing
+                        self.decoder.chunked = BASE_1_1 in message
+                        continue
+                    self.handle(message)
+        except (NetconfFramingError, OSError, EOFError) as err:
+            logger.debug(f"Mock NETCONF session {self.session_id} failed: {err}")
+        finally:
+            self.closed.set()
+
+    def handle(self, message: str) -> None:
+        match = re.search(r"message-id=[\"']([^\"']*)", message)
+        message_id = match.group(1) if match else ""
+        operation = rpc_operation(message)
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if operation in ("get-config", "get"):
+            body = f'<data xmlns="{NETCONF_BASE_NS}">{self.server.payload}</data>'
+        elif operation == "get-schema":
+            identifier = _IDENTIFIER_PATTERN.search(message)
+            body = f'<data xmlns="{NETCONF_MONITORING_NS}">{escape(self.server.schema(identifier.group(1) if identifier else ""))}</data>'
+        else:
+            body = "<ok/>"
+
+        self.send(
+            f'<rpc-reply xmlns="{NETCONF_BASE_NS}" message-id="{message_id}">{body}</rpc-reply>'
+        )
+
+        if operation == "create-subscription":
+            threading.Thread(
+                target=self.notify, name=f"mock-notify-{self.session_id}", daemon=True
+            ).start()
+        elif operation in ("close-session", "kill-session"):
+            self.closed.set()
+
+    def notify(self) -> None:
+        """Sends the notifications of a subscription paced at the notification rate of the server"""
+        rate = self.server.notification_rate
+        count = self.server.notifications
+        started = time.monotonic()
+        sequence = 0
+        try:
+            while not self.closed.is_set() and (not count or sequence < count):
+                if rate:
+                    delay = started + sequence / rate - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                event_time = datetime.now(timezone.utc).isoformat()
+                self.send(
+                    f'<notification xmlns="{NETCONF_NOTIFICATION_NS}"><eventTime>{event_time}</eventTime>'
+                    f'<bench-event xmlns="{BENCH_NS}"><sequence>{sequence}</sequence></bench-event></notification>'
+                )
+                sequence += 1
+        except (OSError, EOFError) as err:
+            logger.debug(f"Mock NETCONF session {self.session_id} failed: {err}")
+
+
+class MockNetconfServer:
+    """NETCONF over SSH server on localhost used to benchmark netconf-tool without a real device, any
+    username and password is accepted
+
+    get-config and get return a generated <interfaces> tree, get-schema returns a minimal module for
+    each advertised module, create-subscription starts sending notifications and any other RPC is
+    answered with <ok/>. Sessions are served by a thread each like a device processing RPCs in order.
+
+        with MockNetconfServer(payload_size=100_000) as server:
+            manager.connect(host="127.0.0.1", port=server.port, ...)
+
+    Args:
+        port:               Port to listen on, 0 picks a free port
+        payload_size:       Approximate size in bytes of the data returned by get-config and get
+        modules:            Number of YANG modules advertised in the hello
+        notification_rate:  Notifications sent per second after create-subscription, 0 sends as fast as possible
+        notifications:      Notifications sent per subscription, 0 sends until the session is closed
+        latency:            Seconds every RPC reply is delayed by
+        host:               Address to listen on
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        payload_size: int = 10_000,
+        modules: int = 10,
+        notification_rate: float = 0,
+        notifications: int = 0,
+        latency: float = 0,
+        host: str = "127.0.0.1",
+    ):
+        self.host = host
+        self.port = port
+        self.payload = generate_payload(payload_size)
+        self.modules = modules
+        self.capabilities = SERVER_CAPABILITIES + [
+            f"{BENCH_NS}:{module_name(n)}?module={module_name(n)}&revision={MODULE_REVISION}"
+            for n in range(modules)
+        ]
+        self.notification_rate = notification_rate
+        self.notifications = notifications
+        self.latency = latency
+        self.host_key = paramiko.ECDSAKey.generate()
+        self.session_ids = iter(range(1, 1 << 31))
+        self.sock = None
+        self.transports = []
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def schema(self, identifier: str) -> str:
+        return (
+            f'module {identifier} {{\n  yang-version 1.1;\n  namespace "{BENCH_NS}:{identifier}";\n'
+            f"  prefix bench;\n\n  revision {MODULE_REVISION};\n\n  container {identifier} {{\n"
+            f"    leaf name {{\n      type string;\n    }}\n  }}\n}}\n"
+        )
+
+    def start(self) -> "MockNetconfServer":
+        """Starts listening and accepting connections in a background thread, sets port when it was 0"""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(1024)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._accept, name="mock-accept", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.stopping.set()
+        if self.sock is not None:
+            self.sock.close()
+        with self.lock:
+            transports, self.transports = self.transports, []
+        for transport in transports:
+            transport.close()
+
+    def __enter__(self) -> "MockNetconfServer":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _accept(self) -> None:
+        while not self.stopping.is_set():
+            try:
+                sock, _ = self.sock.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(
+                target=self._serve, args=(sock,), name="mock-session", daemon=True
+            ).start()
+
+    def _serve(self, sock: socket.socket) -> None:
+        transport = paramiko.Transport(sock)
+        transport.set_log_channel(LOG_CHANNEL)
+        transport.add_server_key(self.host_key)
+        with self.lock:
+            self.transports.append(transport)
+        server = _ServerInterface()
+        try:
+            transport.start_server(server=server)
+            channel = transport.accept(30)
+            if channel is None or not server.subsystem.wait(30):
+                return
+            MockSession(self, channel, next(self.session_ids)).run()
+        except (paramiko.SSHException, OSError, EOFError) as err:
+            logger.debug(f"Mock NETCONF connection failed: {err}")
+        finally:
+            transport.close()
+            with self.lock:
+                if transport in self.transports:
+                    self.transports.remove(transport)
@@ -0,0 +1,25 @@
+import click
+from netconf_tool.lazy import LazyGroup
+
+
+# Commands are imported once they are used
+@click.group(
+    "broker",
+    cls=LazyGroup,
+    lazy_subcommands={
+        "start": (
+            "netconf_tool.broker.commands:cli_broker_start",
+            "Start the session broker in the foreground",
+        ),
+        "status": (
+            "netconf_tool.broker.commands:cli_broker_status",
+            "Show the sessions held by a running broker",
+        ),
+        "stop": (
+            "netconf_tool.broker.commands:cli_broker_stop",
+            "Stop a running broker",
+        ),
+    },
+)
+def netconf_tool_cli_broker() -> None:
+    """Local session broker daemon that keeps NETCONF sessions warm across CLI invocations"""
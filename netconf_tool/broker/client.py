@@ -0,0 +1,122 @@
+import json
+import os
+import socket
+import stat
+import tempfile
+
+
+def _default_socket_path() -> str:
+    # The temp directory is shared with other users, so the socket is placed in a private directory
+    # which the broker creates with 0700 permissions when there is no per user runtime directory
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "netconf-tool-broker.sock")
+    return os.path.join(
+        tempfile.gettempdir(), f"netconf-tool-{os.getuid()}", "broker.sock"
+    )
+
+
+DEFAULT_BROKER_SOCKET = _default_socket_path()
+
+
+class BrokerError(Exception):
+    """Raised when the session broker is unreachable or the requested operation failed"""
+
+
+def check_socket_owner(socket_path: str) -> None:
+    """Raises BrokerError unless socket_path is a Unix socket owned by the current user, requests contain
+    device credentials which must not be sent to a socket created by another user
+
+    Args:
+        socket_path:    Path of the Unix socket the broker is listening on
+    """
+    try:
+        status = os.stat(socket_path)
+    except FileNotFoundError:
+        raise BrokerError(
+            f"Session broker is not running on {socket_path}, start it using 'netconf-tool broker start'"
+        )
+    except OSError as err:
+        raise BrokerError(f"Unable to communicate with session broker: {err}")
+
+    if not stat.S_ISSOCK(status.st_mode):
+        raise BrokerError(f"{socket_path} is not a Unix socket")
+    if status.st_uid != os.getuid():
+        raise BrokerError(
+            f"{socket_path} is owned by another user (uid {status.st_uid}), refusing to send credentials to it"
+        )
+
+
+class BrokerClient:
+    """Sends requests to a running session broker over its Unix socket
+
+    Each request opens a short lived connection to the local socket, the NETCONF session
+    itself is kept open by the broker and reused by subsequent requests for the same
+    host/credentials.
+
+    Args:
+        socket_path:    Path of the Unix socket the broker is listening on
+        timeout:        Socket timeout while waiting for the broker to reply
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_BROKER_SOCKET, timeout: int = 300):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def request(self, operation: str, **kwargs) -> dict:
+        """Sends a single request to the broker and returns the decoded result
+
+        Args:
+            operation:  Name of the broker operation (eg. get_config, server_capabilities)
+            kwargs:     Arguments of the operation, including the NETCONF connection details
+        """
+        payload = json.dumps({"operation": operation, **kwargs}).encode() + b"\n"
+        check_socket_owner(self.socket_path)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                sock.sendall(payload)
+                with sock.makefile("rb") as reader:
+                    line = reader.readline()
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise BrokerError(
+                f"Session broker is not running on {self.socket_path}, start it using 'netconf-tool broker start'"
+            )
+        except OSError as err:
+            raise BrokerError(f"Unable to communicate with session broker: {err}")
+
+        if not line:
+            raise BrokerError("Session broker closed the connection without a reply")
+
+        response = json.loads(line)
+        if response.get("error"):
+            raise BrokerError(response["error"])
+        return response["result"]
+
+    def get_config(self, datastore: str, filter: str = None, **netconf_options) -> str:
+        """Performs a get-config operation through the broker and returns the data as an XML string"""
+        result = self.request(
+            "get_config", datastore=datastore, filter=filter, **netconf_options
+        )
+        return result["data_xml"]
+
+    def get(
+        self, filter: str = None, filter_type: str = "subtree", **netconf_options
+    ) -> str:
+        """Performs a get operation through the broker and returns the data as an XML string, filter_type
+        is subtree or xpath"""
+        result = self.request(
+            "get", filter=filter, filter_type=filter_type, **netconf_options
+        )
+        return result["data_xml"]
+
+    def get_schema(self, identifier: str, **netconf_options) -> str:
+        """Performs a get-schema operation through the broker and returns the schema text"""
+        result = self.request("get_schema", identifier=identifier, **netconf_options)
+        return result["data"]
+
+    def server_capabilities(self, **netconf_options) -> list:
+        """Returns the capabilities advertised by the NETCONF server in its <hello>"""
+        result = self.request("server_capabilities", **netconf_options)
+        return result["capabilities"]
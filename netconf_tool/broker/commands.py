@@ -0,0 +1,75 @@
+import click
+import json
+from loguru import logger
+
+from netconf_tool.broker import netconf_tool_cli_broker
+from netconf_tool.broker.client import DEFAULT_BROKER_SOCKET, BrokerClient, BrokerError
+
+
+@netconf_tool_cli_broker.command("start")
+@click.option(
+    "--socket-path",
+    help="Unix socket the broker will listen on",
+    type=str,
+    default=DEFAULT_BROKER_SOCKET,
+    envvar="NETCONF_TOOL_BROKER_SOCKET",
+)
+@click.option(
+    "--idle-timeout",
+    help="Seconds a NETCONF session may stay unused before it is closed",
+    type=int,
+    default=300,
+)
+@click.option(
+    "--keepalive",
+    help="Seconds between SSH keepalives and session health checks",
+    type=int,
+    default=30,
+)
+def cli_broker_start(socket_path: str, idle_timeout: int, keepalive: int):
+    """Starts the session broker in the foreground, use --use-broker on supported commands to route RPCs through it"""
+    from netconf_tool.broker.server import serve
+
+    try:
+        serve(socket_path=socket_path, idle_timeout=idle_timeout, keepalive=keepalive)
+    except (BrokerError, OSError) as err:
+        logger.error(f"Unable to start session broker: {err}")
+        exit()
+
+
+@netconf_tool_cli_broker.command("status")
+@click.option(
+    "--socket-path",
+    help="Unix socket the broker is listening on",
+    type=str,
+    default=DEFAULT_BROKER_SOCKET,
+    envvar="NETCONF_TOOL_BROKER_SOCKET",
+)
+def cli_broker_status(socket_path: str):
+    """Lists the NETCONF sessions currently held open by the session broker"""
+    try:
+        status = BrokerClient(socket_path).request("status")
+    except BrokerError as err:
+        logger.error(err)
+        exit()
+
+    print(json.dumps(status["sessions"], indent=4))
+
+
+@netconf_tool_cli_broker.command("stop")
+@click.option(
+    "--socket-path",
+    help="Unix socket the broker is listening on",
+    type=str,
+    default=DEFAULT_BROKER_SOCKET,
+    envvar="NETCONF_TOOL_BROKER_SOCKET",
+)
+def cli_broker_stop(socket_path: str):
+    """Closes all NETCONF sessions and stops the session broker"""
+    try:
+        BrokerClient(socket_path).request("shutdown")
+    except BrokerError as err:
+        logger.error(err)
+        exit()
+
+    logger.success("Session broker is stopping")
@@ -0,0 +1,295 @@
+import hashlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import threading
+import time
+from ncclient import manager
+from loguru import logger
+from netconf_tool.aio import manager_session
+from netconf_tool.broker.client import BrokerError, check_socket_owner
+
+NETCONF_OPTIONS = (
+    "host",
+    "port",
+    "timeout",
+    "username",
+    "password",
+    "device_handler",
+    "hostkey_verify",
+)
+
+
+class BrokerSession:
+    """A warm NETCONF session owned by the broker
+
+    Args:
+        options:    NETCONF connection details used to establish the session
+    """
+
+    def __init__(self, options: dict):
+        self.options = options
+        self.lock = threading.Lock()
+        self.manager = None
+        self.last_used = time.monotonic()
+        self.requests = 0
+
+    @property
+    def connected(self) -> bool:
+        return self.manager is not None and self.manager.connected
+
+    def connect(self, keepalive: int) -> None:
+        options = self.options
+        self.manager = manager.connect(
+            host=options["host"],
+            port=options["port"],
+            timeout=options["timeout"],
+            username=options["username"],
+            password=options["password"],
+            device_params={"name": options["device_handler"]},
+            hostkey_verify=options["hostkey_verify"],
+        )
+        transport = getattr(manager_session(self.manager), "transport", None)
+        if transport is not None and keepalive:
+            transport.set_keepalive(keepalive)
+        logger.success(
+            f"Established NETCONF connection to {options['host']}:{options['port']} (Session ID: {self.manager.session_id})"
+        )
+
+    def close(self) -> None:
+        if self.manager is None:
+            return
+        try:
+            if self.manager.connected:
+                self.manager.close_session()
+        except Exception as err:
+            logger.debug(f"Error while closing NETCONF session: {err}")
+        self.manager = None
+
+
+class SessionBroker:
+    """Keeps authenticated NETCONF sessions open per host/credential and executes RPCs on them
+
+    Args:
+        idle_timeout:   Seconds a session may stay unused before it is closed
+        keepalive:      Seconds between SSH keepalives and session health checks
+    """
+
+    def __init__(self, idle_timeout: int = 300, keepalive: int = 30):
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    @staticmethod
+    def session_key(options: dict) -> tuple:
+        password = options.get("password") or ""
+        return (
+            options["host"],
+            options["port"],
+            options.get("username"),
+            hashlib.sha256(password.encode()).hexdigest(),
+            options["device_handler"],
+            options["hostkey_verify"],
+        )
+
+    def checkout(self, options: dict) -> BrokerSession:
+        """Returns the session for these connection details, creating the entry if it doesn't exist"""
+        key = self.session_key(options)
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = BrokerSession(options)
+                self.sessions[key] = session
+        return session
+
+    def execute(self, request: dict) -> dict:
+        """Executes a decoded client request and returns the result"""
+        operation = request.get("operation")
+        if operation == "status":
+            return self.status()
+
+        if operation == "shutdown":
+            self.stopped.set()
+            return {}
+
+        handler = getattr(self, f"operation_{operation}", None)
+        if handler is None:
+            raise ValueError(f"Unsupported broker operation: {operation}")
+
+        options = {option: request.get(option) for option in NETCONF_OPTIONS}
+        session = self.checkout(options)
+        with session.lock:
+            if not session.connected:
+                session.close()
+                session.connect(keepalive=self.keepalive)
+            session.last_used = time.monotonic()
+            session.requests += 1
+            return handler(session.manager, request)
+
+    def operation_get_config(self, m: manager.Manager, request: dict) -> dict:
+        if request.get("filter"):
+            configuration = m.get_config(
+                source=request["datastore"], filter=("subtree", request["filter"])
+            )
+        else:
+            configuration = m.get_config(source=request["datastore"])
+        return {"data_xml": configuration.data_xml}
+
+    def operation_get(self, m: manager.Manager, request: dict) -> dict:
+        if request.get("filter"):
+            reply = m.get(
+                filter=(request.get("filter_type") or "subtree", request["filter"])
+            )
+        else:
+            reply = m.get()
+        return {"data_xml": reply.data_xml}
+
+    def operation_get_schema(self, m: manager.Manager, request: dict) -> dict:
+        schema = m.get_schema(request["identifier"])
+        return {"data": schema.data}
+
+    def operation_server_capabilities(self, m: manager.Manager, request: dict) -> dict:
+        return {"capabilities": list(m.server_capabilities)}
+
+    def status(self) -> dict:
+        now = time.monotonic()
+        with self.lock:
+            sessions = list(self.sessions.values())
+        return {
+            "sessions": [
+                {
+                    "host": session.options["host"],
+                    "port": session.options["port"],
+                    "username": session.options["username"],
+                    "connected": session.connected,
+                    "session_id": (
+                        session.manager.session_id if session.connected else None
+                    ),
+                    "idle": round(now - session.last_used, 1),
+                    "requests": session.requests,
+                }
+                for session in sessions
+            ]
+        }
+
+    def maintain(self) -> None:
+        """Evicts idle sessions and drops sessions which are no longer connected until stopped"""
+        while not self.stopped.wait(self.keepalive):
+            now = time.monotonic()
+            with self.lock:
+                items = list(self.sessions.items())
+
+            for key, session in items:
+                if not session.lock.acquire(blocking=False):
+                    continue
+                try:
+                    host = f"{session.options['host']}:{session.options['port']}"
+                    if now - session.last_used > self.idle_timeout:
+                        logger.info(f"Evicting idle NETCONF session to {host}")
+                        session.close()
+                        with self.lock:
+                            self.sessions.pop(key, None)
+                    elif session.manager is not None and not session.connected:
+                        logger.warning(
+                            f"NETCONF session to {host} is no longer connected, it will be re-established on next use"
+                        )
+                        session.close()
+                finally:
+                    session.lock.release()
+
+    def close(self) -> None:
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+class BrokerRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        try:
+            request = json.loads(line)
+            response = {"result": self.server.broker.execute(request)}
+        except Exception as err:
+            logger.error(f"Broker request failed: {err}")
+            response = {"error": str(err) or err.__class__.__name__}
+
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class BrokerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, broker: SessionBroker):
+        self.broker = broker
+        # Another user must not be able to replace the socket, so its directory has to belong to this
+        # user (or root) and may only be writable by others when the sticky bit is set (eg. /tmp)
+        directory = os.path.dirname(os.path.abspath(socket_path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        status = os.stat(directory)
+        if status.st_uid not in (os.getuid(), 0) or (
+            status.st_mode & 0o022 and not status.st_mode & stat.S_ISVTX
+        ):
+            raise BrokerError(
+                f"{directory} must be owned by the current user and must not be writable by other users"
+            )
+
+        if os.path.exists(socket_path):
+            check_socket_owner(socket_path)
+            # Only remove the socket of a broker which is no longer running
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(socket_path)
+                except OSError:
+                    os.unlink(socket_path)
+                else:
+                    raise BrokerError(
+                        f"Session broker is already running on {socket_path}"
+                    )
+        # Requests contain credentials, only allow the owner to talk to the broker. The socket is
+        # created with these permissions so no request is accepted before they are set.
+        umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, BrokerRequestHandler)
+        finally:
+            os.umask(umask)
+
+
+def serve(socket_path: str, idle_timeout: int, keepalive: int) -> None:
+    """Runs the session broker in the foreground until interrupted or asked to shutdown
+
+    Args:
+        socket_path:    Path of the Unix socket to listen on
+        idle_timeout:   Seconds a session may stay unused before it is closed
+        keepalive:      Seconds between SSH keepalives and session health checks
+    """
+    broker = SessionBroker(idle_timeout=idle_timeout, keepalive=keepalive)
+    server = BrokerServer(socket_path, broker)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    maintainer = threading.Thread(target=broker.maintain, daemon=True)
+    maintainer.start()
+    signal.signal(signal.SIGTERM, lambda *args: broker.stopped.set())
+    logger.success(f"Session broker listening on {socket_path}")
+
+    try:
+        while not broker.stopped.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Stopping session broker and closing all NETCONF sessions")
+        broker.stopped.set()
+        server.shutdown()
+        server.server_close()
+        broker.close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional, Tuple
+
+from netconf_tool.helpers import build_module_index, fingerprint_capabilities
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "netconf_tool",
+)
+
+
+def write_json_atomic(path: Path, data) -> None:
+    """Writes data as JSON to a temporary file and moves it in place so readers never see a partial file
+
+    Args:
+        path:   Destination file
+        data:   JSON serializable object
+    """
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+    with tmp_path.open("w") as out_file:
+        json.dump(data, out_file)
+    os.replace(tmp_path, path)
+
+
+class SchemaCache:
+    """Persistent content addressed YANG schema cache keyed by module name and revision
+
+    Schemas are stored once per unique content (sha256) under objects/ and an index maps
+    module@revision to the object, so identical modules fetched from different devices are
+    only stored and downloaded once. Modules without a revision are never cached since there
+    is no way to tell if they changed.
+
+    Args:
+        cache_dir:      Root cache directory, schemas are stored in the schemas/ sub directory
+        max_size_mb:    Evict the least recently used schemas when the cache grows beyond this size
+        max_age_days:   Evict schemas which have not been used for this many days
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_size_mb: Optional[int] = None,
+        max_age_days: Optional[int] = None,
+    ):
+        self.directory = Path(cache_dir).joinpath("schemas")
+        self.objects = self.directory.joinpath("objects")
+        self.index_path = self.directory.joinpath("index.json")
+        self.max_size = max_size_mb * 1024 * 1024 if max_size_mb else None
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.removed = set()
+
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.index = self.load_index()
+
+    def load_index(self) -> dict:
+        try:
+            with self.index_path.open() as in_file:
+                return json.load(in_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    @staticmethod
+    def key(module: str, revision: str) -> str:
+        return f"{module}@{revision}"
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects.joinpath(digest[:2], digest)
+
+    def get(self, module: str, revision: Optional[str]) -> Optional[str]:
+        """Returns the cached schema text or None if the module/revision is not cached
+
+        Args:
+            module:     YANG module name
+            revision:   Revision of the module as advertised in the capability URI
+        """
+        if not revision:
+            return None
+
+        with self.lock:
+            entry = self.index.get(self.key(module, revision))
+            if entry:
+                try:
+                    data = self.object_path(entry["sha256"]).read_text()
+                except FileNotFoundError:
+                    data = None
+                    self.index.pop(self.key(module, revision), None)
+                    self.removed.add(self.key(module, revision))
+
+                if data is not None:
+                    entry["accessed"] = time.time()
+                    self.hits += 1
+                    return data
+
+            self.misses += 1
+            return None
+
+    def put(self, module: str, revision: Optional[str], data: str) -> None:
+        """Stores a schema in the cache
+
+        Args:
+            module:     YANG module name
+            revision:   Revision of the module as advertised in the capability URI
+            data:       Schema text returned by <get-schema>
+        """
+        if not revision:
+            return
+
+        encoded = data.encode()
+        digest = hashlib.sha256(encoded).hexdigest()
+        path = self.object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp_path = path.with_name(f".{digest}.{threading.get_ident()}")
+            tmp_path.write_bytes(encoded)
+            os.replace(tmp_path, path)
+
+        now = time.time()
+        with self.lock:
+            self.removed.discard(self.key(module, revision))
+            self.index[self.key(module, revision)] = {
+                "sha256": digest,
+                "size": len(encoded),
+                "stored": now,
+                "accessed": now,
+            }
+
+    def evict(self) -> int:
+        """Applies the age and size eviction policy and returns the number of entries removed"""
+        now = time.time()
+        removed = 0
+        with self.lock:
+            entries = sorted(self.index.items(), key=lambda item: item[1]["accessed"])
+            if self.max_age:
+                for key, entry in entries:
+                    if now - entry["accessed"] > self.max_age:
+                        del self.index[key]
+                        self.removed.add(key)
+                        removed += 1
+
+            if self.max_size:
+                references = Counter(entry["sha256"] for entry in self.index.values())
+                sizes = {
+                    entry["sha256"]: entry["size"] for entry in self.index.values()
+                }
+                total = sum(sizes.values())
+                for key, entry in entries:
+                    if total <= self.max_size:
+                        break
+                    if key not in self.index:
+                        continue
+                    del self.index[key]
+                    self.removed.add(key)
+                    removed += 1
+                    references[entry["sha256"]] -= 1
+                    if not references[entry["sha256"]]:
+                        total -= entry["size"]
+
+            referenced = {entry["sha256"] for entry in self.index.values()}
+
+        for path in self.objects.glob("*/*"):
+            if path.name not in referenced and not path.name.startswith("."):
+                path.unlink(missing_ok=True)
+        return removed
+
+    def save(self) -> None:
+        """Merges entries written by other processes, applies the eviction policy and persists the index"""
+        with self.lock:
+            for key, entry in self.load_index().items():
+                if key not in self.index and key not in self.removed:
+                    self.index[key] = entry
+        self.evict()
+        with self.lock:
+            write_json_atomic(self.index_path, self.index)
+
+
+class CapabilityCache:
+    """Persistent per device cache of the <hello> capability set and the parsed YANG module index
+
+    The capability URIs are only parsed again when the fingerprint of the capability set changes,
+    which also allows detecting when a device advertises different capabilities (eg. after an upgrade)
+
+    Args:
+        cache_dir:  Root cache directory, capabilities are stored in the capabilities/ sub directory
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.directory = Path(cache_dir).joinpath("capabilities")
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def device_path(self, host: str, port: int) -> Path:
+        return self.directory.joinpath(f"{host.replace(':', '_')}_{port}.json")
+
+    def get(self, host: str, port: int) -> Optional[dict]:
+        """Returns the cached record of a device or None if the device has not been seen before
+
+        Args:
+            host:   NETCONF Server
+            port:   Port of the NETCONF Server
+        """
+        try:
+            with self.device_path(host, port).open() as in_file:
+                return json.load(in_file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def update(self, host: str, port: int, capabilities: list) -> Tuple[dict, bool]:
+        """Stores the capability set of a device and returns the record and whether the capability set
+        changed since it was last cached
+
+        Args:
+            host:           NETCONF Server
+            port:           Port of the NETCONF Server
+            capabilities:   Capability URIs from the NETCONF <hello>
+        """
+        capabilities = list(capabilities)
+        fingerprint = fingerprint_capabilities(capabilities)
+        previous = self.get(host, port)
+        now = time.time()
+        if previous and previous["fingerprint"] == fingerprint:
+            previous["seen"] = now
+            write_json_atomic(self.device_path(host, port), previous)
+            return previous, False
+
+        record = {
+            "host": host,
+            "port": port,
+            "fingerprint": fingerprint,
+            "previous_fingerprint": previous["fingerprint"] if previous else None,
+            "changed": now,
+            "seen": now,
+            "capabilities": sorted(capabilities),
+            "modules": build_module_index(capabilities),
+        }
+        write_json_atomic(self.device_path(host, port), record)
+        return record, previous is not None
+
+
+class DeviceStateCache:
+    """Persistent per device state records used to detect configuration changes without retrieving the configuration
+
+    Each record of a device is a separate file with a single writer, get-config writes the fetch record
+    and the subscription forwarders write the subscription record, so processes never overwrite each
+    others fields.
+
+    Args:
+        cache_dir:  Root cache directory, state is stored in the state/ sub directory
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.directory = Path(cache_dir).joinpath("state")
+
+    def record_path(self, host: str, port: int, record: str) -> Path:
+        return self.directory.joinpath(
+            f"{host.replace(':', '_')}_{port}", f"{record}.json"
+        )
+
+    def get(self, host: str, port: int, record: str) -> dict:
+        """Returns a state record of a device, an empty dictionary if it doesn't exist
+
+        Args:
+            host:   NETCONF Server
+            port:   Port of the NETCONF Server
+            record: Name of the record (eg. fetch or subscription)
+        """
+        try:
+            with self.record_path(host, port, record).open() as in_file:
+                return json.load(in_file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def update(self, host: str, port: int, record: str, **fields) -> dict:
+        """Updates fields of a state record of a device and returns the record"""
+        path = self.record_path(host, port, record)
+        data = self.get(host, port, record)
+        data.update(fields)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(path, data)
+        return data
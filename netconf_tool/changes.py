@@ -0,0 +1,111 @@
+import hashlib
+import threading
+import time
+from typing import Optional
+
+from netconf_tool.cache import DeviceStateCache
+from netconf_tool.snapshots import normalize_config
+
+CONFIG_CHANGE_EVENT = "netconf-config-change"
+# How often the subscription forwarders record that they are still tracking a device and
+# after how long without a heartbeat the subscription record is no longer trusted
+HEARTBEAT_INTERVAL = 30
+HEARTBEAT_TIMEOUT = 120
+
+# Heartbeats and config changes of a device are written by different threads of a forwarder
+_subscription_lock = threading.Lock()
+
+
+def request_key(datastore: str, filter: Optional[str]) -> str:
+    """Identifies a get-config request, a fetch record is only reused for the same request"""
+    return hashlib.sha256(f"{datastore}\n{filter or ''}".encode()).hexdigest()
+
+
+def change_indicator(change_filter: str, data_xml: str) -> str:
+    """Returns the fingerprint of the reply to a <get> using the change filter (eg. a commit ID or
+    last change timestamp leaf)
+
+    Args:
+        change_filter:  Subtree filter used for the <get> operation
+        data_xml:       Data of the <get> reply as an XML string
+    """
+    return hashlib.sha256(
+        f"{change_filter}\n{normalize_config(data_xml)}".encode()
+    ).hexdigest()
+
+
+def unchanged_by_notifications(
+    state: DeviceStateCache, host: str, port: int, fetch: dict
+) -> bool:
+    """Returns True when a subscription forwarder has been tracking netconf-config-change notifications
+    of the device since before the last fetch and none was received since then
+
+    Args:
+        state:  Device state cache
+        host:   NETCONF Server
+        port:   Port of the NETCONF Server
+        fetch:  Fetch record of the device
+    """
+    subscription = state.get(host, port, "subscription")
+    if not fetch.get("fetched") or not subscription.get("since"):
+        return False
+    if subscription.get("lost"):
+        # Changes made while no forwarder was subscribed could have been missed
+        return False
+    if subscription["since"] > fetch["fetched"]:
+        # Changes made before the subscription was created could have been missed
+        return False
+    if time.time() - subscription.get("heartbeat", 0) > HEARTBEAT_TIMEOUT:
+        return False
+    changed = subscription.get("config_changed")
+    return changed is None or changed < fetch["fetched"]
+
+
+def record_subscription(
+    state: DeviceStateCache, host: str, port: int, since: float
+) -> None:
+    """Records that the forwarder subscribed to the notifications of a device at since"""
+    with _subscription_lock:
+        state.update(
+            host, port, "subscription", since=since, heartbeat=time.time(), lost=None
+        )
+
+
+def record_subscription_lost(state: DeviceStateCache, host: str, port: int) -> None:
+    """Records that the forwarder is no longer subscribed to a device, the subscription record isn't
+    trusted until the forwarder subscribes again"""
+    with _subscription_lock:
+        state.update(host, port, "subscription", lost=time.time())
+
+
+def record_subscription_replayed(
+    state: DeviceStateCache, host: str, port: int, since: float
+) -> None:
+    """Records that the notifications missed while the subscription was lost have been replayed, the
+    subscription covers the device since it was first recorded again
+
+    Args:
+        state:  Device state cache
+        host:   NETCONF Server
+        port:   Port of the NETCONF Server
+        since:  Time of the new subscription, used when the previous subscription wasn't lost by this tool
+    """
+    with _subscription_lock:
+        subscription = state.get(host, port, "subscription")
+        if subscription.get("lost") and subscription.get("since"):
+            since = subscription["since"]
+        state.update(
+            host, port, "subscription", since=since, heartbeat=time.time(), lost=None
+        )
+
+
+def record_heartbeat(state: DeviceStateCache, host: str, port: int) -> None:
+    """Records that the forwarder is still subscribed to a device, called every HEARTBEAT_INTERVAL"""
+    with _subscription_lock:
+        state.update(host, port, "subscription", heartbeat=time.time())
+
+
+def record_config_change(state: DeviceStateCache, host: str, port: int) -> None:
+    """Records that a netconf-config-change notification was received from a device"""
+    with _subscription_lock:
+        state.update(host, port, "subscription", config_changed=time.time())
@@ -1,13 +1,33 @@
 import click
-from pkg_resources import iter_entry_points
-from click_plugins import with_plugins
+from netconf_tool.lazy import LazyGroup, PLUGIN_ENTRY_POINT_GROUP
 
 
-@with_plugins(iter_entry_points("netconf_tool.plugins"))
-@click.group()
+# Groups are imported once they are used, add any group commands below here
+@click.group(
+    cls=LazyGroup,
+    plugin_group=PLUGIN_ENTRY_POINT_GROUP,
+    lazy_subcommands={
+        "bench": (
+            "netconf_tool.bench:netconf_tool_cli_bench",
+            "Reproducible benchmarks against a mock NETCONF server",
+        ),
+        "broker": (
+            "netconf_tool.broker:netconf_tool_cli_broker",
+            "Local session broker daemon that keeps NETCONF sessions warm",
+        ),
+        "operations": (
+            "netconf_tool.operations:netconf_tool_cli_operations",
+            "Perform standard NETCONF Operations (get, get-config, etc...)",
+        ),
+        "subscription": (
+            "netconf_tool.subscription:netconf_tool_cli_subscription",
+            "Tools to deal with <create-subscription> and notifications",
+        ),
+        "yangcli": (
+            "netconf_tool.yangcli:netconf_tool_cli_yangcli",
+            "Attempts to build a dynamic XML payload based on a CLI input",
+        ),
+    },
+)
 def cli():
     """CLI Application with plugin based architecture to interact with NETCONF Servers"""
-
-
-# Import any group commands below here
-from netconf_tool import operations, subscription, yangcli
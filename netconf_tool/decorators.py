@@ -1,6 +1,8 @@
 import click
 import functools
 from ncclient.devices import supported_devices_cfg
+from netconf_tool.broker.client import DEFAULT_BROKER_SOCKET
+from netconf_tool.cache import DEFAULT_CACHE_DIR
 
 
 def common_format_options(f):
@@ -59,6 +61,338 @@ def common_netconf_options(f):
         default="default",
     )
     @click.option("--hostkey-verify", help="Verify Host Keys", is_flag=True)
+    @click.option(
+        "--timings",
+        help="Print the time spent in every phase (TCP connect, SSH handshake and authentication, hello, RPCs, pretty printing and file I/O) and the bytes received to stderr when the command exits",
+        is_flag=True,
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        if not kwargs.pop("timings", False):
+            return f(*args, **kwargs)
+
+        from netconf_tool.timings import enable
+
+        timings = enable()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            click.echo(timings.summary(), err=True)
+
+    return wrapper_common_options
+
+
+def _check_session_engine(ctx, param, value):
+    from netconf_tool.aio import session_connect
+
+    try:
+        session_connect(value)
+    except ImportError as err:
+        raise click.BadParameter(str(err))
+    return value
+
+
+def common_session_engine_options(f):
+    @click.option(
+        "--engine",
+        "session_engine",
+        help="NETCONF session engine, ncclient runs a transport thread per session while asyncio runs all sessions on one event loop (requires asyncssh)",
+        type=click.Choice(["ncclient", "asyncio"]),
+        default="ncclient",
+        envvar="NETCONF_TOOL_ENGINE",
+        callback=_check_session_engine,
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def common_pipeline_options(f):
+    @click.option(
+        "--pipeline",
+        help="Number of RPCs kept in flight on every NETCONF session, 1 waits for every reply before sending the next RPC",
+        type=click.IntRange(min=1),
+        default=8,
+        show_default=True,
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def common_broker_options(f):
+    @click.option(
+        "--use-broker",
+        help="Route the RPC through a running session broker (netconf-tool broker start) instead of opening a new NETCONF session",
+        is_flag=True,
+    )
+    @click.option(
+        "--broker-socket",
+        help="Unix socket of the session broker",
+        type=str,
+        default=DEFAULT_BROKER_SOCKET,
+        envvar="NETCONF_TOOL_BROKER_SOCKET",
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def cache_dir_option(f):
+    @click.option(
+        "--cache-dir",
+        help="Directory of the local cache (device state, capabilities, schemas and compiled schema trees) shared across devices and runs",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        envvar="NETCONF_TOOL_CACHE_DIR",
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def common_cache_options(f):
+    @cache_dir_option
+    @click.option(
+        "--no-cache", help="Do not read from or write to the cache", is_flag=True
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def common_schema_cache_options(f):
+    @click.option(
+        "--cache-max-size",
+        help="Evict the least recently used cached YANG schemas when the cache exceeds this size in MB",
+        type=int,
+        default=512,
+    )
+    @click.option(
+        "--cache-max-age",
+        help="Evict cached YANG schemas which have not been used for this many days",
+        type=int,
+        default=90,
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def common_engine_options(f):
+    @click.option(
+        "--publisher-workers",
+        help="Number of threads publishing notifications to the destination",
+        type=click.IntRange(min=1),
+        default=1,
+    )
+    @click.option(
+        "--queue-size",
+        help="Maximum number of notifications held in memory between receiving and publishing",
+        type=click.IntRange(min=1),
+        default=10000,
+    )
+    @click.option(
+        "--backpressure",
+        help="What to do when the queue is full: block reading the NETCONF session, drop the oldest notification or spill to disk",
+        type=click.Choice(["block", "drop-oldest", "spill"]),
+        default="block",
+    )
+    @click.option(
+        "--spill-dir",
+        help="Directory used for the spill file when --backpressure is spill (defaults to the temp directory)",
+        type=click.Path(file_okay=False),
+    )
+    @click.option(
+        "--batch-size",
+        help="Publish notifications in batches of up to this many messages",
+        type=click.IntRange(min=1),
+        default=1,
+    )
+    @click.option(
+        "--batch-interval",
+        help="Maximum time in milliseconds a notification waits for its batch to fill up",
+        type=click.IntRange(min=0),
+        default=100,
+    )
+    @click.option(
+        "--stats-interval",
+        help="Log receive, queue and publish counters every N seconds (0 to disable)",
+        type=click.IntRange(min=0),
+        default=60,
+    )
+    @click.option(
+        "--metrics-port",
+        help="Expose the receive, publish, queue depth and publish latency counters in the Prometheus format on http://127.0.0.1:<port>/metrics (0 to disable)",
+        type=click.IntRange(min=0, max=65535),
+        default=0,
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def common_fan_in_options(f):
+    @click.option(
+        "--hosts-file",
+        help="File containing one NETCONF server per line (host, host:port or [ipv6]:port) to subscribe to from this process, --host is ignored when used",
+        type=click.Path(exists=True, dir_okay=False),
+    )
+    @click.option(
+        "--connect-workers",
+        help="Number of NETCONF sessions established concurrently when using --hosts-file",
+        type=click.IntRange(min=1),
+        default=50,
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def common_change_tracking_options(f):
+    @click.option(
+        "--track-config-changes",
+        help="Record netconf-config-change notifications in the device state cache so get-config --if-changed can skip unchanged devices, requires an unfiltered subscription to the NETCONF stream (no --stream, --filter or --yang-push)",
+        is_flag=True,
+    )
+    @cache_dir_option
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def common_reconnect_options(f):
+    @click.option(
+        "--replay",
+        help="Persist the eventTime of the last forwarded notification of every device in the cache directory and replay the missed notifications (RFC 5277 startTime) when subscribing again",
+        is_flag=True,
+    )
+    @click.option(
+        "--reconnect-backoff",
+        help="Seconds to wait before reconnecting a lost NETCONF session, doubled after every failed attempt",
+        type=click.FloatRange(min=0.1),
+        default=1,
+    )
+    @click.option(
+        "--reconnect-max-backoff",
+        help="Maximum seconds between reconnect attempts",
+        type=click.FloatRange(min=1),
+        default=300,
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def common_notification_filter_options(f):
+    @click.option(
+        "--stream",
+        help="Notification stream to subscribe to (defaults to the NETCONF stream)",
+        type=str,
+    )
+    @click.option(
+        "--filter",
+        help="Subtree filter (XML) or XPath expression selecting the notifications sent by the NETCONF server",
+        type=str,
+    )
+    @click.option(
+        "--event",
+        "events",
+        help="Only forward this event, either the event element name, {namespace}name or {namespace}* (can be used multiple times)",
+        type=str,
+        multiple=True,
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def common_encoding_options(f):
+    @click.option(
+        "--encoding",
+        help="Publish notifications as received (xml) or as a compact {host, eventTime, type, namespace, body} envelope (json, msgpack), optionally compressed (msgpack and zstd require the msgpack and zstandard packages)",
+        type=click.Choice(
+            [
+                "xml",
+                "json",
+                "msgpack",
+                "xml+gzip",
+                "xml+zstd",
+                "json+gzip",
+                "json+zstd",
+                "msgpack+gzip",
+                "msgpack+zstd",
+            ]
+        ),
+        default="xml",
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def common_yang_push_options(f):
+    @click.option(
+        "--yang-push",
+        help="Establish a YANG-Push subscription (RFC 8641) sending periodic or on-change updates of --yang-push-filter instead of using <create-subscription>",
+        type=click.Choice(["periodic", "on-change"]),
+    )
+    @click.option(
+        "--yang-push-filter",
+        help="Subtree filter (XML) or XPath expression selecting the datastore nodes pushed by --yang-push",
+        type=str,
+    )
+    @click.option(
+        "--yang-push-datastore",
+        help="Datastore the YANG-Push updates are taken from",
+        type=str,
+        default="operational",
+    )
+    @click.option(
+        "--yang-push-period",
+        help="Milliseconds between periodic updates, or dampening period of on-change updates",
+        type=click.IntRange(min=0),
+        default=1000,
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+def common_schema_tree_options(f):
+    @click.option(
+        "--yang-dir",
+        help="Directory of YANG modules (eg. exported by get-yang-models) used to resolve namespaces and validate the command without connecting",
+        type=click.Path(exists=True, file_okay=False),
+        envvar="NETCONF_TOOL_YANG_DIR",
+    )
+    @cache_dir_option
     @functools.wraps(f)
     def wrapper_common_options(*args, **kwargs):
         return f(*args, **kwargs)
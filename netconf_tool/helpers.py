@@ -1,5 +1,9 @@
-from typing import List
+import hashlib
+import re
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
 from urllib.parse import urlparse
+from xml.parsers import expat
 from xml.etree import ElementTree
 
 
@@ -23,6 +27,191 @@ def parse_rfc3986_uri(uri: str) -> dict:
     return uri_object
 
 
+def fingerprint_capabilities(capabilities: Iterable[str]) -> str:
+    """Returns a sha256 fingerprint of a capability set which does not depend on the order the server advertised them
+
+    Args:
+        capabilities:   Capability URIs from the NETCONF <hello>
+    """
+    digest = hashlib.sha256()
+    for capability in sorted(set(capabilities)):
+        digest.update(capability.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def build_module_index(capabilities: Iterable[str]) -> dict:
+    """Parses capability URIs which advertise a YANG module and returns a dictionary keyed by module name
+
+    Each module contains the revision, namespace, features and deviations advertised in the URI
+
+    Args:
+        capabilities:   Capability URIs from the NETCONF <hello>
+    """
+    modules = {}
+    for capability in capabilities:
+        capability = parse_rfc3986_uri(uri=capability)
+        queries = capability.get("queries") or {}
+        if not queries.get("module"):
+            continue
+
+        namespace = capability["scheme"]
+        if capability["netloc"]:
+            namespace += f"://{capability['netloc']}"
+        else:
+            namespace += ":"
+        namespace += capability["path"]
+
+        modules[queries["module"]] = {
+            "revision": queries.get("revision"),
+            "namespace": namespace,
+            "features": (
+                queries["features"].split(",") if queries.get("features") else []
+            ),
+            "deviations": (
+                queries["deviations"].split(",") if queries.get("deviations") else []
+            ),
+        }
+    return modules
+
+
+def parse_hosts_file(path: str, default_port: int) -> List[Tuple[str, int]]:
+    """Parses an inventory file containing one NETCONF server per line and returns a list of (host, port)
+
+    Lines may be in the format of host, host:port or [ipv6]:port. Empty lines and lines starting with # are ignored
+
+    Args:
+        path:           Path to the inventory file
+        default_port:   Port to use when a line does not specify one
+
+    Raises:
+        ValueError: A line has an invalid port, the message names the file and line number
+    """
+    hosts = []
+    with open(path) as in_file:
+        for number, line in enumerate(in_file, start=1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+
+            host, port = line, default_port
+            try:
+                if line.startswith("["):
+                    host, _, remainder = line[1:].partition("]")
+                    if remainder.startswith(":"):
+                        port = int(remainder[1:])
+                elif line.count(":") == 1:
+                    host, port = line.split(":")
+                    port = int(port)
+                if not 0 < port < 65536:
+                    raise ValueError(f"port {port} is out of range")
+            except ValueError as err:
+                raise ValueError(
+                    f"Inventory file {path} line {number}: invalid host {line!r} ({err})"
+                )
+
+            hosts.append((host, port))
+    return hosts
+
+
+def resolve_hosts(
+    hosts_file: Optional[str], host: str, port: int
+) -> List[Tuple[str, int]]:
+    """Returns the (host, port) of every NETCONF server of the inventory file, or of host when no
+    inventory file is used
+
+    Args:
+        hosts_file: Path to the inventory file, see parse_hosts_file
+        host:       NETCONF Server used without an inventory file
+        port:       Port of host and default port of the inventory file
+
+    Raises:
+        ValueError: A line of the inventory file has an invalid port
+    """
+    if hosts_file:
+        return parse_hosts_file(hosts_file, default_port=port)
+    return [(host, port)]
+
+
+class _EventTypeFound(Exception):
+    pass
+
+
+def notification_event(notification_xml: str) -> Tuple[Optional[str], str]:
+    """Returns the namespace and local name of the event element of a NETCONF <notification/>
+    (eg. ("urn:ietf:params:xml:ns:yang:ietf-netconf-notifications", "netconf-config-change")), parsing
+    stops at the event element so the rest of the notification isn't parsed
+
+    Args:
+        notification_xml:   Notification XML as received from the NETCONF server
+    """
+    depth = 0
+
+    def start(name, attrs):
+        nonlocal depth
+        depth += 1
+        namespace, _, local_name = name.rpartition(" ")
+        if depth == 2 and local_name != "eventTime":
+            raise _EventTypeFound(namespace or None, local_name)
+
+    def end(name):
+        nonlocal depth
+        depth -= 1
+
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    try:
+        parser.Parse(notification_xml, True)
+    except _EventTypeFound as found:
+        return found.args
+    except expat.ExpatError:
+        pass
+    return None, "unknown"
+
+
+def notification_event_type(notification_xml: str) -> str:
+    """Returns the local name of the event element of a NETCONF <notification/> (eg. netconf-config-change)
+
+    Args:
+        notification_xml:   Notification XML as received from the NETCONF server
+    """
+    return notification_event(notification_xml)[1]
+
+
+EVENT_TIME_PATTERN = re.compile(
+    r"<(?:[\w.-]+:)?eventTime(?:\s[^>]*)?>\s*([^<\s]+)\s*</"
+)
+EVENT_TIME_FRACTION_PATTERN = re.compile(r"\.(\d+)")
+
+
+def notification_event_time(notification_xml: str) -> Optional[str]:
+    """Returns the eventTime of a NETCONF <notification/> as sent by the server or None if it is missing
+
+    Args:
+        notification_xml:   Notification XML as received from the NETCONF server
+    """
+    match = EVENT_TIME_PATTERN.search(notification_xml)
+    return match.group(1) if match else None
+
+
+def parse_event_time(event_time: str) -> datetime:
+    """Parses an RFC 3339 date and time (eg. the eventTime of a notification) into an aware datetime,
+    fractions beyond microseconds are truncated and a missing offset is treated as UTC
+
+    Args:
+        event_time: RFC 3339 date and time
+    """
+    value = event_time.strip().replace("Z", "+00:00").replace("z", "+00:00")
+    value = EVENT_TIME_FRACTION_PATTERN.sub(
+        lambda match: "." + match.group(1)[:6].ljust(6, "0"), value, count=1
+    )
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
 def build_xml_from_cli_commands(command: str) -> str:
     """Builds an XML tree from CLI like commands, performs no validation and is a hack function
 
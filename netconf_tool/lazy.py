@@ -0,0 +1,161 @@
+import hashlib
+import importlib
+import json
+import os
+import sys
+from pathlib import Path
+import click
+from click_plugins.core import BrokenCommand
+
+PLUGIN_ENTRY_POINT_GROUP = "netconf_tool.plugins"
+
+
+def _sys_path_fingerprint() -> str:
+    # Installing, upgrading or removing a distribution adds or removes a *.dist-info directory
+    # which changes the modification time of the directory on sys.path it is installed in
+    fingerprint = hashlib.sha256(sys.executable.encode())
+    for entry in sys.path:
+        try:
+            mtime = os.stat(entry or ".").st_mtime_ns
+        except OSError:
+            continue
+        fingerprint.update(f"{entry}:{mtime}\n".encode())
+    return fingerprint.hexdigest()
+
+
+def _scan_entry_points(group: str) -> dict:
+    from importlib.metadata import entry_points
+
+    try:
+        found = entry_points(group=group)
+    except TypeError:
+        # Python < 3.10 returns a dictionary of groups
+        found = entry_points().get(group, [])
+
+    plugins = {}
+    for entry_point in found:
+        dist = getattr(entry_point, "dist", None)
+        plugins[entry_point.name] = {
+            "value": entry_point.value,
+            "dist": dist.metadata["Name"] if dist else None,
+        }
+    return plugins
+
+
+def plugin_entry_points(group: str = PLUGIN_ENTRY_POINT_GROUP) -> dict:
+    """Returns the plugins registered under an entry point group as {name: {value, dist}}
+
+    Scanning the metadata of every installed distribution is slow, so the result is cached in the
+    netconf_tool cache directory and only scanned again once the directories on sys.path change.
+
+    Args:
+        group:  Entry point group name
+    """
+    from netconf_tool.cache import DEFAULT_CACHE_DIR, write_json_atomic
+
+    cache_dir = Path(os.environ.get("NETCONF_TOOL_CACHE_DIR", DEFAULT_CACHE_DIR))
+    index_file = cache_dir / "entry_points.json"
+    fingerprint = _sys_path_fingerprint()
+
+    try:
+        with index_file.open() as in_file:
+            index = json.load(in_file)
+        if index["fingerprint"] == fingerprint and group in index["groups"]:
+            return index["groups"][group]
+    except (OSError, ValueError, KeyError, TypeError):
+        index = {}
+
+    if index.get("fingerprint") != fingerprint:
+        index = {"fingerprint": fingerprint, "groups": {}}
+    index["groups"][group] = _scan_entry_points(group)
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(index_file, index)
+    except OSError:
+        pass
+    return index["groups"][group]
+
+
+class LazyGroup(click.Group):
+    """click Group which only imports the module of a subcommand once the subcommand is used
+
+    The help output uses the short help defined next to the import path, so listing the commands of a
+    group does not import any of them. Plugins registered under plugin_group are loaded the same way,
+    a plugin which fails to load is replaced by a command explaining the error.
+
+    Args:
+        lazy_subcommands:   Dictionary of {name: (import path as "module:attribute", short help)}
+        plugin_group:       Entry point group of plugins adding commands to this group
+    """
+
+    def __init__(
+        self,
+        *args,
+        lazy_subcommands: dict = None,
+        plugin_group: str = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+        self.plugin_group = plugin_group
+        self._plugins = None
+
+    @property
+    def plugins(self) -> dict:
+        if self._plugins is None:
+            self._plugins = (
+                plugin_entry_points(self.plugin_group) if self.plugin_group else {}
+            )
+        return self._plugins
+
+    def list_commands(self, ctx: click.Context) -> list:
+        return sorted(
+            set(self.commands) | set(self.lazy_subcommands) | set(self.plugins)
+        )
+
+    def get_command(self, ctx: click.Context, cmd_name: str):
+        if cmd_name not in self.commands:
+            if cmd_name in self.lazy_subcommands:
+                import_path = self.lazy_subcommands[cmd_name][0]
+                self.add_command(self._import(import_path), cmd_name)
+            elif cmd_name in self.plugins:
+                try:
+                    command = self._import(self.plugins[cmd_name]["value"])
+                except Exception:
+                    # Same behaviour as click_plugins, a broken plugin doesn't take down the CLI
+                    command = BrokenCommand(cmd_name)
+                self.add_command(command, cmd_name)
+        return self.commands.get(cmd_name)
+
+    @staticmethod
+    def _import(import_path: str):
+        module_name, _, attribute = import_path.partition(":")
+        command = importlib.import_module(module_name)
+        for name in attribute.split("."):
+            command = getattr(command, name)
+        return command
+
+    def format_commands(self, ctx: click.Context, formatter) -> None:
+        names = self.list_commands(ctx)
+        if not names:
+            return
+
+        limit = formatter.width - 6 - max(len(name) for name in names)
+        rows = []
+        for name in names:
+            if name in self.commands:
+                command = self.commands[name]
+                if command.hidden:
+                    continue
+                short_help = command.get_short_help_str(limit)
+            elif name in self.lazy_subcommands:
+                short_help = self.lazy_subcommands[name][1]
+            else:
+                dist = self.plugins[name]["dist"]
+                short_help = f"Plugin provided by {dist}" if dist else "Plugin"
+            rows.append((name, short_help))
+
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
@@ -0,0 +1,399 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+
+class Histogram:
+    """Cumulative histogram of observed values like a Prometheus histogram, not thread safe on its own
+
+    Args:
+        buckets:    Sorted upper bounds of the buckets, +Inf is added
+    """
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def snapshot(self) -> dict:
+        cumulative = []
+        total = 0
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return {
+            "buckets": list(zip(self.buckets, cumulative)),
+            "count": self.count,
+            "sum": self.sum,
+        }
+
+
+class PublishStats:
+    """Thread safe counters for notifications published to a message broker
+
+    Tracks the number of published messages/batches, the publish rate since start and the
+    latency of each broker round trip (one publish or one pipelined batch).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.published = 0
+        self.failed = 0
+        self.batches = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_histogram = Histogram()
+
+    def record(self, count: int, latency: float) -> None:
+        """Records a successful broker round trip
+
+        Args:
+            count:      Number of messages published in the round trip
+            latency:    Duration of the round trip in seconds
+        """
+        with self.lock:
+            self.published += count
+            self.batches += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            self.latency_histogram.observe(latency)
+
+    def record_failure(self, count: int) -> None:
+        with self.lock:
+            self.failed += count
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                "published": self.published,
+                "failed": self.failed,
+                "batches": self.batches,
+                "rate": self.published / elapsed if elapsed else 0.0,
+                "latency_avg": (
+                    self.latency_total / self.batches if self.batches else 0.0
+                ),
+                "latency_max": self.latency_max,
+            }
+
+    def summary(self) -> str:
+        stats = self.snapshot()
+        return (
+            f"published={stats['published']} failed={stats['failed']} rate={stats['rate']:.1f}/s "
+            f"batches={stats['batches']} publish_latency_avg={stats['latency_avg'] * 1000:.2f}ms "
+            f"publish_latency_max={stats['latency_max'] * 1000:.2f}ms"
+        )
+
+
+class ForwarderStats(PublishStats):
+    """Publish counters extended with the receive side and queue of a notification forwarder
+
+    Lag is the time between a notification being received from the NETCONF session and it
+    being published to the broker, which includes the time spent waiting in the queue. For YANG-Push
+    updates the end to end latency is measured from the eventTime set by the NETCONF server, which
+    assumes the clocks of the server and the forwarder are synchronized.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.received = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.suppressed = 0
+        self.filtered = 0
+        self.reconnects = 0
+        self.updates = 0
+        self.update_latency_total = 0.0
+        self.update_latency_max = 0.0
+        self.depth = 0
+        self.depth_max = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.lag_histogram = Histogram()
+
+    def record_received(self, depth: int) -> None:
+        with self.lock:
+            self.received += 1
+        self.update_depth(depth)
+
+    def update_depth(self, depth: int) -> None:
+        with self.lock:
+            self.depth = depth
+            self.depth_max = max(self.depth_max, depth)
+
+    def record_dropped(self) -> None:
+        with self.lock:
+            self.dropped += 1
+
+    def record_spilled(self) -> None:
+        with self.lock:
+            self.spilled += 1
+
+    def record_suppressed(self) -> None:
+        with self.lock:
+            self.suppressed += 1
+
+    def record_filtered(self) -> None:
+        with self.lock:
+            self.filtered += 1
+
+    def record_reconnect(self) -> None:
+        with self.lock:
+            self.reconnects += 1
+
+    def record_lag(self, lags: list) -> None:
+        with self.lock:
+            self.lag_total += sum(lags)
+            self.lag_max = max(self.lag_max, *lags)
+            for lag in lags:
+                self.lag_histogram.observe(lag)
+
+    def record_updates(self, latencies: list) -> None:
+        """Records published YANG-Push updates and their end to end latency in seconds"""
+        with self.lock:
+            self.updates += len(latencies)
+            self.update_latency_total += sum(latencies)
+            self.update_latency_max = max(self.update_latency_max, *latencies)
+
+    def snapshot(self) -> dict:
+        stats = super().snapshot()
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            stats.update(
+                {
+                    "received": self.received,
+                    "dropped": self.dropped,
+                    "spilled": self.spilled,
+                    "suppressed": self.suppressed,
+                    "filtered": self.filtered,
+                    "reconnects": self.reconnects,
+                    "queue_depth": self.depth,
+                    "queue_depth_max": self.depth_max,
+                    "lag_avg": (
+                        self.lag_total / self.published if self.published else 0.0
+                    ),
+                    "lag_max": self.lag_max,
+                    "updates": self.updates,
+                    "update_rate": self.updates / elapsed if elapsed else 0.0,
+                    "update_latency_avg": (
+                        self.update_latency_total / self.updates
+                        if self.updates
+                        else 0.0
+                    ),
+                    "update_latency_max": self.update_latency_max,
+                }
+            )
+        return stats
+
+    def summary(self) -> str:
+        stats = self.snapshot()
+        updates = (
+            f"updates={stats['updates']} update_rate={stats['update_rate']:.1f}/s "
+            f"update_latency_avg={stats['update_latency_avg'] * 1000:.2f}ms "
+            f"update_latency_max={stats['update_latency_max'] * 1000:.2f}ms "
+            if stats["updates"]
+            else ""
+        )
+        return (
+            updates
+            + f"received={stats['received']} dropped={stats['dropped']} spilled={stats['spilled']} "
+            f"filtered={stats['filtered']} duplicates={stats['suppressed']} reconnects={stats['reconnects']} "
+            f"queue_depth={stats['queue_depth']} queue_depth_max={stats['queue_depth_max']} "
+            f"lag_avg={stats['lag_avg'] * 1000:.2f}ms lag_max={stats['lag_max'] * 1000:.2f}ms "
+            + super().summary()
+        )
+
+
+def prometheus_text(stats: ForwarderStats, sessions: Callable = None) -> str:
+    """Returns the forwarder counters in the Prometheus text exposition format
+
+    Args:
+        stats:      Counters of the forwarding engine
+        sessions:   Returns the number of connected NETCONF sessions
+    """
+    snapshot = stats.snapshot()
+    with stats.lock:
+        histograms = {
+            "publish_latency_seconds": (
+                "Duration of a broker round trip (one publish or one batch)",
+                stats.latency_histogram.snapshot(),
+            ),
+            "notification_lag_seconds": (
+                "Time between receiving a notification and publishing it, including the time in the queue",
+                stats.lag_histogram.snapshot(),
+            ),
+        }
+
+    metrics = [
+        (
+            "notifications_received_total",
+            "counter",
+            "Notifications received from NETCONF sessions",
+            snapshot["received"],
+        ),
+        (
+            "notifications_published_total",
+            "counter",
+            "Notifications published to the broker",
+            snapshot["published"],
+        ),
+        (
+            "notifications_failed_total",
+            "counter",
+            "Notifications the broker failed to publish",
+            snapshot["failed"],
+        ),
+        (
+            "notifications_dropped_total",
+            "counter",
+            "Notifications dropped by --backpressure drop-oldest",
+            snapshot["dropped"],
+        ),
+        (
+            "notifications_spilled_total",
+            "counter",
+            "Notifications spilled to disk by --backpressure spill",
+            snapshot["spilled"],
+        ),
+        (
+            "notifications_filtered_total",
+            "counter",
+            "Notifications not matching --event",
+            snapshot["filtered"],
+        ),
+        (
+            "notifications_duplicate_total",
+            "counter",
+            "Replayed notifications which were already forwarded",
+            snapshot["suppressed"],
+        ),
+        ("publish_batches_total", "counter", "Broker round trips", snapshot["batches"]),
+        (
+            "session_reconnects_total",
+            "counter",
+            "Lost NETCONF sessions",
+            snapshot["reconnects"],
+        ),
+        (
+            "queue_depth",
+            "gauge",
+            "Notifications waiting to be published",
+            snapshot["queue_depth"],
+        ),
+        (
+            "queue_depth_max",
+            "gauge",
+            "Highest number of notifications waiting to be published",
+            snapshot["queue_depth_max"],
+        ),
+    ]
+    if sessions is not None:
+        metrics.append(
+            ("sessions_connected", "gauge", "Connected NETCONF sessions", sessions())
+        )
+
+    lines = []
+    for name, metric_type, description, value in metrics:
+        lines += [
+            f"# HELP netconf_tool_{name} {description}",
+            f"# TYPE netconf_tool_{name} {metric_type}",
+            f"netconf_tool_{name} {value}",
+        ]
+    for name, (description, histogram) in histograms.items():
+        lines += [
+            f"# HELP netconf_tool_{name} {description}",
+            f"# TYPE netconf_tool_{name} histogram",
+        ]
+        lines += [
+            f'netconf_tool_{name}_bucket{{le="{bound}"}} {count}'
+            for bound, count in histogram["buckets"]
+        ]
+        lines += [
+            f'netconf_tool_{name}_bucket{{le="+Inf"}} {histogram["count"]}',
+            f"netconf_tool_{name}_sum {histogram['sum']}",
+            f"netconf_tool_{name}_count {histogram['count']}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """HTTP server exposing the forwarder counters on /metrics for Prometheus, runs in a daemon thread
+
+    Args:
+        stats:      Counters of the forwarding engine
+        port:       Port to listen on
+        address:    Address to listen on, local only by default
+        sessions:   Returns the number of connected NETCONF sessions
+    """
+
+    def __init__(
+        self,
+        stats: ForwarderStats,
+        port: int,
+        address: str = "127.0.0.1",
+        sessions: Callable = None,
+    ):
+        metrics_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = prometheus_text(
+                    metrics_server.stats, metrics_server.sessions
+                ).encode()
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+                )
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.stats = stats
+        self.sessions = sessions
+        self.server = ThreadingHTTPServer((address, port), Handler)
+        self.server.daemon_threads = True
+        self.address, self.port = self.server.server_address[:2]
+
+    def start(self) -> None:
+        threading.Thread(
+            target=self.server.serve_forever, name="metrics", daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,9 +1,41 @@
-from netconf_tool.cli import cli
+import click
+from netconf_tool.lazy import LazyGroup
 
 
-@cli.group("operations")
+# Commands are imported once they are used
+@click.group(
+    "operations",
+    cls=LazyGroup,
+    lazy_subcommands={
+        "get-config": (
+            "netconf_tool.operations.get_config:cli_operations_get_config",
+            "Retrieves configuration using <get-config>...",
+        ),
+        "get": (
+            "netconf_tool.operations.get:cli_operations_get",
+            "Retrieves state data using <get> with one or more...",
+        ),
+        "get-yang-model": (
+            "netconf_tool.operations.get_yang:cli_operations_get_yang_model",
+            "Gathers a specific YANG Model and writes it...",
+        ),
+        "get-yang-models": (
+            "netconf_tool.operations.get_yang:cli_operations_get_yang_models",
+            "Gathers all YANG Models present on the device...",
+        ),
+        "list-cached-modules": (
+            "netconf_tool.operations.capabilities:netconf_tool_cli_operations_list_cached_modules",
+            "Print or Export the YANG modules, revisions...",
+        ),
+        "snapshot": (
+            "netconf_tool.operations.snapshot:netconf_tool_cli_operations_snapshot",
+            "List and compare configuration snapshots",
+        ),
+        "list-server-capabilities": (
+            "netconf_tool.operations.capabilities:netconf_tool_cli_operations_list_server_capabilities",
+            "Print or Export all NETCONF Server capabilities",
+        ),
+    },
+)
 def netconf_tool_cli_operations() -> None:
     """Perform standard NETCONF Operations (get, get-config, edit-config, etc...)"""
-
-
-from netconf_tool.operations import capabilities, get_config, get_yang
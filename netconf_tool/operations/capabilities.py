@@ -1,16 +1,34 @@
 import click
 import json
-from ncclient import manager
+import re
+from datetime import datetime
 from ncclient.transport.errors import SSHError, AuthenticationError
 from loguru import logger
 
 from netconf_tool.operations import netconf_tool_cli_operations
-from netconf_tool.decorators import common_netconf_options
+from netconf_tool.broker.client import BrokerClient, BrokerError
+from netconf_tool.cache import CapabilityCache
+from netconf_tool.decorators import (
+    cache_dir_option,
+    common_broker_options,
+    common_cache_options,
+    common_netconf_options,
+    common_session_engine_options,
+)
+from netconf_tool.aio import session_connect
 from netconf_tool.helpers import parse_rfc3986_uri
 
 
 @netconf_tool_cli_operations.command("list-server-capabilities")
 @common_netconf_options
+@common_broker_options
+@common_cache_options
+@common_session_engine_options
+@click.option(
+    "--from-cache",
+    help="Use the capabilities cached from a previous run instead of connecting to the NETCONF server",
+    is_flag=True,
+)
 @click.option(
     "--export-json",
     help="Export server capabilities into RFC3986 compliant URIs into a JSON file",
@@ -19,47 +37,156 @@ from netconf_tool.helpers import parse_rfc3986_uri
 def netconf_tool_cli_operations_list_server_capabilities(
     host: str,
     port: int,
-    timout: int,
+    timeout: int,
     username: str,
     password: str,
     device_handler: str,
     hostkey_verify: bool,
+    use_broker: bool,
+    broker_socket: str,
+    cache_dir: str,
+    no_cache: bool,
+    session_engine: str,
+    from_cache: bool,
     export_json: str,
 ):
     """Print or Export all NETCONF Server capabilities"""
-    logger.info(f"Attempting to establish NETCONF session to {host}:{port}")
     try:
-        with manager.connect(
-            host=host,
-            port=port,
-            timeout=timeout,
-            username=username,
-            password=password,
-            device_params={"name": device_handler},
-            hostkey_verify=hostkey_verify,
-        ) as m:
-            logger.success(
-                f"Established NETCONF connection to {host}:{port} (Session ID: {m.session_id})"
-            )
-            server_capabilities = m.server_capabilities
-            if not export_json:
-                for capability in server_capabilities:
-                    print(capability)
+        if from_cache:
+            record = CapabilityCache(cache_dir).get(host, port)
+            if not record:
+                logger.error(
+                    f"No cached capabilities found for {host}:{port}, run this command without --from-cache first"
+                )
                 exit()
 
-            capabilities = []
-            for capability in server_capabilities:
-                capability = parse_rfc3986_uri(uri=capability)
-                capabilities.append(capability)
-
             logger.info(
-                f"Exporting {len(capabilities)} capabilities to JSON file: {export_json}"
+                f"Using capabilities of {host}:{port} cached at {datetime.fromtimestamp(record['seen']):%Y-%m-%d %H:%M:%S}"
+            )
+            server_capabilities = record["capabilities"]
+        elif use_broker:
+            server_capabilities = BrokerClient(broker_socket).server_capabilities(
+                host=host,
+                port=port,
+                timeout=timeout,
+                username=username,
+                password=password,
+                device_handler=device_handler,
+                hostkey_verify=hostkey_verify,
             )
-            with open(export_json, "w") as out_file:
-                json.dump(capabilities, out_file, indent=4)
+        else:
+            logger.info(f"Attempting to establish NETCONF session to {host}:{port}")
+            with session_connect(session_engine)(
+                host=host,
+                port=port,
+                timeout=timeout,
+                username=username,
+                password=password,
+                device_params={"name": device_handler},
+                hostkey_verify=hostkey_verify,
+            ) as m:
+                logger.success(
+                    f"Established NETCONF connection to {host}:{port} (Session ID: {m.session_id})"
+                )
+                server_capabilities = list(m.server_capabilities)
+    except BrokerError as err:
+        logger.error(err)
+        exit()
     except SSHError as err:
         logger.error(err)
+        exit()
     except AuthenticationError as err:
         logger.error("Unable to authenticate to NETCONF server")
+        exit()
     except Exception as err:
         logger.error(f"Generic Exception caught: {err}")
+        exit()
+
+    if not from_cache and not no_cache:
+        record, changed = CapabilityCache(cache_dir).update(
+            host, port, server_capabilities
+        )
+        if changed:
+            logger.warning(
+                f"Capability set of {host}:{port} changed since it was last seen (fingerprint {record['previous_fingerprint'][:12]} -> {record['fingerprint'][:12]})"
+            )
+
+    if not export_json:
+        for capability in server_capabilities:
+            print(capability)
+        exit()
+
+    capabilities = []
+    for capability in server_capabilities:
+        capability = parse_rfc3986_uri(uri=capability)
+        capabilities.append(capability)
+
+    logger.info(
+        f"Exporting {len(capabilities)} capabilities to JSON file: {export_json}"
+    )
+    with open(export_json, "w") as out_file:
+        json.dump(capabilities, out_file, indent=4)
+
+
+@netconf_tool_cli_operations.command("list-cached-modules")
+@click.option(
+    "--host",
+    help="IP Address of NETCONF Server to look up in the capability cache",
+    type=str,
+    default="127.0.0.1",
+    required=True,
+)
+@click.option(
+    "--port",
+    help="Port of NETCONF Server to look up in the capability cache",
+    type=int,
+    default=830,
+    required=True,
+)
+@cache_dir_option
+@click.option(
+    "--regex", help="Only match modules with this regex pattern", type=str, default=""
+)
+@click.option(
+    "--export-json",
+    help="Export the cached module index (revision, namespace, features, deviations) into a JSON file",
+    type=str,
+)
+def netconf_tool_cli_operations_list_cached_modules(
+    host: str,
+    port: int,
+    cache_dir: str,
+    regex: str,
+    export_json: str,
+):
+    """Print or Export the YANG modules, revisions and features of a device from the capability cache without connecting to it"""
+    record = CapabilityCache(cache_dir).get(host, port)
+    if not record:
+        logger.error(
+            f"No cached capabilities found for {host}:{port}, run list-server-capabilities or get-yang-models first"
+        )
+        exit()
+
+    logger.info(
+        f"Capability set {record['fingerprint'][:12]} of {host}:{port} last changed {datetime.fromtimestamp(record['changed']):%Y-%m-%d %H:%M:%S}, last seen {datetime.fromtimestamp(record['seen']):%Y-%m-%d %H:%M:%S}"
+    )
+    regex_pattern = re.compile(regex)
+    modules = {
+        name: module
+        for name, module in record["modules"].items()
+        if re.match(regex_pattern, name)
+    }
+
+    if export_json:
+        logger.info(f"Exporting {len(modules)} modules to JSON file: {export_json}")
+        with open(export_json, "w") as out_file:
+            json.dump(modules, out_file, indent=4)
+        exit()
+
+    for name, module in sorted(modules.items()):
+        line = f"{name}@{module['revision']}" if module["revision"] else name
+        if module["features"]:
+            line += f" features={','.join(module['features'])}"
+        if module["deviations"]:
+            line += f" deviations={','.join(module['deviations'])}"
+        print(line)
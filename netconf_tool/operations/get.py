@@ -0,0 +1,468 @@
+import click
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Tuple
+from ncclient.transport.errors import SSHError, AuthenticationError
+from ncclient.xml_ import BASE_NS_1_0, etree, qualify
+from loguru import logger
+
+from netconf_tool.operations import netconf_tool_cli_operations
+from netconf_tool.broker.client import BrokerClient, BrokerError
+from netconf_tool.decorators import (
+    common_broker_options,
+    common_format_options,
+    common_netconf_options,
+    common_pipeline_options,
+    common_session_engine_options,
+)
+from netconf_tool.aio import session_connect
+from netconf_tool.helpers import parse_hosts_file
+from netconf_tool.pipeline import DEFAULT_PIPELINE_DEPTH, RPCPipeline
+from netconf_tool.streaming import export_data, write_json, write_pretty_xml
+
+
+def split_xpath_union(expression: str) -> List[str]:
+    """Splits an XPath expression on the top level | operators (eg. /a | /b[c='x|y'] -> /a, /b[c='x|y'])"""
+    parts = []
+    depth = 0
+    quote = None
+    start = 0
+    for i, char in enumerate(expression):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char in "[(":
+            depth += 1
+        elif char in "])":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            parts.append(expression[start:i].strip())
+            start = i + 1
+    parts.append(expression[start:].strip())
+    return [part for part in parts if part]
+
+
+def shard_filters(filters: List[str]) -> List[Tuple[str, str]]:
+    """Splits filters into the smallest independent <get> filters, every top level element of a subtree
+    filter and every path of an XPath union becomes its own shard
+
+    Filters starting with < are subtree filters (one or more sibling elements), anything else is an XPath
+    expression which requires the :xpath capability. Duplicate shards are only requested once.
+
+    Args:
+        filters:    Subtree filters or XPath expressions
+
+    Raises:
+        ValueError: A subtree filter is not valid XML
+    """
+    shards = []
+    for filter in filters:
+        filter = filter.strip()
+        if not filter.startswith("<"):
+            shards += [("xpath", path) for path in split_xpath_union(filter)]
+            continue
+
+        try:
+            root = etree.fromstring(f"<filter>{filter}</filter>")
+        except etree.XMLSyntaxError as err:
+            raise ValueError(f"{filter}: {err}")
+        if (root.text or "").strip():
+            raise ValueError(f"{filter}: text outside of an element")
+        for element in root:
+            if isinstance(element.tag, str):
+                shards.append(
+                    (
+                        "subtree",
+                        etree.tostring(element, encoding="unicode", with_tail=False),
+                    )
+                )
+    return list(dict.fromkeys(shards))
+
+
+def _leaves(element) -> dict:
+    # Leaf-list entries repeat their tag, so only leaves which occur once identify an element
+    leaves = {}
+    repeated = set()
+    for child in element:
+        if not isinstance(child.tag, str) or any(
+            isinstance(grandchild.tag, str) for grandchild in child
+        ):
+            continue
+        if child.tag in leaves:
+            repeated.add(child.tag)
+        leaves[child.tag] = (child.text or "").strip()
+    for tag in repeated:
+        del leaves[tag]
+    return leaves
+
+
+def _same_node(target, source) -> bool:
+    # Without the YANG schema list entries can't be told apart from containers. Two elements with the same
+    # tag are only the same node when none of the leaves both contain hold different values, so entries of
+    # lists with compound keys (or without keys) stay separate unless all of their shared leaves are equal.
+    # Leaves (and leaf-list entries) are told apart by their value.
+    target_children = any(isinstance(child.tag, str) for child in target)
+    source_children = any(isinstance(child.tag, str) for child in source)
+    if not target_children and not source_children:
+        return (target.text or "").strip() == (source.text or "").strip()
+    target_leaves = _leaves(target)
+    return all(
+        target_leaves[tag] == value
+        for tag, value in _leaves(source).items()
+        if tag in target_leaves
+    )
+
+
+def merge_elements(target, source) -> None:
+    """Merges the children of source into target, elements with the same tag are merged unless a leaf
+    they both contain holds different values (different list entries), the children of source are moved
+    into target"""
+    index = {}
+    for child in target:
+        if isinstance(child.tag, str):
+            index.setdefault(child.tag, []).append(child)
+    for child in list(source):
+        if not isinstance(child.tag, str):
+            continue
+        candidates = index.setdefault(child.tag, [])
+        match = next(
+            (candidate for candidate in candidates if _same_node(candidate, child)),
+            None,
+        )
+        if match is None:
+            target.append(child)
+            candidates.append(child)
+        elif len(child):
+            merge_elements(match, child)
+
+
+def merge_data(elements: list) -> str:
+    """Merges the <data/> elements of several <get> replies into one <data/> document
+
+    Args:
+        elements:   <data/> elements (lxml) of the replies
+
+    Containers returned by several shards are merged into one element:
+
+    >>> merge_data([etree.fromstring(f"<data><system>{leaf}</system></data>") for leaf in (
+    ...     "<hostname>r1</hostname>", "<clock><tz>UTC</tz></clock>", "<domain>x</domain>")])
+    '<data xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><system><hostname>r1</hostname><clock><tz>UTC</tz></clock><domain>x</domain></system></data>'
+
+    List entries are only merged when the leaves they both contain are equal, entries of a list with a
+    compound key stay separate:
+
+    >>> merge_data([etree.fromstring(f"<data><route><prefix>10.0.0.0/8</prefix>{entry}</route></data>") for entry in (
+    ...     "<path-id>1</path-id><nh>a</nh>", "<path-id>2</path-id><nh>b</nh>")])
+    '<data xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><route><prefix>10.0.0.0/8</prefix><path-id>1</path-id><nh>a</nh></route><route><prefix>10.0.0.0/8</prefix><path-id>2</path-id><nh>b</nh></route></data>'
+    """
+    merged = etree.Element(qualify("data"), nsmap={None: BASE_NS_1_0})
+    for element in elements:
+        if element is not None:
+            merge_elements(merged, element)
+    return etree.tostring(merged, encoding="unicode")
+
+
+def fetch_state(
+    host: str,
+    port: int,
+    timeout: int,
+    username: str,
+    password: str,
+    device_handler: str,
+    hostkey_verify: bool,
+    shards: List[Tuple[str, str]],
+    sessions: int = 1,
+    broker_socket: str = None,
+    engine: str = "ncclient",
+    pipeline: int = DEFAULT_PIPELINE_DEPTH,
+) -> str:
+    """Sends a <get> per shard over one or more NETCONF sessions in parallel and returns the merged data
+
+    The shards are distributed round robin across the sessions, each session keeps up to pipeline of its
+    shards in flight.
+
+    Args:
+        host:           NETCONF Server to connect to
+        port:           Port of the NETCONF Server
+        timeout:        SSH socket connection timeout
+        username:       Username to authenticate to NETCONF Server
+        password:       Password to authenticate to NETCONF Server
+        device_handler: ncclient device handler
+        hostkey_verify: Verify Host Keys
+        shards:         (subtree|xpath, filter) tuples as returned by shard_filters
+        sessions:       Number of NETCONF sessions used in parallel
+        broker_socket:  Send the RPCs through the session broker listening on this socket
+        engine:         NETCONF session engine (ncclient or asyncio), not used with the session broker
+        pipeline:       Number of <get> RPCs kept in flight on every session, not used with the session broker
+    """
+    sessions = max(min(sessions, len(shards)), 1)
+    buckets = [shards[i::sessions] for i in range(sessions)]
+    netconf_options = {
+        "host": host,
+        "port": port,
+        "timeout": timeout,
+        "username": username,
+        "password": password,
+    }
+
+    def _broker_worker(bucket: list) -> list:
+        client = BrokerClient(broker_socket)
+        return [
+            etree.fromstring(
+                client.get(
+                    filter=filter,
+                    filter_type=filter_type,
+                    device_handler=device_handler,
+                    hostkey_verify=hostkey_verify,
+                    **netconf_options,
+                ).encode()
+            )
+            for filter_type, filter in bucket
+        ]
+
+    def _session_worker(bucket: list) -> list:
+        with session_connect(engine)(
+            device_params={"name": device_handler},
+            hostkey_verify=hostkey_verify,
+            **netconf_options,
+        ) as m:
+            logger.debug(
+                f"Established NETCONF connection to {host}:{port} (Session ID: {m.session_id})"
+            )
+            elements = []
+            started = time.perf_counter()
+            with RPCPipeline(m, depth=pipeline) as rpcs:
+                for shard, reply, error in rpcs.map(
+                    (shard, "get", {"filter": shard}) for shard in bucket
+                ):
+                    if error is not None:
+                        raise error
+                    elements.append(reply.data_ele)
+                    logger.debug(
+                        f"get of {shard[1]} on {host}:{port} completed after {(time.perf_counter() - started) * 1000:.1f} ms"
+                    )
+            return elements
+
+    worker = _broker_worker if broker_socket else _session_worker
+    if sessions == 1:
+        return merge_data(worker(buckets[0]))
+
+    with ThreadPoolExecutor(max_workers=sessions) as executor:
+        results = list(executor.map(worker, buckets))
+    return merge_data([element for elements in results for element in elements])
+
+
+def bulk_get(
+    hosts: list,
+    workers: int,
+    output_dir: str,
+    format_json: bool,
+    **kwargs,
+) -> list:
+    """Runs the sharded <get> against multiple NETCONF servers using a pool of workers, writes the merged
+    data of every device to its own file and returns a list of per device results
+
+    Args:
+        hosts:          List of (host, port) tuples
+        workers:        Maximum number of devices queried concurrently
+        output_dir:     Directory to write a file per device to
+        format_json:    Write the output using xmltodict (JSON) instead of XML
+        kwargs:         Any other arguments passed to fetch_state
+    """
+    output_directory = Path(output_dir)
+    if not output_directory.is_dir():
+        logger.info("Creating output directory and any child folders")
+        output_directory.mkdir(parents=True)
+
+    default_port = kwargs.pop("port")
+    extension = "json" if format_json else "xml"
+
+    def _worker(host: str, port: int) -> dict:
+        name = host if port == default_port else f"{host}_{port}"
+        file_path = output_directory.joinpath(f"{name}.{extension}")
+        started = time.perf_counter()
+        try:
+            data_xml = fetch_state(host=host, port=port, **kwargs)
+            with file_path.open("w") as out_file:
+                if format_json:
+                    write_json(data_xml, out_file)
+                else:
+                    write_pretty_xml(data_xml, out_file)
+        except AuthenticationError:
+            error = "Unable to authenticate to NETCONF server"
+        except Exception as err:
+            error = str(err) or err.__class__.__name__
+        else:
+            error = None
+
+        return {
+            "host": host,
+            "port": port,
+            "success": error is None,
+            "latency": time.perf_counter() - started,
+            "file": str(file_path) if error is None else None,
+            "error": error,
+        }
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_worker, host, port) for host, port in hosts]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result["success"]:
+                logger.success(
+                    f"Completed get operation for {result['host']}:{result['port']}: {result['file']} ({result['latency']:.2f}s)"
+                )
+            else:
+                logger.error(
+                    f"get operation failed for {result['host']}:{result['port']}: {result['error']}"
+                )
+    return results
+
+
+@netconf_tool_cli_operations.command("get")
+@common_netconf_options
+@common_format_options
+@common_broker_options
+@common_session_engine_options
+@common_pipeline_options
+@click.option(
+    "--filter",
+    "filters",
+    help="Subtree filter (XML) or XPath expression selecting the state data, can be used multiple times",
+    type=str,
+    multiple=True,
+    required=True,
+)
+@click.option(
+    "--sessions",
+    help="Number of NETCONF sessions per device the filters are sharded across",
+    type=click.IntRange(min=1),
+    default=1,
+)
+@click.option(
+    "--hosts-file",
+    help="File containing one NETCONF server per line (host, host:port or [ipv6]:port), --host is ignored when used",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--workers",
+    help="Number of devices queried concurrently with --hosts-file",
+    type=click.IntRange(min=1),
+    default=20,
+)
+@click.option(
+    "--output-dir",
+    help="Directory to export a file per device to when using --hosts-file",
+    type=str,
+    default="./state",
+)
+def cli_operations_get(
+    host: str,
+    port: int,
+    timeout: int,
+    username: str,
+    password: str,
+    device_handler: str,
+    hostkey_verify: bool,
+    filters: tuple,
+    sessions: int,
+    hosts_file: str,
+    workers: int,
+    output_dir: str,
+    use_broker: bool,
+    broker_socket: str,
+    session_engine: str,
+    pipeline: int,
+    format_json: bool,
+    export_xml: str,
+    export_json: str,
+):
+    """Retrieves state data using <get> with one or more filters sharded into parallel RPCs, from a NETCONF server or all servers in --hosts-file"""
+    try:
+        shards = shard_filters(filters)
+    except ValueError as err:
+        logger.error(f"Parsing error detected with --filter: {err}")
+        exit()
+    logger.debug(
+        f"Sharded {len(filters)} filters into {len(shards)} <get> RPCs over up to {sessions} sessions per device"
+    )
+
+    options = {
+        "port": port,
+        "timeout": timeout,
+        "username": username,
+        "password": password,
+        "device_handler": device_handler,
+        "hostkey_verify": hostkey_verify,
+        "shards": shards,
+        "sessions": sessions,
+        "broker_socket": broker_socket if use_broker else None,
+        "engine": session_engine,
+        "pipeline": pipeline,
+    }
+
+    if hosts_file:
+        try:
+            hosts = parse_hosts_file(hosts_file, default_port=port)
+        except ValueError as err:
+            logger.error(err)
+            exit()
+        logger.info(
+            f"Running get against {len(hosts)} NETCONF servers using {workers} workers"
+        )
+        started = time.perf_counter()
+        results = bulk_get(
+            hosts=hosts,
+            workers=workers,
+            output_dir=output_dir,
+            format_json=format_json,
+            **options,
+        )
+        elapsed = time.perf_counter() - started
+
+        click.echo(f"{'HOST':<40} {'STATUS':<8} {'LATENCY':>9}  DETAIL")
+        for result in sorted(results, key=lambda r: (r["success"], r["host"])):
+            status = "success" if result["success"] else "failed"
+            detail = result["file"] if result["success"] else result["error"]
+            click.echo(
+                f"{result['host'] + ':' + str(result['port']):<40} {status:<8} {result['latency']:>8.2f}s  {detail}"
+            )
+
+        failed = len([result for result in results if not result["success"]])
+        logger.info(
+            f"Completed get against {len(results)} NETCONF servers in {elapsed:.2f}s ({len(results) - failed} succeeded, {failed} failed)"
+        )
+        exit(1 if failed else 0)
+
+    logger.info(f"Attempting to establish NETCONF session to {host}:{port}")
+    started = time.perf_counter()
+    try:
+        data_xml = fetch_state(host=host, **options)
+    except BrokerError as err:
+        logger.error(err)
+        exit()
+    except SSHError as err:
+        logger.error(err)
+        exit()
+    except AuthenticationError as err:
+        logger.error("Unable to authenticate to NETCONF server")
+        exit()
+    except Exception as err:
+        logger.error(f"Generic Exception caught: {err}")
+        exit()
+    logger.success(
+        f"Retrieved {len(shards)} filters from {host}:{port} in {time.perf_counter() - started:.2f}s"
+    )
+
+    export_data(
+        data_xml,
+        operation="get",
+        format_json=format_json,
+        export_xml=export_xml,
+        export_json=export_json,
+    )
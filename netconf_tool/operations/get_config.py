@@ -1,20 +1,260 @@
 import click
-import xmltodict
-import json
-from xml.dom import minidom
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional
 from xml.etree import ElementTree
 from xml.etree.ElementTree import ParseError
-from ncclient import manager
 from ncclient.transport.errors import SSHError, AuthenticationError
 from loguru import logger
 
 from netconf_tool.operations import netconf_tool_cli_operations
-from netconf_tool.decorators import common_format_options, common_netconf_options
+from netconf_tool.broker.client import BrokerClient, BrokerError
+from netconf_tool.decorators import (
+    cache_dir_option,
+    common_broker_options,
+    common_format_options,
+    common_netconf_options,
+    common_session_engine_options,
+)
+from netconf_tool.aio import session_connect
+from netconf_tool.streaming import export_data, write_json, write_pretty_xml
+from netconf_tool.helpers import parse_hosts_file
+from netconf_tool.snapshots import SnapshotStore
+from netconf_tool.cache import DeviceStateCache
+from netconf_tool.changes import (
+    change_indicator,
+    request_key,
+    unchanged_by_notifications,
+)
+
+
+def fetch_config(
+    host: str,
+    port: int,
+    timeout: int,
+    username: str,
+    password: str,
+    device_handler: str,
+    hostkey_verify: bool,
+    datastore: str,
+    filter: str = None,
+    broker_socket: str = None,
+    state: Optional[DeviceStateCache] = None,
+    change_filter: str = None,
+    if_changed: bool = False,
+    engine: str = "ncclient",
+) -> Optional[str]:
+    """Connects to a NETCONF server and returns the data of a get-config operation as an XML string
+
+    When a device state cache is used, the time of the fetch and the change indicator (the reply of a
+    <get> using change_filter) are recorded. With if_changed, None is returned without retrieving the
+    configuration if a subscription forwarder tracked no netconf-config-change notification or the
+    change indicator is the same since the last fetch.
+
+    Args:
+        host:           NETCONF Server to connect to
+        port:           Port of the NETCONF Server
+        timeout:        SSH socket connection timeout
+        username:       Username to authenticate to NETCONF Server
+        password:       Password to authenticate to NETCONF Server
+        device_handler: ncclient device handler
+        hostkey_verify: Verify Host Keys
+        datastore:      Datastore to retrieve configuration from
+        filter:         Optional subtree filter
+        broker_socket:  Route the operation through the session broker listening on this socket
+        state:          Device state cache used to record fetches
+        change_filter:  Subtree filter selecting a commit ID or last change timestamp of the device
+        if_changed:     Only retrieve the configuration if it may have changed since the last fetch
+        engine:         NETCONF session engine (ncclient or asyncio), not used with the session broker
+    """
+    started = time.time()
+    key = request_key(datastore, filter)
+    fetch = state.get(host, port, "fetch") if state else {}
+    if fetch.get("request") != key:
+        fetch = {}
+
+    if (
+        if_changed
+        and datastore == "running"
+        and unchanged_by_notifications(state, host, port, fetch)
+    ):
+        logger.info(
+            f"No netconf-config-change notification received from {host}:{port} since the last fetch"
+        )
+        return None
+
+    netconf_options = {
+        "host": host,
+        "port": port,
+        "timeout": timeout,
+        "username": username,
+        "password": password,
+        "device_handler": device_handler,
+        "hostkey_verify": hostkey_verify,
+    }
+    indicator = None
+
+    if broker_socket:
+        client = BrokerClient(broker_socket)
+        if state and change_filter:
+            indicator = change_indicator(
+                change_filter, client.get(filter=change_filter, **netconf_options)
+            )
+            if if_changed and indicator == fetch.get("indicator"):
+                logger.info(f"Change indicator of {host}:{port} is unchanged")
+                return None
+        data_xml = client.get_config(
+            datastore=datastore, filter=filter, **netconf_options
+        )
+    else:
+        with session_connect(engine)(
+            host=host,
+            port=port,
+            timeout=timeout,
+            username=username,
+            password=password,
+            device_params={"name": device_handler},
+            hostkey_verify=hostkey_verify,
+        ) as m:
+            logger.success(
+                f"Established NETCONF connection to {host}:{port} (Session ID: {m.session_id})"
+            )
+            if state and change_filter:
+                # Read before the configuration so a change in between is detected next time
+                indicator = change_indicator(
+                    change_filter, m.get(filter=("subtree", change_filter)).data_xml
+                )
+                if if_changed and indicator == fetch.get("indicator"):
+                    logger.info(f"Change indicator of {host}:{port} is unchanged")
+                    return None
+
+            if filter:
+                configuration = m.get_config(
+                    source=datastore, filter=("subtree", filter)
+                )
+            else:
+                configuration = m.get_config(source=datastore)
+        data_xml = configuration.data_xml
+
+    if state:
+        state.update(
+            host, port, "fetch", request=key, fetched=started, indicator=indicator
+        )
+    return data_xml
+
+
+def bulk_get_config(
+    hosts: list,
+    workers: int,
+    output_dir: Optional[str],
+    format_json: bool,
+    snapshot_store: Optional[SnapshotStore] = None,
+    if_changed: bool = False,
+    **kwargs,
+) -> list:
+    """Runs get-config against multiple NETCONF servers using a pool of workers, writes each
+    device output to its own file and/or the snapshot store and returns a list of per device results
+
+    Args:
+        hosts:          List of (host, port) tuples
+        workers:        Maximum number of concurrent NETCONF sessions
+        output_dir:     Directory to write a file per device, None to not write any files
+        format_json:    Write the output using xmltodict (JSON) instead of XML
+        snapshot_store: Store a snapshot of every device configuration
+        if_changed:     Skip devices whose configuration didn't change since the last fetch
+        kwargs:         Any other arguments passed to fetch_config
+    """
+    output_directory = Path(output_dir) if output_dir else None
+    if output_directory and not output_directory.is_dir():
+        logger.info("Creating output directory and any child folders")
+        output_directory.mkdir(parents=True)
+
+    default_port = kwargs.pop("port")
+    extension = "json" if format_json else "xml"
+
+    def _worker(host: str, port: int) -> dict:
+        name = host if port == default_port else f"{host}_{port}"
+        file_path = (
+            output_directory.joinpath(f"{name}.{extension}")
+            if output_directory
+            else None
+        )
+        snapshot = None
+        unchanged = False
+        started = time.perf_counter()
+        try:
+            # Only skip the transfer while the output of the last fetch is still available
+            available = (file_path is None or file_path.exists()) and (
+                snapshot_store is None or snapshot_store.snapshots(host, port)
+            )
+            data_xml = fetch_config(
+                host=host, port=port, if_changed=if_changed and available, **kwargs
+            )
+            if data_xml is None:
+                unchanged = True
+                if snapshot_store:
+                    snapshot = snapshot_store.add_unchanged(host, port)
+            elif file_path:
+                with file_path.open("w") as out_file:
+                    if format_json:
+                        write_json(data_xml, out_file)
+                    else:
+                        write_pretty_xml(data_xml, out_file)
+            if snapshot_store and not unchanged:
+                snapshot = snapshot_store.add(host, port, data_xml)
+        except AuthenticationError:
+            error = "Unable to authenticate to NETCONF server"
+        except Exception as err:
+            error = str(err) or err.__class__.__name__
+        else:
+            error = None
+
+        return {
+            "host": host,
+            "port": port,
+            "success": error is None,
+            "latency": time.perf_counter() - started,
+            "file": str(file_path) if error is None and file_path else None,
+            "snapshot": snapshot,
+            "unchanged": unchanged,
+            "error": error,
+        }
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_worker, host, port) for host, port in hosts]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if result["success"]:
+                logger.success(
+                    f"Completed get-config operation for {result['host']}:{result['port']}: {result_detail(result)} ({result['latency']:.2f}s)"
+                )
+            else:
+                logger.error(
+                    f"get-config operation failed for {result['host']}:{result['port']}: {result['error']}"
+                )
+    return results
+
+
+def result_detail(result: dict) -> str:
+    """Describes where the output of a successful bulk get-config went"""
+    details = ["unchanged"] if result["unchanged"] else []
+    if result["file"]:
+        details.append(result["file"])
+    if result["snapshot"]:
+        details.append(
+            f"snapshot {result['snapshot']['id']} ({result['snapshot']['stored']})"
+        )
+    return ", ".join(details)
 
 
 @netconf_tool_cli_operations.command("get-config")
 @common_netconf_options
 @common_format_options
+@common_broker_options
+@common_session_engine_options
 @click.option(
     "--datastore",
     help="Specify which datastore to retrieve configuration from",
@@ -24,6 +264,39 @@ from netconf_tool.decorators import common_format_options, common_netconf_option
 @click.option(
     "--filter", help="Include an XML filter to filter get-config operation", type=str
 )
+@click.option(
+    "--hosts-file",
+    help="File containing one NETCONF server per line (host, host:port or [ipv6]:port), --host is ignored when used",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--workers",
+    help="Number of concurrent NETCONF sessions used with --hosts-file",
+    type=click.IntRange(min=1),
+    default=20,
+)
+@click.option(
+    "--output-dir",
+    help="Directory to export a file per device to when using --hosts-file (defaults to ./configs unless --snapshot-dir is used)",
+    type=str,
+)
+@click.option(
+    "--snapshot-dir",
+    help="Store a snapshot of the configuration in this snapshot store, unchanged configurations are only stored by reference",
+    type=click.Path(file_okay=False),
+    envvar="NETCONF_TOOL_SNAPSHOT_DIR",
+)
+@click.option(
+    "--if-changed",
+    help="Skip retrieving the configuration when it didn't change since the last get-config of the device",
+    is_flag=True,
+)
+@click.option(
+    "--change-filter",
+    help="Subtree filter for a <get> selecting a commit ID or last change timestamp, compared with the last get-config to detect changes",
+    type=str,
+)
+@cache_dir_option
 def cli_operations_get_config(
     host: str,
     port: int,
@@ -34,11 +307,21 @@ def cli_operations_get_config(
     hostkey_verify: bool,
     datastore: str,
     filter: str,
+    hosts_file: str,
+    workers: int,
+    output_dir: str,
+    snapshot_dir: str,
+    if_changed: bool,
+    change_filter: str,
+    cache_dir: str,
+    use_broker: bool,
+    broker_socket: str,
+    session_engine: str,
     format_json: bool,
     export_xml: str,
     export_json: str,
 ):
-    """Subscribes to notifications/events in real-time and prints them to the screen for debugging/troubleshooting"""
+    """Retrieves configuration using <get-config> from a NETCONF server, or from all servers in --hosts-file"""
     if filter:
         logger.debug("Performing some basic XML validation")
         try:
@@ -47,26 +330,92 @@ def cli_operations_get_config(
             logger.error(f"Parsing error detected with --filter: {err}")
             exit()
 
+    if change_filter:
+        try:
+            ElementTree.fromstring(change_filter)
+        except ParseError as err:
+            logger.error(f"Parsing error detected with --change-filter: {err}")
+            exit()
+
+    snapshot_store = SnapshotStore(snapshot_dir) if snapshot_dir else None
+    state = DeviceStateCache(cache_dir)
+
+    if hosts_file:
+        if not output_dir and not snapshot_store:
+            output_dir = "./configs"
+
+        try:
+            hosts = parse_hosts_file(hosts_file, default_port=port)
+        except ValueError as err:
+            logger.error(err)
+            exit()
+        logger.info(
+            f"Running get-config against {len(hosts)} NETCONF servers using {workers} workers"
+        )
+        started = time.perf_counter()
+        results = bulk_get_config(
+            hosts=hosts,
+            workers=workers,
+            output_dir=output_dir,
+            format_json=format_json,
+            snapshot_store=snapshot_store,
+            if_changed=if_changed,
+            state=state,
+            change_filter=change_filter,
+            port=port,
+            timeout=timeout,
+            username=username,
+            password=password,
+            device_handler=device_handler,
+            hostkey_verify=hostkey_verify,
+            datastore=datastore,
+            filter=filter,
+            broker_socket=broker_socket if use_broker else None,
+            engine=session_engine,
+        )
+        elapsed = time.perf_counter() - started
+
+        click.echo(f"{'HOST':<40} {'STATUS':<8} {'LATENCY':>9}  DETAIL")
+        for result in sorted(results, key=lambda r: (r["success"], r["host"])):
+            status = "success" if result["success"] else "failed"
+            detail = result_detail(result) if result["success"] else result["error"]
+            click.echo(
+                f"{result['host'] + ':' + str(result['port']):<40} {status:<8} {result['latency']:>8.2f}s  {detail}"
+            )
+
+        failed = len([result for result in results if not result["success"]])
+        logger.info(
+            f"Completed get-config against {len(results)} NETCONF servers in {elapsed:.2f}s ({len(results) - failed} succeeded, {failed} failed)"
+        )
+        exit(1 if failed else 0)
+
+    # Only skip the transfer while the output of the last fetch is still available
+    export_file = export_xml or export_json
+    available = (not export_file or Path(export_file).exists()) and (
+        not snapshot_store or snapshot_store.snapshots(host, port)
+    )
+
     logger.info(f"Attempting to establish NETCONF session to {host}:{port}")
     try:
-        with manager.connect(
+        data_xml = fetch_config(
             host=host,
             port=port,
             timeout=timeout,
             username=username,
             password=password,
-            device_params={"name": device_handler},
+            device_handler=device_handler,
             hostkey_verify=hostkey_verify,
-        ) as m:
-            logger.success(
-                f"Established NETCONF connection to {host}:{port} (Session ID: {m.session_id})"
-            )
-            if filter:
-                configuration = m.get_config(
-                    source=datastore, filter=("subtree", filter)
-                )
-            else:
-                configuration = m.get_config(source=datastore)
+            datastore=datastore,
+            filter=filter,
+            broker_socket=broker_socket if use_broker else None,
+            engine=session_engine,
+            state=state,
+            change_filter=change_filter,
+            if_changed=if_changed and available,
+        )
+    except BrokerError as err:
+        logger.error(err)
+        exit()
     except SSHError as err:
         logger.error(err)
         exit()
@@ -77,27 +426,31 @@ def cli_operations_get_config(
         logger.error(f"Generic Exception caught: {err}")
         exit()
 
-    xml_data = minidom.parseString(configuration.data_xml).toprettyxml(
-        indent=" ", newl=""
-    )
-
-    if export_xml:
-        with open(export_xml, "w") as out_file:
-            out_file.write(xml_data)
-        logger.success(f"Exported get-config operation to {export_xml} in XML format")
-        exit()
-
-    if export_json:
-        json_data = xmltodict.parse(xml_data)
-
-        with open(export_json, "w") as out_file:
-            json.dump(json_data, out_file, indent=4)
+    if data_xml is None:
+        logger.success(
+            f"Configuration of {host}:{port} didn't change since the last get-config, skipped retrieving it"
+        )
+        if snapshot_store:
+            snapshot_store.add_unchanged(host, port)
+        return
 
-        logger.success(f"Exported get-config operation to {export_json} in JSON format")
-        exit()
-
-    if format_json:
-        json_data = xmltodict.parse(xml_data)
-        exit(json.dumps(json_data, indent=4))
+    if snapshot_store:
+        snapshot = snapshot_store.add(host, port, data_xml)
+        if not snapshot["changed"]:
+            logger.info(
+                f"Configuration of {host}:{port} is unchanged, stored snapshot {snapshot['id']} by reference"
+            )
+        else:
+            logger.success(
+                f"Stored snapshot {snapshot['id']} of {host}:{port} as {snapshot['stored']} ({snapshot['sha256'][:12]})"
+            )
+        if not (format_json or export_xml or export_json):
+            return
 
-    exit(xml_data)
+    export_data(
+        data_xml,
+        operation="get-config",
+        format_json=format_json,
+        export_xml=export_xml,
+        export_json=export_json,
+    )
@@ -1,13 +1,187 @@
 import click
+import queue
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 from ncclient import manager
+from ncclient.operations.rpc import RPCError
 from ncclient.transport.errors import SSHError, AuthenticationError
 from loguru import logger
 from pathlib import Path
 
 from netconf_tool.operations import netconf_tool_cli_operations
-from netconf_tool.decorators import common_netconf_options
-from netconf_tool.helpers import parse_rfc3986_uri
+from netconf_tool.cache import CapabilityCache, SchemaCache
+from netconf_tool.decorators import (
+    common_cache_options,
+    common_netconf_options,
+    common_schema_cache_options,
+    common_pipeline_options,
+    common_session_engine_options,
+)
+from netconf_tool.aio import session_connect
+from netconf_tool.helpers import build_module_index
+from netconf_tool.pipeline import DEFAULT_PIPELINE_DEPTH, RPCPipeline
+from netconf_tool.timings import phase
+from netconf_tool.yang import ModuleIndex, yang_dependencies
+
+
+def server_module_index(
+    m: manager.Manager, host: str, port: int, cache_dir: str, no_cache: bool
+) -> dict:
+    """Returns the YANG modules advertised by the NETCONF server keyed by module name, the capability
+    URIs are only parsed when the capability set differs from the one in the capability cache
+
+    Args:
+        m:          Established NETCONF session
+        host:       NETCONF Server
+        port:       Port of the NETCONF Server
+        cache_dir:  Root cache directory
+        no_cache:   Parse the capabilities without reading or updating the capability cache
+    """
+    if no_cache:
+        return build_module_index(m.server_capabilities)
+
+    record, changed = CapabilityCache(cache_dir).update(
+        host, port, m.server_capabilities
+    )
+    if changed:
+        logger.warning(
+            f"Capability set of {host}:{port} changed since it was last seen (fingerprint {record['previous_fingerprint'][:12]} -> {record['fingerprint'][:12]})"
+        )
+    return record["modules"]
+
+
+def write_schema(output_directory: Path, module_name: str, data: str) -> Path:
+    """Writes a YANG module to <output_directory>/<module_name>.yang and returns the file path"""
+    file_path = output_directory.joinpath(f"{module_name}.yang")
+    with phase("file-io"), file_path.open("w") as out_file:
+        out_file.write(data)
+    return file_path
+
+
+def export_schemas(
+    m: manager.Manager,
+    modules: list,
+    output_directory: Path,
+    workers: int,
+    cache: SchemaCache = None,
+    dependencies: Callable = None,
+    connect: Callable = manager.connect,
+    pipeline: int = DEFAULT_PIPELINE_DEPTH,
+    **connect_kwargs,
+) -> int:
+    """Downloads YANG modules using <get-schema> and writes each one to the output directory as soon as it
+    arrives, returns the number of modules exported
+
+    When workers is higher than 1, additional NETCONF sessions are established and all sessions pull
+    modules from a shared queue until every requested module has been downloaded. Every session keeps up
+    to pipeline <get-schema> RPCs in flight.
+
+    Args:
+        m:                  Established NETCONF session used by the first worker
+        modules:            List of (module name, revision) tuples to download
+        output_directory:   Directory to write the .yang files to
+        workers:            Number of concurrent NETCONF sessions
+        cache:              Schema cache to store the downloaded modules in
+        dependencies:       Called with the module name and schema of every downloaded module, returns more
+                            (module name, revision) tuples to download, each module is only downloaded once
+        connect:            manager.connect function of the session engine (see session_connect)
+        pipeline:           Number of <get-schema> RPCs kept in flight on every session
+        connect_kwargs:     Arguments passed to connect for the additional sessions
+    """
+    if not modules:
+        return 0
+
+    pending = queue.Queue()
+    requested = set()
+    lock = threading.Lock()
+    outstanding = 0
+
+    def _request(module: tuple) -> None:
+        nonlocal outstanding
+        with lock:
+            if module[0] in requested:
+                return
+            requested.add(module[0])
+            outstanding += 1
+        pending.put(module)
+
+    def _finished() -> None:
+        nonlocal outstanding
+        with lock:
+            outstanding -= 1
+            done = not outstanding
+        if done:
+            # Wakes up the workers waiting for dependencies which will never come
+            pending.put(None)
+
+    for module in modules:
+        _request(module)
+
+    def _drain(session: manager.Manager) -> int:
+        n = 0
+        finished = False
+        with RPCPipeline(session, depth=pipeline) as rpcs:
+            while True:
+                # Keeps the pipeline full, the queue is only waited on when no RPC is in flight
+                while not finished and len(rpcs) < pipeline:
+                    try:
+                        module = pending.get(block=not rpcs)
+                    except queue.Empty:
+                        break
+                    if module is None:
+                        pending.put(None)
+                        finished = True
+                        break
+                    rpcs.submit(module, "get_schema", module[0])
+
+                if not rpcs:
+                    return n
+
+                (module_name, revision), schema, error = rpcs.take()
+                try:
+                    if isinstance(error, RPCError):
+                        logger.error(f"Unable to export module {module_name}: {error}")
+                        continue
+                    if error is not None:
+                        # Hands the modules still in flight to the other sessions
+                        for module in rpcs.abandon():
+                            pending.put(module)
+                        raise error
+
+                    file_path = write_schema(output_directory, module_name, schema.data)
+                    if cache:
+                        cache.put(module_name, revision, schema.data)
+                    n += 1
+                    logger.success(f"Exported module {module_name} ({file_path})")
+
+                    if dependencies:
+                        for dependency in dependencies(module_name, schema.data):
+                            _request(dependency)
+                finally:
+                    _finished()
+
+    def _session_worker() -> int:
+        try:
+            session = connect(**connect_kwargs)
+        except Exception as err:
+            logger.warning(f"Unable to establish additional NETCONF session: {err}")
+            return 0
+
+        with session:
+            logger.debug(
+                f"Established additional NETCONF session (Session ID: {session.session_id})"
+            )
+            return _drain(session)
+
+    if not dependencies:
+        workers = min(workers, len(modules))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_drain, m)]
+        futures += [executor.submit(_session_worker) for _ in range(workers - 1)]
+        return sum(future.result() for future in futures)
 
 
 @netconf_tool_cli_operations.command("get-yang-models")
@@ -21,6 +195,16 @@ from netconf_tool.helpers import parse_rfc3986_uri
 @click.option(
     "--regex", help="Only match modules with this regex pattern", type=str, default=""
 )
+@click.option(
+    "--workers",
+    help="Number of concurrent NETCONF sessions used to download YANG modules",
+    type=click.IntRange(min=1),
+    default=1,
+)
+@common_cache_options
+@common_schema_cache_options
+@common_session_engine_options
+@common_pipeline_options
 def cli_operations_get_yang_models(
     host: str,
     port: int,
@@ -31,6 +215,13 @@ def cli_operations_get_yang_models(
     hostkey_verify: bool,
     output_dir: str,
     regex: str,
+    workers: int,
+    cache_dir: str,
+    no_cache: bool,
+    cache_max_size: int,
+    cache_max_age: int,
+    session_engine: str,
+    pipeline: int,
 ):
     """Gathers all YANG Models present on the device and writes it to the output directory"""
     output_directory = Path(output_dir)
@@ -43,41 +234,68 @@ def cli_operations_get_yang_models(
         logger.info(
             f"Regex pattern detected, will use '{regex_pattern.pattern}' to match YANG modules"
         )
+    cache = None
+    if not no_cache:
+        cache = SchemaCache(
+            cache_dir, max_size_mb=cache_max_size, max_age_days=cache_max_age
+        )
+
     yang_modules = []
     n = 0
+    connect_kwargs = {
+        "host": host,
+        "port": port,
+        "timeout": timeout,
+        "username": username,
+        "password": password,
+        "device_params": {"name": device_handler},
+        "hostkey_verify": hostkey_verify,
+    }
+    connect = session_connect(session_engine)
     logger.info(f"Attempting to establish NETCONF session to {host}:{port}")
     try:
-        with manager.connect(
-            host=host,
-            port=port,
-            timeout=timeout,
-            username=username,
-            password=password,
-            device_params={"name": device_handler},
-            hostkey_verify=hostkey_verify,
-        ) as m:
+        with connect(**connect_kwargs) as m:
             logger.success(
                 f"Established NETCONF connection to {host}:{port} (Session ID: {m.session_id})"
             )
-            server_capabilities = m.server_capabilities
-            for capability in server_capabilities:
-                capability = parse_rfc3986_uri(uri=capability)
-                if not capability.get("queries") or not capability["queries"].get(
-                    "module"
-                ):
-                    continue
-                module_name = capability["queries"]["module"]
+            module_index = server_module_index(m, host, port, cache_dir, no_cache)
+            for module_name, module in module_index.items():
                 if regex:
                     if not re.match(regex_pattern, module_name):
                         continue
+                yang_modules.append((module_name, module["revision"]))
 
-                schema = m.get_schema(module_name)
-                file_path = output_directory.joinpath(f"{module_name}.yang")
-                with file_path.open("w") as out_file:
-                    out_file.write(schema.data)
-                    n += 1
+            started = time.perf_counter()
+            missing = []
+            for module_name, revision in yang_modules:
+                data = cache.get(module_name, revision) if cache else None
+                if data is None:
+                    missing.append((module_name, revision))
+                    continue
+                file_path = write_schema(output_directory, module_name, data)
+                n += 1
+                logger.debug(f"Exported cached module {module_name} ({file_path})")
+
+            if cache:
+                logger.info(
+                    f"Found {n} of {len(yang_modules)} YANG models in cache {cache_dir}"
+                )
 
-                logger.success(f"Exported module {module_name} ({file_path})")
+            if missing:
+                logger.info(
+                    f"Downloading {len(missing)} YANG models using {min(workers, len(missing))} NETCONF sessions"
+                )
+                n += export_schemas(
+                    m,
+                    missing,
+                    output_directory,
+                    workers,
+                    cache,
+                    connect=connect,
+                    pipeline=pipeline,
+                    **connect_kwargs,
+                )
+            elapsed = time.perf_counter() - started
 
     except SSHError as err:
         logger.error(err)
@@ -88,15 +306,20 @@ def cli_operations_get_yang_models(
     except Exception as err:
         logger.error(f"Generic Exception caught: {err}")
         exit()
+    finally:
+        if cache:
+            cache.save()
 
-    logger.success(f"Exported a total of {n} YANG models")
+    logger.success(
+        f"Exported a total of {n} YANG models in {elapsed:.2f}s ({n / elapsed if elapsed else 0:.1f} modules/s)"
+    )
 
 
 @netconf_tool_cli_operations.command("get-yang-model")
 @common_netconf_options
 @click.option(
     "--name",
-    help="Name of the YANG Module you want to attempt to export",
+    help="Name (or namespace) of the YANG Module you want to attempt to export, name@revision only exports that revision",
     type=str,
     required=True,
 )
@@ -106,6 +329,21 @@ def cli_operations_get_yang_models(
     type=str,
     default="./yang_models",
 )
+@click.option(
+    "--with-dependencies",
+    help="Also export the modules and submodules imported or included by the module, recursively",
+    is_flag=True,
+)
+@click.option(
+    "--workers",
+    help="Number of concurrent NETCONF sessions used to download the dependencies",
+    type=click.IntRange(min=1),
+    default=4,
+)
+@common_cache_options
+@common_schema_cache_options
+@common_session_engine_options
+@common_pipeline_options
 def cli_operations_get_yang_model(
     host: str,
     port: int,
@@ -116,6 +354,14 @@ def cli_operations_get_yang_model(
     hostkey_verify: bool,
     name: str,
     output_dir: str,
+    with_dependencies: bool,
+    workers: int,
+    cache_dir: str,
+    no_cache: bool,
+    cache_max_size: int,
+    cache_max_age: int,
+    session_engine: str,
+    pipeline: int,
 ):
     """Gathers a specific YANG Model and writes it to the output directory"""
     output_directory = Path(output_dir)
@@ -123,43 +369,109 @@ def cli_operations_get_yang_model(
         logger.info("Creating output directory and any child folders")
         output_directory.mkdir(parents=True)
 
-    yang_modules = []
+    cache = None
+    if not no_cache:
+        cache = SchemaCache(
+            cache_dir, max_size_mb=cache_max_size, max_age_days=cache_max_age
+        )
+
+    connect_kwargs = {
+        "host": host,
+        "port": port,
+        "timeout": timeout,
+        "username": username,
+        "password": password,
+        "device_params": {"name": device_handler},
+        "hostkey_verify": hostkey_verify,
+    }
+    connect = session_connect(session_engine)
     logger.info(f"Attempting to establish NETCONF session to {host}:{port}")
     try:
-        with manager.connect(
-            host=host,
-            port=port,
-            timeout=timeout,
-            username=username,
-            password=password,
-            device_params={"name": device_handler},
-            hostkey_verify=hostkey_verify,
-        ) as m:
+        with connect(**connect_kwargs) as m:
             logger.success(
                 f"Established NETCONF connection to {host}:{port} (Session ID: {m.session_id})"
             )
-            server_capabilities = m.server_capabilities
-            for capability in server_capabilities:
-                capability = parse_rfc3986_uri(uri=capability)
-                if not capability.get("queries") or not capability["queries"].get(
-                    "module"
-                ):
-                    continue
-                module_name = capability["queries"]["module"]
-                yang_modules.append(module_name)
+            module_index = ModuleIndex(
+                server_module_index(m, host, port, cache_dir, no_cache)
+            )
 
-            if name not in yang_modules:
+            module_name = module_index.resolve(name)
+            if module_name is None:
+                suggestions = module_index.search(name.split("@")[0].split("-")[0], 5)
                 logger.error(
-                    "Could not find {name} in the listed devices yang models, use 'get-yang-models' to find all valid YANG models"
+                    f"Could not find {name} in the listed devices yang models, use 'get-yang-models' to find all valid YANG models"
+                    + (
+                        f" (similar modules: {', '.join(suggestions)})"
+                        if suggestions
+                        else ""
+                    )
                 )
                 exit()
 
-            schema = m.get_schema(name)
-            file_path = output_directory.joinpath(f"{name}.yang")
-            with file_path.open("w") as out_file:
-                out_file.write(schema.data)
+            revision = module_index.get(module_name)["revision"]
+            data = cache.get(module_name, revision) if cache else None
+            if data is None:
+                data = m.get_schema(module_name).data
+                if cache:
+                    cache.put(module_name, revision, data)
+            else:
+                logger.info(f"Using cached module {module_name}@{revision}")
+
+            file_path = write_schema(output_directory, module_name, data)
+            logger.success(f"Exported module {module_name} ({file_path})")
+
+            if with_dependencies:
+                exported = {module_name}
+                n = 0
+                lock = threading.RLock()
 
-            logger.success(f"Exported module {name} ({file_path})")
+                def _dependencies(dependent: str, schema: str) -> list:
+                    # Cached dependencies are exported right away, the missing ones are downloaded
+                    nonlocal n
+                    missing = []
+                    with lock:
+                        for statement, dependency, revision_date in yang_dependencies(
+                            schema
+                        ):
+                            if dependency in exported:
+                                continue
+                            exported.add(dependency)
+                            logger.debug(f"{dependent} {statement}s {dependency}")
+
+                            module = module_index.get(dependency)
+                            revision = module["revision"] if module else revision_date
+                            data = cache.get(dependency, revision) if cache else None
+                            if data is None:
+                                missing.append((dependency, revision))
+                                continue
+                            file_path = write_schema(output_directory, dependency, data)
+                            n += 1
+                            logger.debug(
+                                f"Exported cached module {dependency} ({file_path})"
+                            )
+                            missing += _dependencies(dependency, data)
+                    return missing
+
+                started = time.perf_counter()
+                missing = _dependencies(module_name, data)
+                if missing:
+                    # export_schemas only returns the downloaded modules, the cached dependencies of those
+                    # modules are counted by _dependencies
+                    downloaded = export_schemas(
+                        m,
+                        missing,
+                        output_directory,
+                        workers,
+                        cache,
+                        dependencies=_dependencies,
+                        connect=connect,
+                        pipeline=pipeline,
+                        **connect_kwargs,
+                    )
+                    n += downloaded
+                logger.success(
+                    f"Exported {n} of {len(exported) - 1} dependencies of {module_name} in {time.perf_counter() - started:.2f}s"
+                )
 
     except SSHError as err:
         logger.error(err)
@@ -170,3 +482,6 @@ def cli_operations_get_yang_model(
     except Exception as err:
         logger.error(f"Generic Exception caught: {err}")
         exit()
+    finally:
+        if cache:
+            cache.save()
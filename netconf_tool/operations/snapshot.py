@@ -0,0 +1,97 @@
+import click
+import functools
+import sys
+from datetime import datetime
+from loguru import logger
+
+from netconf_tool.operations import netconf_tool_cli_operations
+from netconf_tool.snapshots import SnapshotStore
+
+
+def common_snapshot_options(f):
+    @click.option(
+        "--host",
+        help="IP Address of NETCONF Server the snapshots were taken from",
+        type=str,
+        required=True,
+    )
+    @click.option(
+        "--port", help="Port of NETCONF Server", type=int, default=830, required=True
+    )
+    @click.option(
+        "--snapshot-dir",
+        help="Root directory of the snapshot store",
+        type=click.Path(exists=True, file_okay=False),
+        envvar="NETCONF_TOOL_SNAPSHOT_DIR",
+        required=True,
+    )
+    @functools.wraps(f)
+    def wrapper_common_options(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper_common_options
+
+
+@netconf_tool_cli_operations.group("snapshot")
+def netconf_tool_cli_operations_snapshot() -> None:
+    """List and compare configuration snapshots stored by get-config --snapshot-dir"""
+
+
+@netconf_tool_cli_operations_snapshot.command("list")
+@common_snapshot_options
+def netconf_tool_cli_operations_snapshot_list(host: str, port: int, snapshot_dir: str):
+    """Lists the snapshots stored for a NETCONF server"""
+    snapshots = SnapshotStore(snapshot_dir).snapshots(host, port)
+    if not snapshots:
+        logger.error(f"No snapshots stored for {host}:{port} in {snapshot_dir}")
+        exit()
+
+    click.echo(f"{'ID':>5}  {'TIMESTAMP':<19}  {'SHA256':<12}  {'STORED':<9}  SIZE")
+    for snapshot in snapshots:
+        click.echo(
+            f"{snapshot['id']:>5}  {datetime.fromtimestamp(snapshot['timestamp']):%Y-%m-%d %H:%M:%S}  "
+            f"{snapshot['sha256'][:12]}  {snapshot['stored']:<9}  {snapshot['size']}"
+            + ("" if snapshot["changed"] else "  (unchanged)")
+        )
+
+
+@netconf_tool_cli_operations_snapshot.command("diff")
+@common_snapshot_options
+@click.option(
+    "--from",
+    "from_id",
+    help="Snapshot ID to compare from, negative values count back from the latest snapshot (defaults to the previous snapshot)",
+    type=int,
+)
+@click.option(
+    "--to",
+    "to_id",
+    help="Snapshot ID to compare to, negative values count back from the latest snapshot (defaults to the latest snapshot)",
+    type=int,
+)
+@click.option(
+    "--context", help="Number of unchanged lines around a change", type=int, default=3
+)
+def netconf_tool_cli_operations_snapshot_diff(
+    host: str,
+    port: int,
+    snapshot_dir: str,
+    from_id: int,
+    to_id: int,
+    context: int,
+):
+    """Prints a unified diff between two snapshots of a NETCONF server without connecting to it"""
+    try:
+        diff = list(
+            SnapshotStore(snapshot_dir).diff(
+                host, port, from_id=from_id, to_id=to_id, context=context
+            )
+        )
+    except KeyError as err:
+        logger.error(err.args[0])
+        exit()
+
+    if not diff:
+        logger.info("Snapshots are identical")
+        return
+    sys.stdout.writelines(diff)
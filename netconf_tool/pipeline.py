@@ -0,0 +1,119 @@
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+from ncclient import manager
+from ncclient.operations import RPCError
+from ncclient.operations.errors import TimeoutExpiredError
+from ncclient.xml_ import to_ele
+
+DEFAULT_PIPELINE_DEPTH = 8
+RPC_TIMEOUT = 30
+
+
+class RPCPipeline:
+    """Keeps up to depth RPCs in flight on one NETCONF session so latency bound workloads pay one round trip
+    per window instead of one per RPC, the session matches the replies to the RPCs by message-id and they
+    are taken in the order the RPCs were sent (RFC 6241 servers process RPCs in order)
+
+    ncclient sessions are switched to async_mode while the pipeline is open, sessions of the asyncio engine
+    submit the RPCs to the event loop.
+
+        with RPCPipeline(m, depth=8) as rpcs:
+            for key, reply, error in rpcs.map((name, "get_schema", {"identifier": name}) for name in names):
+                ...
+
+    Args:
+        m:          ncclient Manager or Manager of the asyncio engine
+        depth:      Maximum number of outstanding RPCs, 1 sends one RPC at a time
+        timeout:    Seconds to wait for a reply after the RPC was sent
+    """
+
+    def __init__(
+        self, m, depth: int = DEFAULT_PIPELINE_DEPTH, timeout: float = RPC_TIMEOUT
+    ):
+        self.m = m
+        self.depth = max(depth, 1)
+        self.timeout = timeout
+        self.in_flight = deque()
+        self._async_mode = None
+
+    def __enter__(self) -> "RPCPipeline":
+        if isinstance(self.m, manager.Manager):
+            self._async_mode = self.m.async_mode
+            self.m.async_mode = True
+        return self
+
+    def __exit__(self, *args):
+        # Replies of abandoned RPCs are still delivered to their RPC objects and dropped
+        if self._async_mode is not None:
+            self.m.async_mode = self._async_mode
+        return False
+
+    def __len__(self) -> int:
+        return len(self.in_flight)
+
+    def submit(self, key: Any, operation: str, *args, **kwargs) -> None:
+        """Sends an RPC without waiting for its reply
+
+        Args:
+            key:        Returned with the reply by take()
+            operation:  Manager method of the RPC (eg. get, get_schema)
+        """
+        if isinstance(self.m, manager.Manager):
+            pending = getattr(self.m, operation)(*args, **kwargs)
+        else:
+            pending = self.m.submit(operation, *args, **kwargs)
+        self.in_flight.append((key, pending, time.monotonic()))
+
+    def take(self) -> Tuple[Any, Any, Optional[Exception]]:
+        """Waits for the reply of the oldest outstanding RPC and returns (key, reply, None) or (key, None, error)
+        when the RPC failed, <rpc-error> replies are returned as RPCError like synchronous ncclient RPCs raise them
+        """
+        key, pending, submitted = self.in_flight.popleft()
+        timeout = max(self.timeout - (time.monotonic() - submitted), 0)
+        try:
+            return key, self._result(pending, timeout), None
+        except Exception as err:
+            return key, None, err
+
+    def abandon(self) -> List[Any]:
+        """Stops waiting for the outstanding RPCs and returns their keys"""
+        keys = [key for key, _, _ in self.in_flight]
+        self.in_flight.clear()
+        return keys
+
+    def map(self, requests: Iterable[Tuple[Any, str, dict]]) -> Iterator[tuple]:
+        """Sends (key, operation, kwargs) requests keeping the pipeline full and yields (key, reply, error) in
+        request order"""
+        for key, operation, kwargs in requests:
+            if len(self.in_flight) >= self.depth:
+                yield self.take()
+            self.submit(key, operation, **kwargs)
+        while self.in_flight:
+            yield self.take()
+
+    @staticmethod
+    def _result(pending, timeout: float):
+        if isinstance(pending, Future):
+            try:
+                return pending.result(timeout)
+            except FutureTimeoutError:
+                raise TimeoutExpiredError(
+                    "Timed out while waiting for a pipelined rpc reply"
+                )
+
+        if not pending.event.wait(timeout):
+            raise TimeoutExpiredError(
+                "ncclient timed out while waiting for an rpc reply."
+            )
+        if pending.error:
+            raise pending.error
+        reply = pending.reply
+        reply.parse()
+        if reply.error is not None:
+            errors = reply.errors
+            if len(errors) > 1:
+                raise RPCError(to_ele(reply._raw), errs=errors)
+            raise reply.error
+        return reply
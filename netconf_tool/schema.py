@@ -0,0 +1,644 @@
+import difflib
+import hashlib
+import marshal
+import os
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+from xml.etree import ElementTree
+from loguru import logger
+
+from netconf_tool.cache import DEFAULT_CACHE_DIR
+
+# Bump when the layout of the compiled tree changes so old cache files are rebuilt
+SCHEMA_TREE_VERSION = 1
+DATA_NODES = ("container", "list", "leaf", "leaf-list", "anydata", "anyxml")
+LEAF_NODES = ("leaf", "leaf-list")
+_MAX_USES_DEPTH = 64
+
+_TOKEN_PATTERN = re.compile(
+    r"\s+|//[^\n]*|/\*.*?\*/|\"((?:\\.|[^\"\\])*)\"|'([^']*)'|([;{}])|([^\s;{}\"']+)",
+    re.DOTALL,
+)
+_ESCAPE_PATTERN = re.compile(r"\\(.)")
+_ESCAPES = {"n": "\n", "t": "\t"}
+
+
+def parse_yang(text: str) -> tuple:
+    """Parses the text of a YANG module or submodule into nested (keyword, argument, substatements) tuples
+    and returns the module/submodule statement
+
+    Only the statement structure is parsed, the arguments are not validated.
+
+    Args:
+        text:   YANG module text
+
+    Raises:
+        ValueError: Unbalanced braces or statements without a terminating ; or {
+    """
+    root = []
+    stack = [root]
+    keyword = argument = None
+    concatenate = False
+    for match in _TOKEN_PATTERN.finditer(text):
+        double_quoted, single_quoted, punctuation, word = match.groups()
+        if punctuation == ";":
+            if keyword is None:
+                raise ValueError(f"Unexpected ; at offset {match.start()}")
+            stack[-1].append((keyword, argument, []))
+            keyword = argument = None
+        elif punctuation == "{":
+            if keyword is None:
+                raise ValueError(f"Unexpected {{ at offset {match.start()}")
+            statement = (keyword, argument, [])
+            stack[-1].append(statement)
+            stack.append(statement[2])
+            keyword = argument = None
+        elif punctuation == "}":
+            if len(stack) == 1 or keyword is not None:
+                raise ValueError(f"Unexpected }} at offset {match.start()}")
+            stack.pop()
+        elif word is not None or double_quoted is not None or single_quoted is not None:
+            if double_quoted is not None:
+                value = double_quoted
+                if "\\" in value:
+                    value = _ESCAPE_PATTERN.sub(
+                        lambda escape: _ESCAPES.get(escape.group(1), escape.group(1)),
+                        value,
+                    )
+            elif single_quoted is not None:
+                value = single_quoted
+            else:
+                value = word
+
+            if keyword is None:
+                keyword = value
+            elif word == "+" and argument is not None:
+                concatenate = True
+            elif argument is None:
+                argument = value
+            elif concatenate:
+                argument += value
+                concatenate = False
+            else:
+                raise ValueError(
+                    f"Unexpected argument {value} of {keyword} at offset {match.start()}"
+                )
+
+    if len(stack) != 1 or keyword is not None or not root:
+        raise ValueError("Unexpected end of module")
+    return root[0]
+
+
+def _substatement(statements: list, keyword: str) -> Optional[str]:
+    for statement in statements:
+        if statement[0] == keyword:
+            return statement[1]
+    return None
+
+
+def _split_name(name: str) -> Tuple[Optional[str], str]:
+    prefix, _, local_name = name.rpartition(":")
+    return prefix or None, local_name
+
+
+class _Context:
+    """Module a statement was defined in, submodules have their own imports but share the namespace"""
+
+    def __init__(self, module: "_Module", prefix: str, imports: dict):
+        self.module = module
+        self.prefix = prefix
+        self.imports = imports
+
+    def module_of(self, prefix: Optional[str]) -> Optional[str]:
+        if prefix is None or prefix == self.prefix:
+            return self.module.name
+        return self.imports.get(prefix)
+
+
+class _Module:
+    def __init__(self, statement: tuple):
+        self.statement = statement
+        self.name = statement[1]
+        self.namespace = _substatement(statement[2], "namespace")
+        self.prefix = _substatement(statement[2], "prefix")
+        # Top level statements of the module and its submodules with their context
+        self.statements = []
+        self.groupings = {}
+
+
+class _Compiler:
+    def __init__(self, statements: list):
+        self.modules = {}
+        submodules = {}
+        for statement in statements:
+            if statement[0] == "module":
+                self.modules[statement[1]] = _Module(statement)
+            elif statement[0] == "submodule":
+                submodules[statement[1]] = statement
+
+        for module in self.modules.values():
+            for statement, context in self._module_statements(
+                module, module.statement, module.prefix, submodules, set()
+            ):
+                module.statements.append((statement, context))
+                if statement[0] == "grouping":
+                    module.groupings[statement[1]] = (statement, context)
+
+    def _module_statements(
+        self,
+        module: _Module,
+        statement: tuple,
+        prefix: str,
+        submodules: dict,
+        seen: set,
+    ):
+        imports = {
+            _substatement(sub[2], "prefix"): sub[1]
+            for sub in statement[2]
+            if sub[0] == "import"
+        }
+        context = _Context(module, prefix, imports)
+        for sub in statement[2]:
+            yield sub, context
+            if sub[0] == "include" and sub[1] in submodules and sub[1] not in seen:
+                seen.add(sub[1])
+                submodule = submodules[sub[1]]
+                belongs_to = [s for s in submodule[2] if s[0] == "belongs-to"]
+                submodule_prefix = (
+                    _substatement(belongs_to[0][2], "prefix") if belongs_to else prefix
+                )
+                yield from self._module_statements(
+                    module, submodule, submodule_prefix, submodules, seen
+                )
+
+    def _grouping(self, name: str, context: _Context, scope: tuple):
+        prefix, local_name = _split_name(name)
+        module_name = context.module_of(prefix)
+        if module_name == context.module.name:
+            while scope:
+                groupings, scope = scope
+                if local_name in groupings:
+                    return groupings[local_name]
+        module = self.modules.get(module_name)
+        if module and local_name in module.groupings:
+            statement, grouping_context = module.groupings[local_name]
+            return statement, grouping_context, None
+        return None
+
+    def nodes(
+        self,
+        statements: list,
+        context: _Context,
+        namespace: str,
+        module: str,
+        scope: tuple,
+        config: bool,
+        depth: int = 0,
+    ) -> list:
+        """Returns the schema nodes (including choice and case) defined by statements"""
+        groupings = {
+            statement[1]: (statement, context, None)
+            for statement in statements
+            if statement[0] == "grouping"
+        }
+        if groupings:
+            scope = (groupings, scope)
+            # Nested groupings resolve names in the scope they were defined in
+            for name, (statement, grouping_context, _) in groupings.items():
+                groupings[name] = (statement, grouping_context, scope)
+
+        nodes = []
+        for keyword, argument, substatements in statements:
+            if keyword in DATA_NODES or keyword in ("choice", "case"):
+                nodes.append(
+                    self.node(
+                        keyword,
+                        argument,
+                        substatements,
+                        context,
+                        namespace,
+                        module,
+                        scope,
+                        config,
+                        depth,
+                    )
+                )
+            elif keyword == "uses":
+                if depth > _MAX_USES_DEPTH:
+                    logger.debug(f"Ignoring uses {argument}, nested too deep")
+                    continue
+                found = self._grouping(argument, context, scope)
+                if found is None:
+                    logger.debug(
+                        f"Unable to resolve grouping {argument} in {context.module.name}"
+                    )
+                    continue
+                grouping, grouping_context, grouping_scope = found
+                used = self.nodes(
+                    grouping[2],
+                    grouping_context,
+                    namespace,
+                    module,
+                    grouping_scope,
+                    config,
+                    depth + 1,
+                )
+                for sub in substatements:
+                    if sub[0] == "augment":
+                        target = self.descendant(used, sub[1])
+                        if target is not None:
+                            target["children"] += self.nodes(
+                                sub[2],
+                                context,
+                                namespace,
+                                module,
+                                scope,
+                                target["config"],
+                                depth + 1,
+                            )
+                nodes += used
+        return nodes
+
+    def node(
+        self,
+        keyword: str,
+        argument: str,
+        substatements: list,
+        context: _Context,
+        namespace: str,
+        module: str,
+        scope: tuple,
+        config: bool,
+        depth: int,
+    ) -> dict:
+        if _substatement(substatements, "config") == "false":
+            config = False
+        node = {
+            "kind": keyword,
+            "name": argument,
+            "namespace": namespace,
+            "module": module,
+            "config": config,
+            "children": [],
+        }
+        if keyword == "list":
+            node["keys"] = (_substatement(substatements, "key") or "").split()
+        if keyword not in LEAF_NODES:
+            node["children"] = self.nodes(
+                substatements, context, namespace, module, scope, config, depth
+            )
+            if keyword == "choice":
+                # Shorthand cases are data nodes directly under the choice
+                node["children"] = [
+                    (
+                        child
+                        if child["kind"] == "case"
+                        else dict(
+                            child,
+                            kind="case",
+                            children=[child],
+                        )
+                    )
+                    for child in node["children"]
+                ]
+        return node
+
+    @staticmethod
+    def descendant(nodes: list, path: str) -> Optional[dict]:
+        """Resolves a descendant schema node identifier (eg. a/b:c) in a list of schema nodes"""
+        node = None
+        for name in path.strip("/").split("/"):
+            _, local_name = _split_name(name)
+            node = next((n for n in nodes if n["name"] == local_name), None)
+            if node is None:
+                return None
+            nodes = node["children"]
+        return node
+
+    def absolute(self, roots: list, path: str, context: _Context) -> Optional[dict]:
+        """Resolves an absolute schema node identifier (eg. /if:interfaces/if:interface)"""
+        node = None
+        nodes = roots
+        for name in path.strip().strip("/").split("/"):
+            prefix, local_name = _split_name(name)
+            module = self.modules.get(context.module_of(prefix))
+            namespace = module.namespace if module else None
+            node = next(
+                (
+                    n
+                    for n in nodes
+                    if n["name"] == local_name and n["namespace"] == namespace
+                ),
+                None,
+            )
+            if node is None:
+                return None
+            nodes = node["children"]
+        return node
+
+    def compile(self) -> list:
+        roots = []
+        for module in self.modules.values():
+            for statement, context in module.statements:
+                if statement[0] in DATA_NODES or statement[0] in ("choice", "uses"):
+                    roots += self.nodes(
+                        [statement],
+                        context,
+                        module.namespace,
+                        module.name,
+                        None,
+                        True,
+                    )
+
+        # Augments can target nodes added by other augments, retry until nothing changes
+        pending = [
+            (statement, context, module)
+            for module in self.modules.values()
+            for statement, context in module.statements
+            if statement[0] == "augment"
+        ]
+        while pending:
+            remaining = []
+            for statement, context, module in pending:
+                target = self.absolute(roots, statement[1], context)
+                if target is None or target["kind"] in LEAF_NODES:
+                    remaining.append((statement, context, module))
+                    continue
+                target["children"] += self.nodes(
+                    statement[2],
+                    context,
+                    module.namespace,
+                    module.name,
+                    None,
+                    target["config"],
+                )
+            if len(remaining) == len(pending):
+                # Mostly augments of RPCs, actions and notifications which aren't part of the data tree
+                logger.debug(
+                    f"Ignored {len(remaining)} augments which don't target a data node: "
+                    + ", ".join(statement[1] for statement, _, _ in remaining[:5])
+                    + (", ..." if len(remaining) > 5 else "")
+                )
+                break
+            pending = remaining
+
+        for module in self.modules.values():
+            for statement, context in module.statements:
+                if statement[0] != "deviation":
+                    continue
+                for deviate in statement[2]:
+                    if deviate[0] == "deviate" and deviate[1] == "not-supported":
+                        self._remove(roots, statement[1], context)
+        return roots
+
+    def _remove(self, roots: list, path: str, context: _Context) -> None:
+        parent_path, _, _ = path.strip().rstrip("/").rpartition("/")
+        target = self.absolute(roots, path, context)
+        if target is None:
+            return
+        parent = self.absolute(roots, parent_path, context) if parent_path else None
+        siblings = parent["children"] if parent else roots
+        if target in siblings:
+            siblings.remove(target)
+        else:
+            # Data node inside a choice/case
+            for case in (n for n in siblings if n["kind"] in ("choice", "case")):
+                self._remove_nested(case, target)
+
+    def _remove_nested(self, node: dict, target: dict) -> None:
+        if target in node["children"]:
+            node["children"].remove(target)
+            return
+        for child in node["children"]:
+            if child["kind"] in ("choice", "case"):
+                self._remove_nested(child, target)
+
+
+def _flatten(nodes: list) -> dict:
+    """Returns the data node children of a list of schema nodes keyed by name, choice and case nodes are
+    transparent in the data tree"""
+    children = {}
+    for node in nodes:
+        if node["kind"] in ("choice", "case"):
+            for name, data_nodes in _flatten(node["children"]).items():
+                children.setdefault(name, []).extend(data_nodes)
+            continue
+
+        compiled = {
+            "kind": node["kind"],
+            "namespace": node["namespace"],
+            "module": node["module"],
+            "config": node["config"],
+        }
+        if "keys" in node:
+            compiled["keys"] = node["keys"]
+        if node["children"]:
+            compiled["children"] = _flatten(node["children"])
+        children.setdefault(node["name"], []).append(compiled)
+    return children
+
+
+def _split_token(token: str) -> Tuple[str, Optional[str], Optional[str]]:
+    # Same syntax as build_xml_from_cli_commands, name@namespace=value
+    namespace = value = None
+    if "@" in token:
+        token, namespace = token.split("@", 1)
+    if "=" in token:
+        token, value = token.split("=", 1)
+    return token, namespace, value
+
+
+class SchemaTree:
+    """Data tree compiled from a directory of YANG modules, used to build and validate yangcli paths and
+    complete them without a NETCONF session
+
+    Groupings, augments (including augments of other augments), choices and cases, submodules and
+    not-supported deviations are resolved when compiling. The result is persisted in the cache directory
+    using marshal and reused until a .yang file in the directory changes.
+
+    Args:
+        tree:   Compiled tree as returned by SchemaTree.compile
+    """
+
+    def __init__(self, tree: dict):
+        self.modules = tree["modules"]
+        self.roots = tree["roots"]
+        self.prefixes = {}
+        for name, module in self.modules.items():
+            self.prefixes.setdefault(module["prefix"], []).append(module["namespace"])
+
+    @staticmethod
+    def compile(yang_dir: str) -> dict:
+        """Parses every .yang file in yang_dir and returns the compiled tree"""
+        statements = []
+        for path in sorted(Path(yang_dir).glob("*.yang")):
+            try:
+                statements.append(parse_yang(path.read_text()))
+            except (ValueError, UnicodeDecodeError) as err:
+                logger.warning(f"Skipping {path}: {err}")
+
+        compiler = _Compiler(statements)
+        return {
+            "modules": {
+                name: {"prefix": module.prefix, "namespace": module.namespace}
+                for name, module in compiler.modules.items()
+            },
+            "roots": _flatten(compiler.compile()),
+        }
+
+    @staticmethod
+    def fingerprint(yang_dir: str) -> str:
+        fingerprint = hashlib.sha256(str(SCHEMA_TREE_VERSION).encode())
+        for path in sorted(Path(yang_dir).glob("*.yang")):
+            stat = path.stat()
+            fingerprint.update(
+                f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode()
+            )
+        return fingerprint.hexdigest()
+
+    @classmethod
+    def load(cls, yang_dir: str, cache_dir: str = DEFAULT_CACHE_DIR) -> "SchemaTree":
+        """Returns the schema tree of a directory of YANG modules, compiled on first use or when the
+        modules changed
+
+        Args:
+            yang_dir:   Directory containing the .yang files (eg. exported by get-yang-models)
+            cache_dir:  Root cache directory, compiled trees are stored in the schema_trees/ sub directory
+        """
+        yang_dir = os.path.abspath(yang_dir)
+        cache_path = Path(cache_dir).joinpath(
+            "schema_trees",
+            f"{hashlib.sha256(yang_dir.encode()).hexdigest()[:16]}.marshal",
+        )
+        fingerprint = cls.fingerprint(yang_dir)
+        try:
+            with cache_path.open("rb") as in_file:
+                cached = marshal.load(in_file)
+            if cached["fingerprint"] == fingerprint:
+                return cls(cached["tree"])
+        except (OSError, ValueError, EOFError, TypeError, KeyError):
+            pass
+
+        logger.info(f"Compiling YANG schema tree of {yang_dir}")
+        tree = cls.compile(yang_dir)
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_name(f".{cache_path.name}.{os.getpid()}")
+            with tmp_path.open("wb") as out_file:
+                marshal.dump({"fingerprint": fingerprint, "tree": tree}, out_file)
+            os.replace(tmp_path, cache_path)
+        except OSError as err:
+            logger.warning(f"Unable to store compiled schema tree: {err}")
+        return cls(tree)
+
+    def _select(
+        self, children: dict, token: str, path: str
+    ) -> Tuple[str, dict, Optional[str]]:
+        name, namespace, value = _split_token(token)
+        prefix, name = _split_name(name)
+        candidates = children.get(name, [])
+        if namespace:
+            candidates = [c for c in candidates if c["namespace"] == namespace]
+        elif prefix:
+            namespaces = self.prefixes.get(prefix, [])
+            candidates = [c for c in candidates if c["namespace"] in namespaces]
+
+        if not candidates:
+            suggestions = difflib.get_close_matches(name, list(children), n=3)
+            raise ValueError(
+                f"Unknown node {name} in {path or '/'}"
+                + (f", did you mean {' or '.join(suggestions)}?" if suggestions else "")
+            )
+        if len(candidates) > 1:
+            raise ValueError(
+                f"{name} in {path or '/'} is defined by "
+                + ", ".join(f"{c['module']} ({c['namespace']})" for c in candidates)
+                + ", use prefix:name or name@namespace"
+            )
+        return name, candidates[0], value
+
+    def resolve(self, command: str) -> List[Tuple[str, dict, Optional[str], int]]:
+        """Resolves a yangcli command into a list of (name, node, value, parent index) tuples, parent index is
+        the position of the parent node in the list (-1 for the root)
+
+        A leaf with a value selects the list entry (or filters the content), the following nodes continue in
+        the parent of the leaf. eg. interfaces interface name=eth0 config
+
+        Raises:
+            ValueError: A node doesn't exist in the schema tree or is ambiguous
+        """
+        tokens = command.split()
+        resolved = []
+        children = self.roots
+        parent = -1
+        path = ""
+        for token in tokens:
+            name, node, value = self._select(children, token, path)
+            resolved.append((name, node, value, parent))
+            if node["kind"] in LEAF_NODES:
+                if value is None and len(resolved) < len(tokens):
+                    raise ValueError(
+                        f"{path}/{name} is a {node['kind']} without children"
+                    )
+                continue
+            if value is not None:
+                raise ValueError(
+                    f"{path}/{name} is a {node['kind']} and can't have a value"
+                )
+            parent = len(resolved) - 1
+            path = f"{path}/{name}"
+            children = node.get("children", {})
+        return resolved
+
+    def build_filter(self, command: str, config_only: bool = False) -> str:
+        """Returns the subtree filter of a yangcli command, namespaces are set from the schema tree
+
+        Args:
+            command:        CLI like command (eg. interfaces interface name=eth0 config)
+            config_only:    Reject state data (config false) nodes which are never returned by get-config
+
+        Raises:
+            ValueError: Invalid command
+        """
+        resolved = self.resolve(command)
+        if not resolved:
+            raise ValueError("Empty command")
+
+        elements = []
+        for name, node, value, parent in resolved:
+            if config_only and not node["config"]:
+                raise ValueError(
+                    f"{name} is state data (config false) and is never returned by get-config"
+                )
+            if parent < 0:
+                element = ElementTree.Element(name, {"xmlns": node["namespace"]})
+            else:
+                element = ElementTree.SubElement(elements[parent][0], name)
+                if node["namespace"] != elements[parent][1]:
+                    element.set("xmlns", node["namespace"])
+            if value is not None:
+                element.text = value
+            elements.append((element, node["namespace"]))
+        return ElementTree.tostring(elements[0][0], encoding="unicode")
+
+    def complete(self, command: str) -> List[str]:
+        """Returns the completions of the last (partial) node of a yangcli command as full commands"""
+        tokens = command.split()
+        if not command or command[-1].isspace():
+            tokens.append("")
+        try:
+            resolved = self.resolve(" ".join(tokens[:-1]))
+        except ValueError:
+            return []
+
+        children = self.roots
+        for _, node, _, _ in resolved:
+            if node["kind"] not in LEAF_NODES:
+                children = node.get("children", {})
+        base = " ".join(tokens[:-1])
+        return [
+            f"{base} {name}".lstrip()
+            for name in sorted(children)
+            if name.startswith(tokens[-1])
+        ]
@@ -0,0 +1,262 @@
+import difflib
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from io import StringIO
+from pathlib import Path
+from typing import Iterator, Optional
+
+from netconf_tool.cache import write_json_atomic
+from netconf_tool.streaming import write_pretty_xml
+
+DEFAULT_KEYFRAME_INTERVAL = 10
+
+
+def normalize_config(data_xml: str) -> str:
+    """Returns the configuration in a normalized form so the same configuration always hashes the same
+
+    Whitespace between elements is replaced by the indentation of a one element per line pretty print
+    (which also keeps deltas between snapshots small), namespace declarations and attributes are sorted,
+    and comments and processing instructions are removed.
+
+    Args:
+        data_xml:   Data of a get-config reply as an XML string
+    """
+    out = StringIO()
+    write_pretty_xml(data_xml, out, sort_attributes=True)
+    return out.getvalue()
+
+
+def make_delta(base: list, target: list) -> list:
+    """Returns the operations turning the base lines into the target lines, either
+    ["=", start, end] to copy a range of base lines or ["+", lines] to insert new lines
+    """
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base, target)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i1, i2])
+        elif tag in ("replace", "insert"):
+            ops.append(["+", target[j1:j2]])
+    return ops
+
+
+def apply_delta(base: list, ops: list) -> list:
+    lines = []
+    for op in ops:
+        if op[0] == "=":
+            lines.extend(base[op[1] : op[2]])
+        else:
+            lines.extend(op[1])
+    return lines
+
+
+class SnapshotStore:
+    """Per device history of configuration snapshots
+
+    Every device has its own directory containing an index.json and the stored objects. Snapshots
+    are identified by the sha256 of the normalized configuration: when the configuration didn't
+    change the snapshot only references the object already stored. A new configuration is stored as
+    a gzip compressed delta against the previous snapshot, or as a full keyframe for the first
+    snapshot, every keyframe_interval deltas and whenever the delta isn't smaller than the keyframe.
+
+    Args:
+        snapshot_dir:       Root directory of the snapshot store
+        keyframe_interval:  Maximum number of deltas applied to rebuild a snapshot
+    """
+
+    def __init__(
+        self,
+        snapshot_dir: str,
+        keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+    ):
+        self.directory = Path(snapshot_dir)
+        self.keyframe_interval = keyframe_interval
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def device_name(host: str, port: int) -> str:
+        return f"{host}_{port}"
+
+    def device_directory(self, host: str, port: int) -> Path:
+        return self.directory.joinpath(self.device_name(host, port))
+
+    def load_index(self, host: str, port: int) -> dict:
+        try:
+            with self.device_directory(host, port).joinpath("index.json").open() as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"snapshots": [], "objects": {}}
+
+    def snapshots(self, host: str, port: int) -> list:
+        return self.load_index(host, port)["snapshots"]
+
+    def get(self, host: str, port: int, snapshot_id: Optional[int] = None) -> dict:
+        """Returns a snapshot entry, the latest one when snapshot_id is not set
+
+        Args:
+            host:           NETCONF Server
+            port:           Port of the NETCONF Server
+            snapshot_id:    ID of the snapshot, negative numbers count back from the latest snapshot
+        """
+        snapshots = self.snapshots(host, port)
+        if not snapshots:
+            raise KeyError(f"No snapshots stored for {host}:{port}")
+        if snapshot_id is None:
+            return snapshots[-1]
+        if snapshot_id < 0:
+            if -snapshot_id > len(snapshots):
+                raise KeyError(
+                    f"Only {len(snapshots)} snapshots stored for {host}:{port}"
+                )
+            return snapshots[snapshot_id]
+        for snapshot in snapshots:
+            if snapshot["id"] == snapshot_id:
+                return snapshot
+        raise KeyError(f"Snapshot {snapshot_id} not found for {host}:{port}")
+
+    def _object_path(self, host: str, port: int, digest: str) -> Path:
+        return self.device_directory(host, port).joinpath("objects", f"{digest}.gz")
+
+    def _write_object(self, host: str, port: int, digest: str, encoded: bytes) -> None:
+        path = self._object_path(host, port, digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}")
+        tmp_path.write_bytes(encoded)
+        os.replace(tmp_path, path)
+
+    def _lines(self, host: str, port: int, index: dict, digest: str) -> list:
+        # Walk back to the keyframe and apply the deltas forward
+        chain = []
+        while True:
+            chain.append(digest)
+            base = index["objects"][digest]["base"]
+            if base is None:
+                break
+            digest = base
+
+        lines = None
+        for digest in reversed(chain):
+            with gzip.open(self._object_path(host, port, digest)) as in_file:
+                data = json.load(in_file)
+            lines = data if lines is None else apply_delta(lines, data)
+        return lines
+
+    def content(self, host: str, port: int, snapshot_id: Optional[int] = None) -> str:
+        """Returns the normalized configuration of a snapshot"""
+        snapshot = self.get(host, port, snapshot_id)
+        index = self.load_index(host, port)
+        return "".join(self._lines(host, port, index, snapshot["sha256"]))
+
+    def add(self, host: str, port: int, data_xml: str) -> dict:
+        """Stores a configuration and returns the new snapshot entry
+
+        Args:
+            host:       NETCONF Server the configuration was retrieved from
+            port:       Port of the NETCONF Server
+            data_xml:   Data of the get-config reply as an XML string
+        """
+        normalized = normalize_config(data_xml)
+        digest = hashlib.sha256(normalized.encode()).hexdigest()
+
+        with self.lock:
+            index = self.load_index(host, port)
+            snapshots = index["snapshots"]
+            objects = index["objects"]
+            previous = snapshots[-1] if snapshots else None
+
+            if digest in objects:
+                stored = "reference"
+            else:
+                lines = normalized.splitlines(keepends=True)
+                stored = "keyframe"
+                encoded = gzip.compress(json.dumps(lines).encode())
+                objects[digest] = {"base": None, "depth": 0}
+
+                base = previous["sha256"] if previous else None
+                if base and objects[base]["depth"] < self.keyframe_interval:
+                    delta = make_delta(self._lines(host, port, index, base), lines)
+                    encoded_delta = gzip.compress(json.dumps(delta).encode())
+                    # A delta which isn't smaller than the full configuration is useless
+                    if len(encoded_delta) < len(encoded):
+                        stored = "delta"
+                        encoded = encoded_delta
+                        objects[digest] = {
+                            "base": base,
+                            "depth": objects[base]["depth"] + 1,
+                        }
+
+                objects[digest]["size"] = len(encoded)
+                self._write_object(host, port, digest, encoded)
+
+            snapshot = {
+                "id": previous["id"] + 1 if previous else 1,
+                "timestamp": time.time(),
+                "sha256": digest,
+                "size": len(normalized),
+                "stored": stored,
+                "changed": previous is None or previous["sha256"] != digest,
+            }
+            snapshots.append(snapshot)
+            write_json_atomic(
+                self.device_directory(host, port).joinpath("index.json"), index
+            )
+        return snapshot
+
+    def add_unchanged(self, host: str, port: int) -> dict:
+        """Stores a snapshot referencing the latest snapshot, used when the configuration is known to be
+        unchanged without retrieving it
+
+        Args:
+            host:   NETCONF Server
+            port:   Port of the NETCONF Server
+        """
+        with self.lock:
+            index = self.load_index(host, port)
+            previous = index["snapshots"][-1]
+            snapshot = dict(
+                previous,
+                id=previous["id"] + 1,
+                timestamp=time.time(),
+                stored="reference",
+                changed=False,
+            )
+            index["snapshots"].append(snapshot)
+            write_json_atomic(
+                self.device_directory(host, port).joinpath("index.json"), index
+            )
+        return snapshot
+
+    def diff(
+        self,
+        host: str,
+        port: int,
+        from_id: Optional[int] = None,
+        to_id: Optional[int] = None,
+        context: int = 3,
+    ) -> Iterator[str]:
+        """Yields a unified diff between two snapshots, nothing is yielded when both are identical
+
+        Args:
+            host:       NETCONF Server
+            port:       Port of the NETCONF Server
+            from_id:    Snapshot to compare from, defaults to the snapshot before the latest one
+            to_id:      Snapshot to compare to, defaults to the latest snapshot
+            context:    Number of context lines
+        """
+        old = self.get(host, port, -2 if from_id is None else from_id)
+        new = self.get(host, port, to_id)
+        if old["sha256"] == new["sha256"]:
+            return
+
+        index = self.load_index(host, port)
+        yield from difflib.unified_diff(
+            self._lines(host, port, index, old["sha256"]),
+            self._lines(host, port, index, new["sha256"]),
+            fromfile=f"{self.device_name(host, port)}@{old['id']}",
+            tofile=f"{self.device_name(host, port)}@{new['id']}",
+            n=context,
+        )
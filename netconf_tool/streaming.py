@@ -0,0 +1,277 @@
+import json
+import sys
+import tempfile
+from typing import Callable, TextIO
+from xml.parsers import expat
+from xml.sax.saxutils import escape, quoteattr
+from loguru import logger
+
+from netconf_tool.timings import output_phase
+
+CHUNK_SIZE = 1024 * 1024
+SPOOL_SIZE = 4 * 1024 * 1024
+
+
+def iter_chunks(data_xml: str, chunk_size: int = CHUNK_SIZE):
+    """Yields slices of an XML string so the parser can be fed incrementally
+
+    Args:
+        data_xml:   XML document
+        chunk_size: Number of characters per slice
+    """
+    for offset in range(0, len(data_xml), chunk_size):
+        yield data_xml[offset : offset + chunk_size]
+
+
+def _parse(data_xml: str, start: Callable, end: Callable, text: Callable) -> None:
+    # Namespace processing is disabled on purpose, tags keep their original prefixes and
+    # xmlns declarations are reported as attributes which is the same behaviour as xmltodict
+    parser = expat.ParserCreate()
+    parser.ordered_attributes = True
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = text
+    for chunk in iter_chunks(data_xml):
+        parser.Parse(chunk, False)
+    parser.Parse("", True)
+
+
+def write_pretty_xml(
+    data_xml: str, out: TextIO, indent: str = "  ", sort_attributes: bool = False
+) -> None:
+    """Parses an XML document once and writes it indented to out while it is being parsed
+
+    Text of leaf elements is written as is, whitespace only text between elements is replaced
+    by the indentation.
+
+    Args:
+        data_xml:           XML document (eg. the data_xml of a get-config reply)
+        out:                File like object to write the pretty printed XML to
+        indent:             Indentation used per level
+        sort_attributes:    Write namespace declarations and then attributes sorted by name
+    """
+    # Each frame is [tag, has children, text parts]
+    stack = []
+
+    def start(name: str, attrs: list) -> None:
+        if stack:
+            parent = stack[-1]
+            if not parent[1]:
+                out.write(">")
+                parent[1] = True
+            content = "".join(parent[2]).strip()
+            parent[2] = []
+            if content:
+                out.write(f"\n{indent * len(stack)}{escape(content)}")
+
+        pairs = [(attrs[i], attrs[i + 1]) for i in range(0, len(attrs), 2)]
+        if sort_attributes:
+            pairs.sort(key=lambda pair: (not pair[0].startswith("xmlns"), pair[0]))
+        attributes = "".join(f" {key}={quoteattr(value)}" for key, value in pairs)
+        out.write(f"\n{indent * len(stack)}<{name}{attributes}")
+        stack.append([name, False, []])
+
+    def end(name: str) -> None:
+        frame = stack.pop()
+        content = "".join(frame[2])
+        if frame[1]:
+            if content.strip():
+                out.write(f"\n{indent * (len(stack) + 1)}{escape(content.strip())}")
+            out.write(f"\n{indent * len(stack)}</{name}>")
+        elif content:
+            out.write(f">{escape(content)}</{name}>")
+        else:
+            out.write("/>")
+
+    def text(content: str) -> None:
+        stack[-1][2].append(content)
+
+    with output_phase("pretty-print", out) as out:
+        out.write('<?xml version="1.0" ?>')
+        _parse(data_xml, start, end, text)
+        out.write("\n")
+
+
+class _Passthrough:
+    """Buffer interface used for the root element which is written directly to the output"""
+
+    def __init__(self, out: TextIO):
+        self.write = out.write
+
+
+class _SpoolBuffer:
+    """Keeps serialized JSON in memory until it grows beyond SPOOL_SIZE, then spills it to a temporary file"""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.file = None
+
+    def write(self, text: str) -> None:
+        if self.file is not None:
+            self.file.write(text)
+            return
+
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size > SPOOL_SIZE:
+            self.file = tempfile.TemporaryFile("w+", encoding="utf-8")
+            self.file.write("".join(self.parts))
+            self.parts = []
+
+    def copy_to(self, write: Callable, prefix: str = None) -> None:
+        """Writes the buffer content using write and releases it, prefix is inserted after every newline"""
+        if self.file is None:
+            chunks = self.parts
+        else:
+            self.file.seek(0)
+            chunks = iter(lambda: self.file.read(CHUNK_SIZE), "")
+
+        for chunk in chunks:
+            write(chunk.replace("\n", f"\n{prefix}") if prefix else chunk)
+
+        if self.file is not None:
+            self.file.close()
+        self.parts = []
+
+
+class _JsonFrame:
+    def __init__(self, tag: str, depth: int, body):
+        self.tag = tag
+        self.depth = depth
+        self.body = body
+        self.opened = False
+        self.text = []
+        # Child tag -> [value of the first child, list of the children, number of children]
+        self.children = {}
+
+
+def write_json(data_xml: str, out: TextIO, indent: int = 4) -> None:
+    """Parses an XML document once and writes it to out as JSON while it is being parsed
+
+    The output is the same as json.dump(xmltodict.parse(data_xml), out, indent=indent), repeated
+    elements become a list at the position of the first element even when other siblings are
+    interleaved (RFC 7950 7.8.5). Serialized subtrees are held in memory up to SPOOL_SIZE and are
+    spilled to temporary files beyond that, which keeps memory usage bounded for very large documents.
+
+    >>> import io
+    >>> out = io.StringIO()
+    >>> write_json('<data xmlns="urn:x"><a>1</a><a>2</a><b/><c x="1">t</c><a>3</a></data>', out)
+    >>> json.loads(out.getvalue())
+    {'data': {'@xmlns': 'urn:x', 'a': ['1', '2', '3'], 'b': None, 'c': {'@x': '1', '#text': 't'}}}
+
+    Args:
+        data_xml:   XML document (eg. the data_xml of a get-config reply)
+        out:        File like object to write the JSON to
+        indent:     Number of spaces used per level
+    """
+    pad = " " * indent
+    stack = []
+
+    def item(frame: _JsonFrame, key: str, value=None, value_buffer=None) -> None:
+        frame.body.write("{" if not frame.opened else ",")
+        frame.opened = True
+        frame.body.write(f"\n{pad * (frame.depth + 1)}{json.dumps(key)}: ")
+        if value_buffer is not None:
+            value_buffer.copy_to(frame.body.write)
+        else:
+            frame.body.write(value)
+
+    def flush_children(frame: _JsonFrame) -> None:
+        for tag, (first, entries, count) in frame.children.items():
+            if count == 1:
+                item(frame, tag, value_buffer=first)
+            else:
+                entries.write(f"\n{pad * (frame.depth + 1)}]")
+                item(frame, tag, value_buffer=entries)
+        frame.children = {}
+
+    def add_child(frame: _JsonFrame, tag: str, value: _SpoolBuffer) -> None:
+        child = frame.children.get(tag)
+        if child is None:
+            frame.children[tag] = [value, None, 1]
+            return
+
+        # A repeated child turns into a list, list entries are one level deeper
+        list_pad = pad * (frame.depth + 2)
+        if child[2] == 1:
+            child[1] = _SpoolBuffer()
+            child[1].write(f"[\n{list_pad}")
+            child[0].copy_to(child[1].write, prefix=pad)
+            child[0] = None
+        child[1].write(f",\n{list_pad}")
+        value.copy_to(child[1].write, prefix=pad)
+        child[2] += 1
+
+    def start(name: str, attrs: list) -> None:
+        if stack:
+            frame = _JsonFrame(name, stack[-1].depth + 1, _SpoolBuffer())
+        else:
+            out.write(f"{{\n{pad}{json.dumps(name)}: ")
+            frame = _JsonFrame(name, 1, _Passthrough(out))
+
+        for i in range(0, len(attrs), 2):
+            item(frame, f"@{attrs[i]}", json.dumps(attrs[i + 1]))
+        stack.append(frame)
+
+    def end(name: str) -> None:
+        frame = stack.pop()
+        flush_children(frame)
+        content = "".join(frame.text).strip() or None
+        if frame.opened:
+            if content:
+                item(frame, "#text", json.dumps(content))
+            frame.body.write(f"\n{pad * frame.depth}}}")
+        else:
+            frame.body.write(json.dumps(content))
+
+        if stack:
+            add_child(stack[-1], name, frame.body)
+        else:
+            out.write("\n}")
+
+    def text(content: str) -> None:
+        stack[-1].text.append(content)
+
+    with output_phase("json", out) as out:
+        _parse(data_xml, start, end, text)
+
+
+def export_data(
+    data_xml: str,
+    operation: str,
+    format_json: bool,
+    export_xml: str,
+    export_json: str,
+) -> None:
+    """Writes the data of a NETCONF reply based on the common format options, the reply is parsed once
+    and streamed to the file (or stdout) instead of building the full pretty printed document in memory
+
+    Args:
+        data_xml:       Data of the NETCONF reply as an XML string
+        operation:      Name of the operation used in log messages
+        format_json:    Print the data as JSON when no export file is used
+        export_xml:     Export the data to this file in XML format
+        export_json:    Export the data to this file in JSON format
+    """
+    if export_xml:
+        with open(export_xml, "w") as out_file:
+            write_pretty_xml(data_xml, out_file)
+        logger.success(f"Exported {operation} operation to {export_xml} in XML format")
+        return
+
+    if export_json:
+        with open(export_json, "w") as out_file:
+            write_json(data_xml, out_file)
+        logger.success(
+            f"Exported {operation} operation to {export_json} in JSON format"
+        )
+        return
+
+    if format_json:
+        write_json(data_xml, sys.stdout)
+        sys.stdout.write("\n")
+        return
+
+    write_pretty_xml(data_xml, sys.stdout)
@@ -1,9 +1,26 @@
-from netconf_tool.cli import cli
+import click
+from netconf_tool.lazy import LazyGroup
 
 
-@cli.group("subscription")
+# Commands are imported once they are used so a destination's client library is only
+# imported when forwarding to it
+@click.group(
+    "subscription",
+    cls=LazyGroup,
+    lazy_subcommands={
+        "local": (
+            "netconf_tool.subscription.local:cli_subscription_local",
+            "Create a local event listener using...",
+        ),
+        "rabbitmq": (
+            "netconf_tool.subscription.rabbitmq:cli_subscription_rabbitmq",
+            "Create a local event listener using...",
+        ),
+        "redis-pubsub": (
+            "netconf_tool.subscription.redis:cli_subscription_redis_pubsub",
+            "Create a local event listener using...",
+        ),
+    },
+)
 def netconf_tool_cli_subscription() -> None:
     """Tools to deal with <create-subscription> and NETCONF based events/notifications"""
-
-
-from netconf_tool.subscription import local, rabbitmq, redis
@@ -0,0 +1,144 @@
+import gzip
+import json
+from xml.parsers import expat
+
+FORMATS = ["xml", "json", "msgpack"]
+COMPRESSIONS = ["gzip", "zstd"]
+ENCODINGS = FORMATS + [
+    f"{format}+{compression}" for format in FORMATS for compression in COMPRESSIONS
+]
+CONTENT_TYPES = {
+    "xml": "application/xml",
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+}
+
+
+def notification_envelope(notification) -> dict:
+    """Converts a NETCONF <notification/> into a compact envelope with a single parse
+
+    The event element becomes the body, namespace declarations and prefixes are dropped,
+    attributes are prefixed with @ and repeated sibling elements become lists. Leaf elements are
+    strings (None when empty) and text mixed with child elements is kept under #text.
+
+        {"host": ..., "eventTime": ..., "type": ..., "namespace": ..., "body": {...}}
+
+    Args:
+        notification:   Notification received by the forwarder
+    """
+    envelope = {
+        "host": notification.host,
+        "eventTime": None,
+        "type": None,
+        "namespace": None,
+        "body": None,
+    }
+    # Each frame is [local name, children, text parts]
+    stack = []
+
+    def start(name, attrs):
+        namespace, _, local_name = name.rpartition(" ")
+        if len(stack) == 1 and envelope["type"] is None and local_name != "eventTime":
+            envelope["type"] = local_name
+            envelope["namespace"] = namespace or None
+
+        children = {}
+        for i in range(0, len(attrs), 2):
+            children[f"@{attrs[i].rpartition(' ')[2]}"] = attrs[i + 1]
+        stack.append([local_name, children, []])
+
+    def end(name):
+        local_name, children, text = stack.pop()
+        content = "".join(text).strip() or None
+        if children:
+            if content:
+                children["#text"] = content
+            value = children
+        else:
+            value = content
+
+        if len(stack) == 1:
+            # Children of the <notification/> element
+            if local_name == "eventTime" and envelope["eventTime"] is None:
+                envelope["eventTime"] = value
+            elif envelope["body"] is None:
+                envelope["body"] = value
+            return
+        if not stack:
+            return
+
+        siblings = stack[-1][1]
+        if local_name not in siblings:
+            siblings[local_name] = value
+        elif isinstance(siblings[local_name], list):
+            siblings[local_name].append(value)
+        else:
+            siblings[local_name] = [siblings[local_name], value]
+
+    def text(content):
+        stack[-1][2].append(content)
+
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.ordered_attributes = True
+    parser.buffer_text = True
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = text
+    parser.Parse(notification.xml, True)
+    return envelope
+
+
+class NotificationEncoder:
+    """Encodes notifications for the broker sinks, xml publishes the notification as received and json and
+    msgpack publish the envelope of notification_envelope, optionally compressed with gzip or zstd
+
+    msgpack and zstd require the msgpack and zstandard packages (pip install netconf_tool[msgpack,zstd]).
+
+    Args:
+        encoding:   One of ENCODINGS (eg. json+gzip)
+
+    Raises:
+        ImportError:    msgpack or zstandard is not installed
+    """
+
+    def __init__(self, encoding: str = "xml"):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unsupported encoding {encoding}")
+        self.encoding = encoding
+        self.format, _, compression = encoding.partition("+")
+        self.content_type = CONTENT_TYPES[self.format]
+        self.content_encoding = compression or None
+
+        if self.format == "msgpack":
+            import msgpack
+
+            # msgpack.packb instead of a shared Packer, the publisher workers encode concurrently
+            self._serialize = lambda envelope: msgpack.packb(
+                envelope, use_bin_type=True
+            )
+        elif self.format == "json":
+            encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+            self._serialize = lambda envelope: encoder.encode(envelope).encode()
+
+        if compression == "zstd":
+            import zstandard
+
+            # Same for zstandard.compress instead of a shared ZstdCompressor
+            self._compress = zstandard.compress
+        elif compression == "gzip":
+            self._compress = lambda data: gzip.compress(data, compresslevel=6)
+        else:
+            self._compress = None
+
+    def encode(self, notification):
+        """Returns the message body of a notification, the XML string itself for the xml encoding"""
+        if self.format == "xml":
+            data = notification.xml
+            if self._compress is None:
+                return data
+            data = data.encode()
+        else:
+            data = self._serialize(notification_envelope(notification))
+        if self._compress is not None:
+            data = self._compress(data)
+        return data
@@ -0,0 +1,856 @@
+import hashlib
+import json
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
+from loguru import logger
+from netconf_tool.aio import manager_session, session_connect
+from ncclient.operations import RPCError
+from ncclient.transport.errors import AuthenticationError
+from ncclient.transport.session import NotificationHandler, SessionListener
+from ncclient.xml_ import NETCONF_NOTIFICATION_NS, qualify
+
+from netconf_tool.cache import DeviceStateCache
+from netconf_tool.changes import (
+    CONFIG_CHANGE_EVENT,
+    HEARTBEAT_INTERVAL,
+    record_config_change,
+    record_heartbeat,
+    record_subscription,
+    record_subscription_lost,
+    record_subscription_replayed,
+)
+from netconf_tool.helpers import (
+    notification_event_time,
+    notification_event_type,
+    parse_event_time,
+)
+from netconf_tool.metrics import ForwarderStats, MetricsServer
+from netconf_tool.subscription.filters import EventFilter, subscription_filter
+from netconf_tool.subscription.yang_push import UPDATE_EVENTS, YangPush
+
+BACKPRESSURE_POLICIES = ["block", "drop-oldest", "spill"]
+REPLAY_COMPLETE_EVENT = "replayComplete"
+# Seconds between persisting checkpoints and the number of forwarded notifications per device
+# remembered to suppress duplicates when replaying after a reconnect
+CHECKPOINT_INTERVAL = 5
+RECENT_NOTIFICATIONS = 1000
+
+
+class Notification:
+    """A notification received from a NETCONF server waiting to be published
+
+    Args:
+        host:       NETCONF Server the notification was received from
+        xml:        Notification XML as received
+        received:   time.time() when the notification was taken from the NETCONF session
+        port:       Port of the NETCONF Server
+        event_time: eventTime of the notification as sent by the NETCONF Server
+        produced:   eventTime of a YANG-Push update as a timestamp, used to measure the end to end latency
+    """
+
+    __slots__ = ("host", "xml", "received", "port", "event_time", "produced")
+
+    def __init__(
+        self,
+        host: str,
+        xml: str,
+        received: float = None,
+        port: int = None,
+        event_time: str = None,
+        produced: float = None,
+    ):
+        self.host = host
+        self.xml = xml
+        self.received = received if received is not None else time.time()
+        self.port = port
+        self.event_time = event_time
+        self.produced = produced
+
+    def to_json(self) -> str:
+        return json.dumps({slot: getattr(self, slot) for slot in self.__slots__})
+
+    @classmethod
+    def from_json(cls, line: str) -> "Notification":
+        return cls(**json.loads(line))
+
+
+class SpillFile:
+    """Append only file used to hold notifications on disk while the in-memory queue is full
+
+    Args:
+        directory:  Directory to create the spill file in, defaults to the temp directory
+    """
+
+    def __init__(self, directory: str = None):
+        self.lock = threading.Lock()
+        fd, self.path = tempfile.mkstemp(
+            prefix="netconf-tool-spill-", suffix=".jsonl", dir=directory
+        )
+        self.writer = os.fdopen(fd, "w")
+        self.reader = open(self.path)
+        self.pending = 0
+
+    def write(self, notification: Notification) -> None:
+        with self.lock:
+            self.writer.write(notification.to_json() + "\n")
+            self.writer.flush()
+            self.pending += 1
+
+    def read(self, count: int) -> list:
+        """Returns up to count of the oldest notifications on disk"""
+        with self.lock:
+            notifications = []
+            while self.pending and len(notifications) < count:
+                notifications.append(Notification.from_json(self.reader.readline()))
+                self.pending -= 1
+
+            if not self.pending:
+                # Everything was read back, start over to keep the file small
+                self.writer.seek(0)
+                self.writer.truncate()
+                self.reader.seek(0)
+            return notifications
+
+    def close(self) -> None:
+        self.writer.close()
+        self.reader.close()
+        os.unlink(self.path)
+
+
+class ForwardingEngine:
+    """Decouples receiving notifications from publishing them to a broker
+
+    The NETCONF session reader puts notifications in a bounded queue and returns immediately,
+    a configurable number of publisher workers take batches from the queue and publish them
+    using a sink. When the queue is full the backpressure policy decides what happens:
+
+        block:          The reader waits until there is space in the queue
+        drop-oldest:    The oldest queued notification is dropped
+        spill:          Notifications are written to disk and fed back in order once there is space
+
+    Args:
+        sink_factory:   Callable returning a sink (object with publish(notifications) and close()),
+                        called once per worker so sinks which are not thread safe get their own connection
+        workers:        Number of publisher threads
+        queue_size:     Maximum number of notifications held in memory
+        backpressure:   One of BACKPRESSURE_POLICIES
+        spill_dir:      Directory for the spill file when backpressure is spill
+        batch_size:     Maximum number of notifications passed to the sink at once
+        batch_interval: Maximum seconds a notification waits for its batch to fill up
+        on_published:   Called with every batch the sink published successfully
+    """
+
+    def __init__(
+        self,
+        sink_factory: Callable,
+        workers: int = 1,
+        queue_size: int = 10000,
+        backpressure: str = "block",
+        spill_dir: str = None,
+        batch_size: int = 1,
+        batch_interval: float = 0.1,
+        on_published: Callable = None,
+    ):
+        if backpressure not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unsupported backpressure policy: {backpressure}")
+
+        self.sink_factory = sink_factory
+        self.workers = workers
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.backpressure = backpressure
+        self.spill = SpillFile(spill_dir) if backpressure == "spill" else None
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.on_published = on_published
+        self.stats = ForwarderStats()
+        self.stopping = threading.Event()
+        self.discarding = threading.Event()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.refill_thread = None
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize() + (self.spill.pending if self.spill else 0)
+
+    def start(self) -> None:
+        """Creates a sink per worker and starts the publisher threads, sink errors are raised to the caller"""
+        sinks = [self.sink_factory() for _ in range(self.workers)]
+        for n, sink in enumerate(sinks):
+            thread = threading.Thread(
+                target=self._worker, args=(sink,), name=f"publisher-{n}", daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+        if self.spill:
+            self.refill_thread = threading.Thread(
+                target=self._refill, name="spill", daemon=True
+            )
+            self.refill_thread.start()
+            self.threads.append(self.refill_thread)
+
+    def put(self, notification: Notification) -> None:
+        """Queues a notification applying the backpressure policy, called by the session reader"""
+        if self.backpressure == "block":
+            self.queue.put(notification)
+        elif self.backpressure == "drop-oldest":
+            with self.lock:
+                while True:
+                    try:
+                        self.queue.put_nowait(notification)
+                        break
+                    except queue.Full:
+                        try:
+                            self.queue.get_nowait()
+                            self.stats.record_dropped()
+                        except queue.Empty:
+                            pass
+        else:
+            with self.lock:
+                # Once something is on disk everything goes to disk to keep the order
+                if self.spill.pending:
+                    self.spill.write(notification)
+                    self.stats.record_spilled()
+                else:
+                    try:
+                        self.queue.put_nowait(notification)
+                    except queue.Full:
+                        self.spill.write(notification)
+                        self.stats.record_spilled()
+
+        self.stats.record_received(self.depth)
+
+    def _refill(self) -> None:
+        while not self.discarding.is_set() and (
+            self.spill.pending or not self.stopping.is_set()
+        ):
+            with self.lock:
+                room = self.queue.maxsize - self.queue.qsize()
+                notifications = self.spill.read(room) if room > 0 else []
+                for notification in notifications:
+                    self.queue.put_nowait(notification)
+            if not notifications:
+                time.sleep(0.05)
+
+    def _take_batch(self) -> list:
+        try:
+            batch = [self.queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.batch_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self, sink) -> None:
+        try:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    if self.stopping.is_set() and not self.depth:
+                        return
+                    continue
+
+                started = time.perf_counter()
+                try:
+                    sink.publish(batch)
+                except Exception as err:
+                    logger.error(f"Unable to publish {len(batch)} notifications: {err}")
+                    self.stats.record_failure(len(batch))
+                    continue
+
+                now = time.time()
+                self.stats.record(len(batch), time.perf_counter() - started)
+                self.stats.record_lag([now - n.received for n in batch])
+                updates = [now - n.produced for n in batch if n.produced is not None]
+                if updates:
+                    self.stats.record_updates(updates)
+                self.stats.update_depth(self.depth)
+                if self.on_published:
+                    self.on_published(batch)
+        finally:
+            sink.close()
+
+    def stop(self, timeout: float = 10) -> None:
+        """Stops accepting work, waits up to timeout seconds for the queue to drain and closes the sinks"""
+        self.stopping.set()
+        deadline = time.monotonic() + timeout
+        for thread in self.threads:
+            thread.join(timeout=max(0, deadline - time.monotonic()))
+
+        # The refill thread may still be reading the spill file when the queue didn't drain in time,
+        # it's stopped before the file is closed
+        self.discarding.set()
+        if self.refill_thread:
+            self.refill_thread.join()
+        if self.depth:
+            logger.warning(f"Discarding {self.depth} unpublished notifications")
+        if self.spill:
+            self.spill.close()
+
+
+def notification_digest(notification_xml: str) -> str:
+    return hashlib.sha1(notification_xml.encode()).hexdigest()[:16]
+
+
+class Checkpoints:
+    """Tracks the eventTime of the last published notification of every NETCONF server and persists it in the
+    device state cache, a new subscription replays the notifications since the checkpoint (RFC 5277 startTime)
+
+    The digests of the published notifications sharing the checkpoint eventTime are kept as well since
+    a replay starting at the checkpoint sends them again.
+
+    Args:
+        state:  Device state cache the checkpoints are persisted in
+    """
+
+    def __init__(self, state: DeviceStateCache):
+        self.state = state
+        self.lock = threading.Lock()
+        self.checkpoints = {}
+        self.dirty = set()
+
+    def get(self, host: str, port: int) -> Optional[dict]:
+        with self.lock:
+            if (host, port) not in self.checkpoints:
+                record = self.state.get(host, port, "checkpoint")
+                self.checkpoints[(host, port)] = (
+                    record if record.get("event_time") else None
+                )
+            return self.checkpoints[(host, port)]
+
+    def update(self, notifications: list) -> None:
+        """Moves the checkpoints forward, used as the on_published callback of the forwarding engine"""
+        with self.lock:
+            for notification in notifications:
+                if not notification.event_time:
+                    continue
+                try:
+                    event_time = parse_event_time(notification.event_time)
+                except ValueError:
+                    continue
+
+                key = (notification.host, notification.port)
+                checkpoint = self.checkpoints.get(key)
+                previous = (
+                    parse_event_time(checkpoint["event_time"]) if checkpoint else None
+                )
+                digest = notification_digest(notification.xml)
+                if previous is None or event_time > previous:
+                    self.checkpoints[key] = {
+                        "event_time": notification.event_time,
+                        "boundary": [digest],
+                    }
+                elif event_time == previous and len(checkpoint["boundary"]) < 1000:
+                    checkpoint["boundary"].append(digest)
+                else:
+                    continue
+                self.dirty.add(key)
+
+    def save(self) -> None:
+        with self.lock:
+            dirty = {key: dict(self.checkpoints[key]) for key in self.dirty}
+            self.dirty = set()
+        for (host, port), checkpoint in dirty.items():
+            self.state.update(host, port, "checkpoint", **checkpoint)
+
+
+class ForwarderListener(SessionListener):
+    """ncclient session listener which puts notifications straight into the forwarding engine from
+    the session transport thread, so no reader thread is needed per NETCONF session
+
+    Args:
+        subscription:   Subscription of the NETCONF session
+    """
+
+    def __init__(self, subscription: "DeviceSubscription"):
+        self.subscription = subscription
+
+    def callback(self, root, raw):
+        tag, _ = root
+        if tag != qualify("notification", NETCONF_NOTIFICATION_NS):
+            return
+
+        subscription = self.subscription
+        event_time = notification_event_time(raw)
+        if subscription.replaying:
+            if (
+                REPLAY_COMPLETE_EVENT in raw
+                and notification_event_type(raw) == REPLAY_COMPLETE_EVENT
+            ):
+                subscription.replay_complete()
+                return
+            if subscription.is_duplicate(raw, event_time):
+                subscription.engine.stats.record_suppressed()
+                return
+
+        # Config changes are tracked even when the event itself isn't forwarded
+        if (
+            subscription.state
+            and CONFIG_CHANGE_EVENT in raw
+            and notification_event_type(raw) == CONFIG_CHANGE_EVENT
+        ):
+            record_config_change(
+                subscription.state, subscription.host, subscription.port
+            )
+        if subscription.event_filter and not subscription.event_filter.match(raw):
+            subscription.engine.stats.record_filtered()
+            return
+        subscription.remember(raw)
+
+        logger.debug(
+            f"Received NETCONF <notification/> from {subscription.host}:\n{raw}"
+        )
+        produced = None
+        if (
+            subscription.yang_push
+            and event_time
+            and "push-" in raw
+            and notification_event_type(raw) in UPDATE_EVENTS
+        ):
+            try:
+                produced = parse_event_time(event_time).timestamp()
+            except ValueError:
+                pass
+        subscription.engine.put(
+            Notification(
+                subscription.host,
+                raw,
+                port=subscription.port,
+                event_time=event_time,
+                produced=produced,
+            )
+        )
+
+    def errback(self, ex):
+        logger.error(f"NETCONF session to {self.subscription.host} failed: {ex}")
+
+
+class DeviceSubscription:
+    """Notification subscription to one NETCONF server which is re-established with exponential backoff
+    when the NETCONF session is lost
+
+    With checkpoints, the subscription replays the notifications since the last published eventTime and
+    suppresses the ones which were already forwarded around the replay boundary.
+
+    Args:
+        engine:             Started forwarding engine
+        host:               NETCONF Server to connect to
+        port:               Port of the NETCONF Server
+        netconf_options:    timeout, username, password, device_handler and hostkey_verify
+        state:              Track netconf-config-change notifications of the device in this device state cache
+        checkpoints:        Replay from the checkpoint of the device when subscribing
+        backoff:            Seconds to wait before the first reconnect, doubled after every failed attempt
+        max_backoff:        Maximum seconds between reconnect attempts
+        stream:             Notification stream to subscribe to, the NETCONF stream when not set
+        filter:             <create-subscription> filter as returned by subscription_filter
+        event_filter:       Only forward the events matching this client side filter
+        yang_push:          Establish this YANG-Push subscription instead of a <create-subscription>
+        session_engine:     NETCONF session engine (ncclient or asyncio)
+    """
+
+    def __init__(
+        self,
+        engine: ForwardingEngine,
+        host: str,
+        port: int,
+        netconf_options: dict,
+        state: DeviceStateCache = None,
+        checkpoints: Checkpoints = None,
+        backoff: float = 1,
+        max_backoff: float = 300,
+        stream: str = None,
+        filter: tuple = None,
+        event_filter: EventFilter = None,
+        yang_push: YangPush = None,
+        session_engine: str = "ncclient",
+    ):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.netconf_options = netconf_options
+        self.state = state
+        self.checkpoints = checkpoints
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stream = stream
+        self.filter = filter
+        self.event_filter = event_filter
+        self.yang_push = yang_push
+        self.session_connect = session_connect(session_engine)
+
+        self.m = None
+        self.failures = 0
+        self.next_attempt = 0.0
+        self.since = None
+        self.replaying = False
+        self.replay_from = None
+        self.replay_boundary = set()
+        # Digests of the last forwarded notifications, notifications received but not published
+        # before the session was lost are replayed as well
+        self.recent = deque(maxlen=RECENT_NOTIFICATIONS)
+        self.recent_digests = set()
+
+    @property
+    def connected(self) -> bool:
+        return self.m is not None and self.m.connected
+
+    @property
+    def tracks_config_changes(self) -> bool:
+        # Only an unfiltered subscription to the NETCONF stream is guaranteed to deliver netconf-config-change,
+        # recording any other subscription would make get-config --if-changed skip changed devices
+        return bool(
+            self.state
+            and not self.yang_push
+            and not self.filter
+            and self.stream in (None, "NETCONF")
+        )
+
+    def connect(self) -> None:
+        """Establishes the NETCONF session and creates the subscription, replaying from the checkpoint when possible"""
+        logger.info(
+            f"Attempting to establish NETCONF session to {self.host}:{self.port}"
+        )
+        m = self.session_connect(
+            host=self.host,
+            port=self.port,
+            timeout=self.netconf_options["timeout"],
+            username=self.netconf_options["username"],
+            password=self.netconf_options["password"],
+            device_params={"name": self.netconf_options["device_handler"]},
+            hostkey_verify=self.netconf_options["hostkey_verify"],
+        )
+        logger.success(
+            f"Established NETCONF connection to {self.host}:{self.port} (Session ID: {m.session_id})"
+        )
+
+        # Replace the default handler which would queue every notification in ncclient until
+        # take_notification() is called
+        session = manager_session(m)
+        default_handler = session.get_listener_instance(NotificationHandler)
+        if default_handler:
+            session.remove_listener(default_handler)
+        session.add_listener(ForwarderListener(self))
+
+        checkpoint = (
+            self.checkpoints.get(self.host, self.port) if self.checkpoints else None
+        )
+        since = time.time()
+        try:
+            if self.yang_push:
+                # Dynamic subscriptions end with the NETCONF session, so they are established on every connect
+                subscription_id = self.yang_push.establish(m)
+                logger.info(
+                    f"Established YANG-Push {self.yang_push.mode} subscription {subscription_id} on {self.host}:{self.port}"
+                )
+            elif checkpoint:
+                self.start_replay(checkpoint)
+                try:
+                    m.create_subscription(
+                        filter=self.filter,
+                        stream_name=self.stream,
+                        start_time=checkpoint["event_time"],
+                    )
+                    logger.info(
+                        f"Replaying notifications of {self.host}:{self.port} since {checkpoint['event_time']}"
+                    )
+                except RPCError as err:
+                    self.replaying = False
+                    logger.warning(
+                        f"Unable to replay notifications of {self.host}:{self.port} since {checkpoint['event_time']} ({err}), subscribing without replay"
+                    )
+                    m.create_subscription(filter=self.filter, stream_name=self.stream)
+            else:
+                m.create_subscription(filter=self.filter, stream_name=self.stream)
+        except Exception:
+            m.close_session()
+            raise
+
+        # A replayed subscription is trusted again once the missed notifications have been replayed
+        self.since = since
+        if self.tracks_config_changes and not self.replaying:
+            record_subscription(self.state, self.host, self.port, since)
+        self.m = m
+        self.failures = 0
+
+    def start_replay(self, checkpoint: dict) -> None:
+        self.replaying = True
+        self.replay_from = parse_event_time(checkpoint["event_time"])
+        self.replay_boundary = set(checkpoint["boundary"])
+
+    def replay_complete(self) -> None:
+        self.replaying = False
+        logger.info(f"Replay of notifications from {self.host}:{self.port} completed")
+        if self.tracks_config_changes:
+            record_subscription_replayed(self.state, self.host, self.port, self.since)
+
+    def is_duplicate(self, notification_xml: str, event_time: Optional[str]) -> bool:
+        """Returns True for a replayed notification which was already forwarded"""
+        digest = notification_digest(notification_xml)
+        if digest in self.recent_digests:
+            return True
+        if not event_time:
+            return False
+        try:
+            parsed = parse_event_time(event_time)
+        except ValueError:
+            return False
+        return parsed < self.replay_from or (
+            parsed == self.replay_from and digest in self.replay_boundary
+        )
+
+    def remember(self, notification_xml: str) -> None:
+        if len(self.recent) == self.recent.maxlen:
+            self.recent_digests.discard(self.recent[0])
+        digest = notification_digest(notification_xml)
+        self.recent.append(digest)
+        self.recent_digests.add(digest)
+
+    def connection_lost(self) -> None:
+        """Drops the closed session and schedules the next connection attempt"""
+        self.m = None
+        if self.tracks_config_changes:
+            record_subscription_lost(self.state, self.host, self.port)
+        self.schedule_reconnect()
+
+    def schedule_reconnect(self) -> None:
+        delay = min(self.max_backoff, self.backoff * 2**self.failures)
+        # Jitter spreads the reconnects of many devices after a shared outage
+        delay *= random.uniform(0.5, 1)
+        self.failures += 1
+        self.next_attempt = time.monotonic() + delay
+        logger.info(
+            f"Reconnecting to {self.host}:{self.port} in {delay:.1f} seconds (attempt {self.failures})"
+        )
+
+    def close(self) -> None:
+        if self.m is not None and self.tracks_config_changes:
+            record_subscription_lost(self.state, self.host, self.port)
+        try:
+            if self.connected:
+                self.m.close_session()
+        except Exception as err:
+            logger.debug(f"Error while closing NETCONF session: {err}")
+
+
+def check_change_tracking(
+    track_config_changes: bool, stream: str, filter: str, yang_push: str
+) -> None:
+    """Raises ValueError when --track-config-changes is combined with a subscription which may not deliver
+    netconf-config-change notifications, get-config --if-changed would skip changed devices otherwise
+
+    Args:
+        track_config_changes:   Value of --track-config-changes
+        stream:                 Value of --stream
+        filter:                 Value of --filter
+        yang_push:              Value of --yang-push
+    """
+    if not track_config_changes:
+        return
+    if yang_push:
+        raise ValueError(
+            "--track-config-changes can't be used with --yang-push, YANG-Push subscriptions don't deliver netconf-config-change notifications"
+        )
+    if filter or stream not in (None, "NETCONF"):
+        raise ValueError(
+            "--track-config-changes requires an unfiltered subscription to the NETCONF stream, netconf-config-change notifications excluded by --stream or --filter would never be recorded"
+        )
+
+
+def run_forwarder(
+    engine: ForwardingEngine,
+    hosts: list,
+    stats_interval: int,
+    connect_workers: int = 50,
+    state: DeviceStateCache = None,
+    checkpoints: Checkpoints = None,
+    reconnect_backoff: float = 1,
+    reconnect_max_backoff: float = 300,
+    stream: str = None,
+    filter: str = None,
+    events: tuple = (),
+    yang_push: YangPush = None,
+    session_engine: str = "ncclient",
+    metrics_port: int = 0,
+    **netconf_options,
+) -> None:
+    """Creates a notification subscription on every NETCONF server and forwards all notifications to the
+    engine from a single process until interrupted, lost NETCONF sessions are re-established
+
+    Args:
+        engine:                 Started forwarding engine, stopped when the forwarder exits
+        hosts:                  List of (host, port) tuples
+        stats_interval:         Log the forwarder counters every N seconds (0 to disable)
+        connect_workers:        Number of NETCONF sessions established concurrently
+        state:                  Track netconf-config-change notifications in this device state cache, used by
+                                get-config --if-changed
+        checkpoints:            Replay notifications since the last published eventTime of every device
+        reconnect_backoff:      Seconds to wait before the first reconnect attempt, doubled after every failure
+        reconnect_max_backoff:  Maximum seconds between reconnect attempts
+        stream:                 Notification stream to subscribe to
+        filter:                 Subtree filter or XPath expression evaluated by the NETCONF server
+        events:                 Only forward these events (see EventFilter), filtered before they are queued
+        yang_push:              Establish this YANG-Push subscription instead of a <create-subscription>, replay,
+                                stream and filter are not used
+        session_engine:         NETCONF session engine, asyncio runs every session on one event loop instead of
+                                a transport thread per session
+        metrics_port:           Expose the forwarder counters for Prometheus on this local port (0 to disable)
+        netconf_options:        timeout, username, password, device_handler and hostkey_verify
+    """
+    try:
+        filter = subscription_filter(filter)
+        event_filter = EventFilter(events) if events else None
+    except ValueError as err:
+        logger.error(f"Parsing error detected with --filter/--event: {err}")
+        engine.stop()
+        return
+
+    subscriptions = [
+        DeviceSubscription(
+            engine,
+            host,
+            port,
+            netconf_options,
+            state=state,
+            checkpoints=checkpoints,
+            backoff=reconnect_backoff,
+            max_backoff=reconnect_max_backoff,
+            stream=stream,
+            filter=filter,
+            event_filter=event_filter,
+            yang_push=yang_push,
+            session_engine=session_engine,
+        )
+        for host, port in hosts
+    ]
+    if yang_push:
+        checkpoints = None
+    if checkpoints:
+        engine.on_published = checkpoints.update
+
+    metrics = None
+    if metrics_port:
+        try:
+            metrics = MetricsServer(
+                engine.stats,
+                metrics_port,
+                sessions=lambda: len([s for s in subscriptions if s.connected]),
+            )
+        except OSError as err:
+            logger.error(f"Unable to expose metrics on port {metrics_port}: {err}")
+            engine.stop()
+            return
+        metrics.start()
+        logger.info(
+            f"Exposing Prometheus metrics on http://{metrics.address}:{metrics.port}/metrics"
+        )
+
+    executor = ThreadPoolExecutor(max_workers=connect_workers)
+    connecting = {}
+
+    def _connect(subscription: DeviceSubscription) -> None:
+        connecting[executor.submit(subscription.connect)] = subscription
+
+    def _collect(futures) -> None:
+        for future in futures:
+            subscription = connecting.pop(future)
+            try:
+                future.result()
+            except AuthenticationError:
+                logger.error(
+                    f"Unable to authenticate to NETCONF server {subscription.host}:{subscription.port}"
+                )
+                subscription.schedule_reconnect()
+            except Exception as err:
+                logger.error(
+                    f"Unable to subscribe to {subscription.host}:{subscription.port}: {err}"
+                )
+                subscription.schedule_reconnect()
+
+    try:
+        for subscription in subscriptions:
+            _connect(subscription)
+        _collect(list(as_completed(list(connecting))))
+
+        connected = len([s for s in subscriptions if s.connected])
+        if not connected:
+            logger.error(
+                "Unable to create a Netconf Subscription on any NETCONF server"
+            )
+            return
+
+        logger.success(
+            f"Created Netconf Subscription on {connected} of {len(hosts)} NETCONF servers, you can exit out of here using Ctrl+C"
+        )
+        logger.info("Awaiting NETCONF <notification/>")
+
+        next_stats = time.monotonic() + stats_interval
+        next_heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+        next_checkpoint = time.monotonic() + CHECKPOINT_INTERVAL
+        try:
+            while True:
+                time.sleep(1)
+                _collect([future for future in connecting if future.done()])
+
+                now = time.monotonic()
+                for subscription in subscriptions:
+                    if subscription.m is not None and not subscription.m.connected:
+                        logger.error(
+                            f"NETCONF session to {subscription.host}:{subscription.port} was closed"
+                        )
+                        engine.stats.record_reconnect()
+                        subscription.connection_lost()
+                    if (
+                        subscription.m is None
+                        and subscription not in connecting.values()
+                        and now >= subscription.next_attempt
+                    ):
+                        _connect(subscription)
+
+                if state and now >= next_heartbeat:
+                    for subscription in subscriptions:
+                        if (
+                            subscription.tracks_config_changes
+                            and subscription.connected
+                        ):
+                            record_heartbeat(
+                                state, subscription.host, subscription.port
+                            )
+                    next_heartbeat = now + HEARTBEAT_INTERVAL
+                if checkpoints and now >= next_checkpoint:
+                    checkpoints.save()
+                    next_checkpoint = now + CHECKPOINT_INTERVAL
+                if stats_interval and now >= next_stats:
+                    connected = len([s for s in subscriptions if s.connected])
+                    logger.info(
+                        f"Forwarder stats: sessions={connected}/{len(subscriptions)} {engine.stats.summary()}"
+                    )
+                    next_stats = now + stats_interval
+        except KeyboardInterrupt:
+            logger.info("Stopping NETCONF Notification Subscription")
+    finally:
+        executor.shutdown(wait=False)
+        for subscription in subscriptions:
+            subscription.close()
+        engine.stop()
+        if metrics:
+            metrics.stop()
+        if checkpoints:
+            checkpoints.save()
+        logger.info(f"Forwarder stats: {engine.stats.summary()}")
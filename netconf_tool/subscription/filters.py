@@ -0,0 +1,73 @@
+from typing import Iterable, Optional, Tuple
+from xml.etree import ElementTree
+
+from netconf_tool.helpers import notification_event
+
+
+def subscription_filter(filter: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Returns the <create-subscription> filter for ncclient, a filter starting with < is used as a
+    subtree filter and anything else as an XPath expression (requires the :xpath capability)
+
+    Args:
+        filter:     Subtree filter XML or XPath expression
+
+    Raises:
+        ValueError: The subtree filter is not valid XML
+    """
+    if not filter:
+        return None
+    filter = filter.strip()
+    if filter.startswith("<"):
+        try:
+            ElementTree.fromstring(filter)
+        except ElementTree.ParseError as err:
+            raise ValueError(err)
+        return ("subtree", filter)
+    return ("xpath", filter)
+
+
+class EventFilter:
+    """Client side filter on the event element of notifications, applied before a notification is
+    logged, queued or published
+
+    Events are given as a local name (eg. netconf-config-change) matching any namespace,
+    {namespace}name matching a single event or {namespace}* matching every event of a namespace.
+    Notifications which don't contain any of the names or namespaces as a substring are rejected
+    without parsing, the event element of the other ones is parsed up to its start tag.
+
+    Args:
+        events:     Events to forward
+    """
+
+    def __init__(self, events: Iterable[str]):
+        self.names = set()
+        self.qualified = set()
+        self.namespaces = set()
+        for event in events:
+            if event.startswith("{"):
+                namespace, _, name = event[1:].partition("}")
+                if not namespace or not name:
+                    raise ValueError(f"Invalid event {event}")
+                if name == "*":
+                    self.namespaces.add(namespace)
+                else:
+                    self.qualified.add((namespace, name))
+            elif event:
+                self.names.add(event)
+        if not self.names and not self.qualified and not self.namespaces:
+            raise ValueError("No events to filter on")
+
+        # Any matching notification contains at least one of these strings
+        self.needles = tuple(
+            self.names | {name for _, name in self.qualified} | self.namespaces
+        )
+
+    def match(self, notification_xml: str) -> bool:
+        if not any(needle in notification_xml for needle in self.needles):
+            return False
+        namespace, name = notification_event(notification_xml)
+        return (
+            name in self.names
+            or (namespace, name) in self.qualified
+            or namespace in self.namespaces
+        )
@@ -1,12 +1,46 @@
 from loguru import logger
-from ncclient import manager
-from ncclient.transport.errors import SSHError, AuthenticationError
 from netconf_tool.subscription import netconf_tool_cli_subscription
-from netconf_tool.decorators import common_netconf_options
+from netconf_tool.subscription.yang_push import YangPush
+from netconf_tool.subscription.engine import (
+    Checkpoints,
+    ForwardingEngine,
+    check_change_tracking,
+    run_forwarder,
+)
+from netconf_tool.decorators import (
+    common_engine_options,
+    common_change_tracking_options,
+    common_fan_in_options,
+    common_netconf_options,
+    common_notification_filter_options,
+    common_reconnect_options,
+    common_session_engine_options,
+    common_yang_push_options,
+)
+from netconf_tool.cache import DeviceStateCache
+from netconf_tool.helpers import resolve_hosts
+
+
+class LocalSink:
+    """Prints notifications to the CLI"""
+
+    def publish(self, notifications: list) -> None:
+        for notification in notifications:
+            logger.info(f"{notification.host}: {notification.xml}")
+
+    def close(self) -> None:
+        pass
 
 
 @netconf_tool_cli_subscription.command("local")
 @common_netconf_options
+@common_engine_options
+@common_fan_in_options
+@common_change_tracking_options
+@common_reconnect_options
+@common_session_engine_options
+@common_notification_filter_options
+@common_yang_push_options
 def cli_subscription_local(
     host: str,
     port: int,
@@ -15,41 +49,82 @@ def cli_subscription_local(
     password: str,
     device_handler: str,
     hostkey_verify: bool,
+    publisher_workers: int,
+    queue_size: int,
+    backpressure: str,
+    spill_dir: str,
+    batch_size: int,
+    batch_interval: int,
+    stats_interval: int,
+    metrics_port: int,
+    hosts_file: str,
+    connect_workers: int,
+    track_config_changes: bool,
+    cache_dir: str,
+    replay: bool,
+    reconnect_backoff: float,
+    reconnect_max_backoff: float,
+    session_engine: str,
+    stream: str,
+    filter: str,
+    events: tuple,
+    yang_push: str,
+    yang_push_filter: str,
+    yang_push_datastore: str,
+    yang_push_period: int,
 ):
     """Create a local event listener using <create-subscription> which will simply print out the events to the CLI"""
-    logger.info(f"Attempting to establish NETCONF session to {host}:{port}")
     try:
-        with manager.connect(
-            host=host,
-            port=port,
-            timeout=timeout,
-            username=username,
-            password=password,
-            device_params={"name": device_handler},
-            hostkey_verify=hostkey_verify,
-        ) as m:
-            logger.success(
-                f"Established NETCONF connection to {host}:{port} (Session ID: {m.session_id})"
-            )
-            m.create_subscription()
-            logger.success(
-                "Created Netconf Subscription, you can exit out of here using Ctrl+C"
-            )
-
-            try:
-                while True:
-                    logger.info("Awaiting next NETCONF <notification/>")
-                    event = m.take_notification()
-
-                    logger.info(event.notification_xml)
-            except KeyboardInterrupt:
-                logger.info("Stopping NETCONF Notification Subscription")
-    except SSHError as err:
+        hosts = resolve_hosts(hosts_file, host, port)
+        check_change_tracking(track_config_changes, stream, filter, yang_push)
+    except ValueError as err:
         logger.error(err)
         exit()
-    except AuthenticationError as err:
-        logger.error("Unable to authenticate to NETCONF server")
-        exit()
-    except Exception as err:
-        logger.error(f"Generic Exception caught: {err}")
+
+    try:
+        yang_push_subscription = (
+            YangPush(
+                yang_push,
+                yang_push_filter,
+                datastore=yang_push_datastore,
+                period=yang_push_period,
+            )
+            if yang_push
+            else None
+        )
+    except ValueError as err:
+        logger.error(f"Invalid YANG-Push subscription: {err}")
         exit()
+
+    engine = ForwardingEngine(
+        LocalSink,
+        workers=publisher_workers,
+        queue_size=queue_size,
+        backpressure=backpressure,
+        spill_dir=spill_dir,
+        batch_size=batch_size,
+        batch_interval=batch_interval / 1000,
+    )
+    engine.start()
+
+    run_forwarder(
+        engine,
+        hosts=hosts,
+        stats_interval=stats_interval,
+        metrics_port=metrics_port,
+        connect_workers=connect_workers,
+        state=DeviceStateCache(cache_dir) if track_config_changes else None,
+        checkpoints=Checkpoints(DeviceStateCache(cache_dir)) if replay else None,
+        reconnect_backoff=reconnect_backoff,
+        reconnect_max_backoff=reconnect_max_backoff,
+        stream=stream,
+        filter=filter,
+        events=events,
+        yang_push=yang_push_subscription,
+        session_engine=session_engine,
+        timeout=timeout,
+        username=username,
+        password=password,
+        device_handler=device_handler,
+        hostkey_verify=hostkey_verify,
+    )
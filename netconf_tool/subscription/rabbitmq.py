@@ -1,15 +1,290 @@
+import functools
+import threading
+import time
 import click
 import pika
-from pika.exceptions import AMQPConnectionError
+from pika.exceptions import AMQPConnectionError, AMQPError
 from loguru import logger
-from ncclient import manager
-from ncclient.transport.errors import SSHError, AuthenticationError
 from netconf_tool.subscription import netconf_tool_cli_subscription
-from netconf_tool.decorators import common_netconf_options
+from netconf_tool.subscription.encoding import NotificationEncoder
+from netconf_tool.subscription.yang_push import YangPush
+from netconf_tool.subscription.engine import (
+    Checkpoints,
+    ForwardingEngine,
+    check_change_tracking,
+    run_forwarder,
+)
+from netconf_tool.decorators import (
+    common_encoding_options,
+    common_engine_options,
+    common_change_tracking_options,
+    common_fan_in_options,
+    common_netconf_options,
+    common_notification_filter_options,
+    common_reconnect_options,
+    common_session_engine_options,
+    common_yang_push_options,
+)
+from netconf_tool.cache import DeviceStateCache
+from netconf_tool.helpers import notification_event_type, resolve_hosts
+
+
+class _ConfirmWindow:
+    """Delivery confirmations outstanding for one batch of published notifications"""
+
+    def __init__(self, count: int):
+        self.remaining = count
+        self.nacked = 0
+        self.error = None
+        self.done = threading.Event()
+        if not count:
+            self.done.set()
+
+    def confirm(self, ack: bool) -> None:
+        self.remaining -= 1
+        if not ack:
+            self.nacked += 1
+        if not self.remaining:
+            self.done.set()
+
+    def fail(self, error: str) -> None:
+        self.error = error
+        self.done.set()
+
+
+class RabbitMQPublisher:
+    """Publishes notifications to a RabbitMQ exchange over one long lived connection with publisher confirms
+
+    The connection runs on its own IO loop thread and is re-established automatically when it is lost.
+    publish() is thread safe, each call publishes the whole batch without waiting and then waits for the
+    broker to confirm every message of the batch (acknowledgements covering multiple messages are
+    supported), so publisher workers each keep a window of unconfirmed messages in flight. Batches which
+    were not confirmed before the connection was lost are published again once it is back, batches which
+    were not confirmed within confirm_timeout are published again right away.
+
+    Args:
+        parameters:         Connection parameters of the RabbitMQ server (including heartbeat)
+        queue:              Queue to declare
+        exchange:           Exchange to publish to
+        routing_key:        Routing key, {event} is replaced by the notification type (eg. netconf-config-change)
+                            and {host} by the NETCONF server it was received from
+        confirm_timeout:    Seconds to wait for the connection and the confirmations of a batch
+        reconnect_delay:    Seconds to wait before reconnecting after the connection was lost
+        publish_attempts:   Number of times a batch is published when the connection is lost or it isn't confirmed
+        encoder:            Encoder of the message bodies, notifications are published as received by default
+    """
+
+    def __init__(
+        self,
+        parameters: pika.ConnectionParameters,
+        queue: str,
+        exchange: str,
+        routing_key: str,
+        confirm_timeout: float = 30,
+        reconnect_delay: float = 5,
+        publish_attempts: int = 3,
+        encoder: NotificationEncoder = None,
+    ):
+        self.parameters = parameters
+        self.queue = queue
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.per_event = "{event}" in routing_key
+        self.confirm_timeout = confirm_timeout
+        self.reconnect_delay = reconnect_delay
+        self.publish_attempts = publish_attempts
+        self.encoder = encoder or NotificationEncoder()
+
+        self.connection = None
+        self.channel = None
+        self.delivery_tag = 0
+        self.pending = {}
+        self.error = None
+        self.connected_once = False
+        self.closing = False
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="rabbitmq", daemon=True)
+        self.thread.start()
+
+        self.ready.wait(confirm_timeout)
+        if not self.connected_once:
+            self.shutdown()
+            raise AMQPConnectionError(
+                self.error or "Timed out connecting to RabbitMQ server"
+            )
+
+    def _run(self) -> None:
+        while not self.closing:
+            self.connection = pika.SelectConnection(
+                self.parameters,
+                on_open_callback=self._on_connection_open,
+                on_open_error_callback=self._on_connection_open_error,
+                on_close_callback=self._on_connection_closed,
+            )
+            self.connection.ioloop.start()
+
+            if self.closing:
+                break
+            if not self.connected_once:
+                # Initial connection failed, the error is raised by __init__
+                self.ready.set()
+                break
+            logger.warning(
+                f"Reconnecting to RabbitMQ server in {self.reconnect_delay} seconds"
+            )
+            time.sleep(self.reconnect_delay)
+
+    def _on_connection_open(self, connection) -> None:
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_open_error(self, connection, err) -> None:
+        self.error = str(err) or repr(err)
+        logger.debug(f"Unable to connect to RabbitMQ server: {self.error}")
+        connection.ioloop.stop()
+
+    def _on_connection_closed(self, connection, reason) -> None:
+        self.ready.clear()
+        self.channel = None
+        for window in set(self.pending.values()):
+            window.fail(f"RabbitMQ connection closed: {reason}")
+        self.pending = {}
+        if not self.closing:
+            logger.error(f"RabbitMQ connection closed: {reason}")
+        connection.ioloop.stop()
+
+    def _on_channel_open(self, channel) -> None:
+        self.channel = channel
+        channel.add_on_close_callback(self._on_channel_closed)
+        channel.queue_declare(queue=self.queue, callback=self._on_queue_declared)
+
+    def _on_channel_closed(self, channel, reason) -> None:
+        # The broker closes the channel on errors such as publishing to a missing exchange,
+        # closing the connection fails outstanding batches and reconnects
+        if not self.closing:
+            logger.error(f"RabbitMQ channel closed: {reason}")
+        if self.connection.is_open:
+            self.connection.close()
+
+    def _on_queue_declared(self, frame) -> None:
+        self.channel.confirm_delivery(
+            self._on_delivery_confirmation, callback=self._on_confirm_select
+        )
+
+    def _on_confirm_select(self, frame) -> None:
+        self.delivery_tag = 0
+        self.connected_once = True
+        logger.debug("RabbitMQ channel ready, publisher confirms enabled")
+        self.ready.set()
+
+    def _on_delivery_confirmation(self, frame) -> None:
+        method = frame.method
+        ack = isinstance(method, pika.spec.Basic.Ack)
+        if method.multiple:
+            # Delivery tags are increasing so the oldest pending messages are confirmed
+            while self.pending:
+                tag = next(iter(self.pending))
+                if tag > method.delivery_tag:
+                    break
+                self.pending.pop(tag).confirm(ack)
+        elif method.delivery_tag in self.pending:
+            self.pending.pop(method.delivery_tag).confirm(ack)
+
+    def _abandon_window(self, window: _ConfirmWindow) -> None:
+        # Runs on the IO loop thread, late confirmations of the abandoned messages are ignored
+        if window.done.is_set():
+            return
+        self.pending = {
+            tag: pending
+            for tag, pending in self.pending.items()
+            if pending is not window
+        }
+        window.fail(
+            f"Timed out waiting for RabbitMQ to confirm {window.remaining} messages"
+        )
+
+    def routing_key_for(self, notification) -> str:
+        event = notification_event_type(notification.xml) if self.per_event else ""
+        return self.routing_key.format(event=event, host=notification.host)
+
+    def _publish_window(
+        self, notifications: list, bodies: list, window: _ConfirmWindow
+    ) -> None:
+        # Runs on the IO loop thread
+        if self.channel is None or not self.channel.is_open:
+            window.fail("RabbitMQ channel is not open")
+            return
+
+        for notification, body in zip(notifications, bodies):
+            self.channel.basic_publish(
+                exchange=self.exchange,
+                routing_key=self.routing_key_for(notification),
+                body=body,
+                properties=pika.BasicProperties(
+                    content_type=self.encoder.content_type,
+                    content_encoding=self.encoder.content_encoding,
+                    headers={"host": notification.host},
+                ),
+            )
+            self.delivery_tag += 1
+            self.pending[self.delivery_tag] = window
+
+    def publish(self, notifications: list) -> None:
+        # Encoded once, batches published again after a reconnect reuse the bodies
+        bodies = [self.encoder.encode(notification) for notification in notifications]
+        for attempt in range(1, self.publish_attempts + 1):
+            if not self.ready.wait(self.confirm_timeout):
+                raise AMQPConnectionError("RabbitMQ server is not available")
+
+            window = _ConfirmWindow(len(notifications))
+            self.connection.ioloop.add_callback_threadsafe(
+                functools.partial(self._publish_window, notifications, bodies, window)
+            )
+            if not window.done.wait(self.confirm_timeout):
+                # The pending confirmations are dropped on the IO loop thread, which also delivers them
+                self.connection.ioloop.add_callback_threadsafe(
+                    functools.partial(self._abandon_window, window)
+                )
+                if not window.done.wait(self.confirm_timeout):
+                    raise AMQPError(
+                        f"Timed out waiting for RabbitMQ to confirm {window.remaining} messages"
+                    )
+            if window.error is None:
+                break
+            logger.warning(
+                f"{window.error}, publishing {len(notifications)} messages again (attempt {attempt} of {self.publish_attempts})"
+            )
+        else:
+            raise AMQPConnectionError(window.error)
+
+        if window.nacked:
+            raise AMQPError(f"RabbitMQ rejected {window.nacked} messages")
+        logger.debug(f"Published {len(notifications)} messages to RabbitMQ Server")
+
+    def close(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        """Closes the connection, called once every publisher worker has stopped"""
+        self.closing = True
+        connection = self.connection
+        if connection is not None:
+            if connection.is_open:
+                connection.ioloop.add_callback_threadsafe(connection.close)
+            elif not connection.is_closing:
+                connection.ioloop.add_callback_threadsafe(connection.ioloop.stop)
+        self.thread.join(timeout=self.confirm_timeout)
 
 
 @netconf_tool_cli_subscription.command("rabbitmq")
 @common_netconf_options
+@common_engine_options
+@common_fan_in_options
+@common_change_tracking_options
+@common_reconnect_options
+@common_session_engine_options
+@common_notification_filter_options
+@common_yang_push_options
+@common_encoding_options
 @click.option(
     "--rabbitmq-host",
     help="RabbitMQ Server to connect to",
@@ -28,10 +303,22 @@ from netconf_tool.decorators import common_netconf_options
 @click.option("--rabbitmq-exchange", help="RabbitMQ Exchange", type=str, default="")
 @click.option(
     "--rabbitmq-routing-key",
-    help="RabbitMQ Routing Key",
+    help="RabbitMQ Routing Key, {event} is replaced by the notification type (eg. netconf.{event}) and {host} by the NETCONF server",
     type=str,
     default="all_events",
 )
+@click.option(
+    "--rabbitmq-heartbeat",
+    help="AMQP heartbeat timeout in seconds",
+    type=click.IntRange(min=0),
+    default=60,
+)
+@click.option(
+    "--rabbitmq-confirm-timeout",
+    help="Seconds to wait for RabbitMQ to confirm a batch of notifications",
+    type=click.IntRange(min=1),
+    default=30,
+)
 @click.option(
     "--rabbitmq-username",
     help="Username to authenticate if authentication is used",
@@ -57,9 +344,59 @@ def cli_subscription_rabbitmq(
     rabbitmq_routing_key: str,
     rabbitmq_username: str,
     rabbitmq_password: str,
+    rabbitmq_heartbeat: int,
+    rabbitmq_confirm_timeout: int,
+    publisher_workers: int,
+    queue_size: int,
+    backpressure: str,
+    spill_dir: str,
+    batch_size: int,
+    batch_interval: int,
+    stats_interval: int,
+    metrics_port: int,
+    hosts_file: str,
+    connect_workers: int,
+    track_config_changes: bool,
+    cache_dir: str,
+    replay: bool,
+    reconnect_backoff: float,
+    reconnect_max_backoff: float,
+    session_engine: str,
+    stream: str,
+    filter: str,
+    events: tuple,
+    yang_push: str,
+    yang_push_filter: str,
+    yang_push_datastore: str,
+    yang_push_period: int,
+    encoding: str,
 ):
     """Create a local event listener using <create-subscription> and redirect to a rabbitmq host"""
-    parameters = pika.ConnectionParameters(rabbitmq_host, rabbitmq_port, "/")
+    try:
+        hosts = resolve_hosts(hosts_file, host, port)
+        check_change_tracking(track_config_changes, stream, filter, yang_push)
+    except ValueError as err:
+        logger.error(err)
+        exit()
+
+    try:
+        yang_push_subscription = (
+            YangPush(
+                yang_push,
+                yang_push_filter,
+                datastore=yang_push_datastore,
+                period=yang_push_period,
+            )
+            if yang_push
+            else None
+        )
+    except ValueError as err:
+        logger.error(f"Invalid YANG-Push subscription: {err}")
+        exit()
+
+    parameters = pika.ConnectionParameters(
+        rabbitmq_host, rabbitmq_port, "/", heartbeat=rabbitmq_heartbeat
+    )
 
     if rabbitmq_username and rabbitmq_password:
         parameters.credentials = pika.PlainCredentials(
@@ -67,59 +404,62 @@ def cli_subscription_rabbitmq(
         )
 
     try:
-        connection = pika.BlockingConnection()
+        encoder = NotificationEncoder(encoding)
+    except ImportError as err:
+        logger.error(f"--encoding {encoding} is not available: {err}")
+        exit()
+
+    logger.info(
+        f"Checking if RabbitMQ Server {rabbitmq_host}:{rabbitmq_port} is available"
+    )
+    try:
+        publisher = RabbitMQPublisher(
+            parameters,
+            queue=rabbitmq_queue,
+            exchange=rabbitmq_exchange,
+            routing_key=rabbitmq_routing_key,
+            confirm_timeout=rabbitmq_confirm_timeout,
+            encoder=encoder,
+        )
     except AMQPConnectionError as err:
         logger.error(
-            f"Unable to establish connection to RabbitMQ server {rabbitmq_host}:{rabbitmq_password}"
+            f"Unable to establish connection to RabbitMQ server {rabbitmq_host}:{rabbitmq_port}: {err}"
         )
         exit()
-    channel = connection.channel()
-    channel.queue_declare(queue=rabbitmq_queue)
+    logger.success("RabbitMQ server is available...")
 
-    logger.info(
-        f"Checking if RabbitMQ Server {rabbitmq_host}:{rabbitmq_port} is available"
+    engine = ForwardingEngine(
+        lambda: publisher,
+        workers=publisher_workers,
+        queue_size=queue_size,
+        backpressure=backpressure,
+        spill_dir=spill_dir,
+        batch_size=batch_size,
+        batch_interval=batch_interval / 1000,
     )
+    engine.start()
 
-    logger.info(f"Attempting to establish NETCONF session to {host}:{port}")
     try:
-        with manager.connect(
-            host=host,
-            port=port,
+        run_forwarder(
+            engine,
+            hosts=hosts,
+            stats_interval=stats_interval,
+            metrics_port=metrics_port,
+            connect_workers=connect_workers,
+            state=DeviceStateCache(cache_dir) if track_config_changes else None,
+            checkpoints=Checkpoints(DeviceStateCache(cache_dir)) if replay else None,
+            reconnect_backoff=reconnect_backoff,
+            reconnect_max_backoff=reconnect_max_backoff,
+            stream=stream,
+            filter=filter,
+            events=events,
+            yang_push=yang_push_subscription,
+            session_engine=session_engine,
             timeout=timeout,
             username=username,
             password=password,
-            device_params={"name": device_handler},
+            device_handler=device_handler,
             hostkey_verify=hostkey_verify,
-        ) as m:
-            logger.success(
-                f"Established NETCONF connection to {host}:{port} (Session ID: {m.session_id})"
-            )
-            m.create_subscription()
-            logger.success(
-                "Created Netconf Subscription, you can exit out of here using Ctrl+C"
-            )
-
-            try:
-                while True:
-                    logger.info("Awaiting next NETCONF <notification/>")
-                    event = m.take_notification()
-
-                    # Publish to RabbitMQ Queue
-                    data = event.notification_xml
-                    channel.basic_publish(
-                        exchange=rabbitmq_exchange,
-                        routing_key=rabbitmq_routing_key,
-                        body=data,
-                    )
-                    logger.success(f"Published message to RabbitMQ Server:\n{data}")
-            except KeyboardInterrupt:
-                logger.info("Stopping NETCONF Notification Subscription")
-    except SSHError as err:
-        logger.error(err)
-        exit()
-    except AuthenticationError as err:
-        logger.error("Unable to authenticate to NETCONF server")
-        exit()
-    except Exception as err:
-        logger.error(f"Generic Exception caught: {err}")
-        exit()
+        )
+    finally:
+        publisher.shutdown()
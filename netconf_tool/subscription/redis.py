@@ -1,24 +1,123 @@
 import click
 from redis import Redis
 from loguru import logger
-from ncclient import manager
-from ncclient.transport.errors import SSHError, AuthenticationError
 from netconf_tool.subscription import netconf_tool_cli_subscription
-from netconf_tool.decorators import common_netconf_options
+from netconf_tool.subscription.encoding import NotificationEncoder
+from netconf_tool.subscription.yang_push import YangPush
+from netconf_tool.subscription.engine import (
+    Checkpoints,
+    ForwardingEngine,
+    check_change_tracking,
+    run_forwarder,
+)
+from netconf_tool.decorators import (
+    common_encoding_options,
+    common_engine_options,
+    common_change_tracking_options,
+    common_fan_in_options,
+    common_netconf_options,
+    common_notification_filter_options,
+    common_reconnect_options,
+    common_session_engine_options,
+    common_yang_push_options,
+)
+from netconf_tool.cache import DeviceStateCache
+from netconf_tool.helpers import resolve_hosts
+
+
+class RedisPublisher:
+    """Publishes notifications to a Redis pubsub channel or a Redis Stream, multiple messages are
+    sent in a single round trip using a pipeline
+
+    Args:
+        redis:          Redis client
+        channel:        Pubsub channel to publish to, {host} is replaced by the source NETCONF server
+        stream:         Publish to this Redis Stream using XADD instead of pubsub
+        stream_maxlen:  Approximate maximum length of the Redis Stream
+        encoder:        Encoder of the published messages, notifications are published as received by default
+    """
+
+    def __init__(
+        self,
+        redis: Redis,
+        channel: str,
+        stream: str = None,
+        stream_maxlen: int = None,
+        encoder: NotificationEncoder = None,
+    ):
+        self.redis = redis
+        self.channel = channel
+        self.stream = stream
+        self.stream_maxlen = stream_maxlen
+        self.encoder = encoder or NotificationEncoder()
+
+    def publish(self, notifications: list) -> None:
+        if len(notifications) == 1 and not self.stream:
+            notification = notifications[0]
+            self.redis.publish(
+                channel=self.channel.format(host=notification.host),
+                message=self.encoder.encode(notification),
+            )
+        else:
+            pipeline = self.redis.pipeline(transaction=False)
+            for notification in notifications:
+                if self.stream:
+                    fields = {
+                        "host": notification.host,
+                        "notification": self.encoder.encode(notification),
+                    }
+                    if self.encoder.encoding != "xml":
+                        fields["encoding"] = self.encoder.encoding
+                    pipeline.xadd(
+                        self.stream,
+                        fields,
+                        maxlen=self.stream_maxlen,
+                        approximate=True,
+                    )
+                else:
+                    pipeline.publish(
+                        channel=self.channel.format(host=notification.host),
+                        message=self.encoder.encode(notification),
+                    )
+            pipeline.execute()
+
+        logger.debug(f"Published {len(notifications)} messages to Redis Server")
+
+    def close(self) -> None:
+        pass
 
 
 @netconf_tool_cli_subscription.command("redis-pubsub")
 @common_netconf_options
+@common_engine_options
+@common_fan_in_options
+@common_change_tracking_options
+@common_reconnect_options
+@common_session_engine_options
+@common_notification_filter_options
+@common_yang_push_options
+@common_encoding_options
 @click.option(
     "--redis-host", help="Redis server to connect to", type=str, default="127.0.0.1"
 )
 @click.option("--redis-port", help="Port for Redis server", type=int, default=6379)
 @click.option(
     "--redis-channel",
-    help="Channel to publish message to",
+    help="Channel to publish message to, {host} is replaced by the NETCONF server the notification was received from",
     type=str,
     default="netconf_tool:all_events",
 )
+@click.option(
+    "--redis-stream",
+    help="Append notifications to this Redis Stream (XADD) instead of publishing them to --redis-channel",
+    type=str,
+)
+@click.option(
+    "--redis-stream-maxlen",
+    help="Approximate maximum number of entries kept in the Redis Stream",
+    type=int,
+    default=100000,
+)
 def cli_subscription_redis_pubsub(
     host: str,
     port: int,
@@ -30,8 +129,62 @@ def cli_subscription_redis_pubsub(
     redis_host: str,
     redis_port: int,
     redis_channel: str,
+    redis_stream: str,
+    redis_stream_maxlen: int,
+    publisher_workers: int,
+    queue_size: int,
+    backpressure: str,
+    spill_dir: str,
+    batch_size: int,
+    batch_interval: int,
+    stats_interval: int,
+    metrics_port: int,
+    hosts_file: str,
+    connect_workers: int,
+    track_config_changes: bool,
+    cache_dir: str,
+    replay: bool,
+    reconnect_backoff: float,
+    reconnect_max_backoff: float,
+    session_engine: str,
+    stream: str,
+    filter: str,
+    events: tuple,
+    yang_push: str,
+    yang_push_filter: str,
+    yang_push_datastore: str,
+    yang_push_period: int,
+    encoding: str,
 ):
-    """Create a local event listener using <create-subscription> and redirect to a redis pubsub channel"""
+    """Create a local event listener using <create-subscription> and redirect to a redis pubsub channel or stream"""
+    try:
+        hosts = resolve_hosts(hosts_file, host, port)
+        check_change_tracking(track_config_changes, stream, filter, yang_push)
+    except ValueError as err:
+        logger.error(err)
+        exit()
+
+    try:
+        yang_push_subscription = (
+            YangPush(
+                yang_push,
+                yang_push_filter,
+                datastore=yang_push_datastore,
+                period=yang_push_period,
+            )
+            if yang_push
+            else None
+        )
+    except ValueError as err:
+        logger.error(f"Invalid YANG-Push subscription: {err}")
+        exit()
+
+    try:
+        encoder = NotificationEncoder(encoding)
+    except ImportError as err:
+        logger.error(f"--encoding {encoding} is not available: {err}")
+        exit()
+
     redis = Redis(host=redis_host, port=redis_port)
     logger.info(f"Checking if Redis server {redis_host}:{redis_port} is available")
 
@@ -42,42 +195,43 @@ def cli_subscription_redis_pubsub(
         logger.error(err)
         exit()
 
-    logger.info(f"Attempting to establish NETCONF session to {host}:{port}")
+    publisher = RedisPublisher(
+        redis,
+        channel=redis_channel,
+        stream=redis_stream,
+        stream_maxlen=redis_stream_maxlen,
+        encoder=encoder,
+    )
 
-    try:
-        with manager.connect(
-            host=host,
-            port=port,
-            timeout=timeout,
-            username=username,
-            password=password,
-            device_params={"name": device_handler},
-            hostkey_verify=hostkey_verify,
-        ) as m:
-            logger.success(
-                f"Established NETCONF connection to {host}:{port} (Session ID: {m.session_id})"
-            )
-            m.create_subscription()
-            logger.success(
-                "Created Netconf Subscription, you can exit out of here using Ctrl+C"
-            )
+    engine = ForwardingEngine(
+        lambda: publisher,
+        workers=publisher_workers,
+        queue_size=queue_size,
+        backpressure=backpressure,
+        spill_dir=spill_dir,
+        batch_size=batch_size,
+        batch_interval=batch_interval / 1000,
+    )
+    engine.start()
 
-            try:
-                while True:
-                    logger.info("Awaiting next NETCONF <notification/>")
-                    event = m.take_notification()
-
-                    data = event.notification_xml
-                    redis.publish(channel=redis_channel, message=data)
-                    logger.success(f"Published message to Redis Server:\n{data}")
-            except KeyboardInterrupt:
-                logger.info("Stopping NETCONF Notification Subscription")
-    except SSHError as err:
-        logger.error(err)
-        exit()
-    except AuthenticationError as err:
-        logger.error("Unable to authenticate to NETCONF server")
-        exit()
-    except Exception as err:
-        logger.error(f"Generic Exception caught: {err}")
-        exit()
+    run_forwarder(
+        engine,
+        hosts=hosts,
+        stats_interval=stats_interval,
+        metrics_port=metrics_port,
+        connect_workers=connect_workers,
+        state=DeviceStateCache(cache_dir) if track_config_changes else None,
+        checkpoints=Checkpoints(DeviceStateCache(cache_dir)) if replay else None,
+        reconnect_backoff=reconnect_backoff,
+        reconnect_max_backoff=reconnect_max_backoff,
+        stream=stream,
+        filter=filter,
+        events=events,
+        yang_push=yang_push_subscription,
+        session_engine=session_engine,
+        timeout=timeout,
+        username=username,
+        password=password,
+        device_handler=device_handler,
+        hostkey_verify=hostkey_verify,
+    )
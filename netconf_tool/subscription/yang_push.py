@@ -0,0 +1,85 @@
+from ncclient.xml_ import new_ele_ns, sub_ele_ns, to_ele
+
+from netconf_tool.subscription.filters import subscription_filter
+
+SUBSCRIBED_NOTIFICATIONS_NS = (
+    "urn:ietf:params:xml:ns:yang:ietf-subscribed-notifications"
+)
+YANG_PUSH_NS = "urn:ietf:params:xml:ns:yang:ietf-yang-push"
+DATASTORES_NS = "urn:ietf:params:xml:ns:yang:ietf-datastores"
+YANG_PUSH_MODES = ["periodic", "on-change"]
+UPDATE_EVENTS = ("push-update", "push-change-update")
+
+
+class YangPush:
+    """YANG-Push datastore subscription (RFC 8641) established with <establish-subscription> (RFC 8639)
+
+    Args:
+        mode:       periodic or on-change
+        filter:     Subtree filter (XML) or XPath expression selecting the pushed datastore nodes
+        datastore:  Datastore identity of ietf-datastores (eg. operational or running)
+        period:     Milliseconds between periodic updates or dampening period of on-change updates
+
+    Raises:
+        ValueError: Invalid mode or filter
+    """
+
+    def __init__(
+        self,
+        mode: str,
+        filter: str,
+        datastore: str = "operational",
+        period: int = 1000,
+    ):
+        if mode not in YANG_PUSH_MODES:
+            raise ValueError(f"Unsupported YANG-Push mode {mode}")
+        self.filter = subscription_filter(filter)
+        if not self.filter:
+            raise ValueError(
+                "YANG-Push requires a filter selecting the datastore nodes"
+            )
+        self.mode = mode
+        self.datastore = datastore
+        self.period = period
+
+    def rpc(self):
+        """Returns the <establish-subscription> RPC element"""
+        node = new_ele_ns("establish-subscription", SUBSCRIBED_NOTIFICATIONS_NS)
+        datastore = sub_ele_ns(
+            node, "datastore", YANG_PUSH_NS, nsmap={"ds": DATASTORES_NS}
+        )
+        datastore.text = f"ds:{self.datastore}"
+
+        filter_type, filter = self.filter
+        if filter_type == "subtree":
+            sub_ele_ns(node, "datastore-subtree-filter", YANG_PUSH_NS).append(
+                to_ele(filter)
+            )
+        else:
+            sub_ele_ns(node, "datastore-xpath-filter", YANG_PUSH_NS).text = filter
+
+        # Periods are centiseconds in ietf-yang-push
+        centiseconds = self.period // 10
+        if self.mode == "periodic":
+            periodic = sub_ele_ns(node, "periodic", YANG_PUSH_NS)
+            sub_ele_ns(periodic, "period", YANG_PUSH_NS).text = str(
+                max(centiseconds, 1)
+            )
+        else:
+            on_change = sub_ele_ns(node, "on-change", YANG_PUSH_NS)
+            sub_ele_ns(on_change, "dampening-period", YANG_PUSH_NS).text = str(
+                centiseconds
+            )
+        return node
+
+    def establish(self, m) -> str:
+        """Establishes the subscription on a NETCONF session and returns the subscription ID
+
+        Args:
+            m:  ncclient Manager
+        """
+        reply = m.dispatch(self.rpc())
+        subscription_id = to_ele(reply.xml).find(
+            f".//{{{SUBSCRIBED_NOTIFICATIONS_NS}}}id"
+        )
+        return subscription_id.text if subscription_id is not None else None
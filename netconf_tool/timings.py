@@ -0,0 +1,208 @@
+import functools
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional, TextIO
+
+# Phases are listed in this order in the summary, any other phase is listed after them
+PHASES = [
+    "tcp-connect",
+    "ssh-handshake",
+    "ssh-auth",
+    "hello",
+    "rpc",
+    "pretty-print",
+    "json",
+    "file-io",
+]
+
+_timings = None
+_lock = threading.Lock()
+
+
+class Timings:
+    """Durations of the phases of a command and the NETCONF bytes received, shared by all threads of the
+    process since commands run their sessions in worker threads and on the asyncio event loop
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.bytes_received = 0
+        self.messages_received = 0
+
+    def record(self, name: str, seconds: float) -> None:
+        with self.lock:
+            phase = self.phases.setdefault(name, [0, 0.0, 0.0])
+            phase[0] += 1
+            phase[1] += seconds
+            phase[2] = max(phase[2], seconds)
+
+    def received(self, count: int) -> None:
+        with self.lock:
+            self.bytes_received += count
+            self.messages_received += 1
+
+    def summary(self) -> str:
+        """Returns a table of the phases, phases of concurrent sessions overlap so their total may exceed
+        the wall time"""
+        with self.lock:
+            phases = dict(self.phases)
+            elapsed = time.perf_counter() - self.started
+            lines = [
+                f"Timings: wall={elapsed * 1000:.1f}ms received={self.bytes_received} bytes in {self.messages_received} NETCONF messages",
+                f"{'PHASE':<16} {'COUNT':>7} {'TOTAL':>11} {'AVG':>11} {'MAX':>11}",
+            ]
+        names = [name for name in PHASES if name in phases]
+        names += [name for name in phases if name not in PHASES]
+        for name in names:
+            count, total, maximum = phases[name]
+            lines.append(
+                f"{name:<16} {count:>7} {total * 1000:>9.1f}ms {total / count * 1000:>9.1f}ms {maximum * 1000:>9.1f}ms"
+            )
+        return "\n".join(lines)
+
+
+def enable() -> Timings:
+    """Starts recording the phases of this process and returns the timings"""
+    global _timings
+    with _lock:
+        if _timings is None:
+            _instrument_ncclient()
+            _timings = Timings()
+        return _timings
+
+
+def active() -> Optional[Timings]:
+    return _timings
+
+
+def record(name: str, seconds: float) -> None:
+    """Records the duration of a phase when timings are enabled"""
+    if _timings is not None:
+        _timings.record(name, seconds)
+
+
+def received(message: str) -> None:
+    """Counts a NETCONF message received from a server when timings are enabled"""
+    if _timings is not None:
+        _timings.received(len(message.encode()))
+
+
+@contextmanager
+def phase(name: str):
+    """Records the time spent in the with block as a phase when timings are enabled"""
+    if _timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings.record(name, time.perf_counter() - started)
+
+
+class _TimedWriter:
+    def __init__(self, out: TextIO):
+        self.out = out
+        self.elapsed = 0.0
+
+    def write(self, data: str) -> int:
+        started = time.perf_counter()
+        try:
+            return self.out.write(data)
+        finally:
+            self.elapsed += time.perf_counter() - started
+
+
+@contextmanager
+def output_phase(name: str, out: TextIO):
+    """Times writing a document to out, the time spent in out.write is recorded as file-io and the rest
+    (parsing and formatting) as the name phase (pretty-print or json)
+
+        with output_phase("pretty-print", out) as out:
+            out.write(...)
+    """
+    if _timings is None:
+        yield out
+        return
+    writer = _TimedWriter(out)
+    started = time.perf_counter()
+    try:
+        yield writer
+    finally:
+        elapsed = time.perf_counter() - started
+        _timings.record(name, elapsed - writer.elapsed)
+        _timings.record("file-io", writer.elapsed)
+
+
+def timed_connect(connect: Callable) -> Callable:
+    """Wraps ncclient manager.connect to open the TCP connection separately so it's recorded as its own phase"""
+
+    @functools.wraps(connect)
+    def wrapper(*args, **kwargs):
+        if _timings is None or kwargs.get("sock") is not None or "host" not in kwargs:
+            return connect(*args, **kwargs)
+        with phase("tcp-connect"):
+            sock = socket.create_connection(
+                (kwargs["host"], kwargs.get("port", 830)), kwargs.get("timeout")
+            )
+        try:
+            return connect(*args, sock=sock, **kwargs)
+        except Exception:
+            sock.close()
+            raise
+
+    return wrapper
+
+
+def _timed_method(cls, method: str, callback: Callable) -> None:
+    original = getattr(cls, method, None)
+    if original is None:
+        return
+
+    @functools.wraps(original)
+    def wrapper(self, *args, **kwargs):
+        return callback(original, self, *args, **kwargs)
+
+    setattr(cls, method, wrapper)
+
+
+def _instrument_ncclient() -> None:
+    # ncclient has no hooks for the phases of a session, so the methods running them are wrapped once
+    # timings are enabled. Methods missing in other ncclient versions are not timed.
+    import paramiko
+    from ncclient.operations.rpc import RPC
+    from ncclient.transport.session import Session
+    from ncclient.transport.ssh import SSHSession
+
+    def _phase(name: str) -> Callable:
+        def callback(original, self, *args, **kwargs):
+            with phase(name):
+                return original(self, *args, **kwargs)
+
+        return callback
+
+    def _request(original, self, *args, **kwargs):
+        self._timings_sent = time.perf_counter()
+        return original(self, *args, **kwargs)
+
+    # Replies are delivered on the transport thread which also covers pipelined (async_mode) RPCs
+    def _deliver_reply(original, self, *args, **kwargs):
+        sent = getattr(self, "_timings_sent", None)
+        if sent is not None:
+            record("rpc", time.perf_counter() - sent)
+        return original(self, *args, **kwargs)
+
+    def _dispatch_message(original, self, raw, *args, **kwargs):
+        received(raw)
+        return original(self, raw, *args, **kwargs)
+
+    _timed_method(paramiko.Transport, "start_client", _phase("ssh-handshake"))
+    _timed_method(SSHSession, "_auth", _phase("ssh-auth"))
+    _timed_method(Session, "_post_connect", _phase("hello"))
+    _timed_method(Session, "_dispatch_message", _dispatch_message)
+    _timed_method(RPC, "_request", _request)
+    _timed_method(RPC, "deliver_reply", _deliver_reply)
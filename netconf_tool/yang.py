@@ -0,0 +1,94 @@
+import bisect
+import re
+from typing import List, Optional, Tuple
+
+# Quoted strings are matched as well so comment markers inside them (eg. URLs) are left alone
+_COMMENT_PATTERN = re.compile(
+    r"(\"(?:\\.|[^\"\\])*\"|'[^']*')|//[^\n]*|/\*.*?\*/", re.DOTALL
+)
+_LINKAGE_PATTERN = re.compile(
+    r"(?<![\w.-])(import|include)\s+[\"']?([A-Za-z_][\w.-]*)[\"']?\s*(?:;|\{([^}]*)\})"
+)
+_IDENTIFIER_STRING_PATTERN = re.compile(r"[\"'][\w.:-]*[\"']$")
+_REVISION_DATE_PATTERN = re.compile(r"revision-date\s+[\"']?(\d{4}-\d{2}-\d{2})[\"']?")
+
+
+def strip_yang_comments(schema: str) -> str:
+    """Returns the YANG module text without // and /* */ comments"""
+    return _COMMENT_PATTERN.sub(lambda match: match.group(1) or "", schema)
+
+
+def yang_dependencies(schema: str) -> List[Tuple[str, str, Optional[str]]]:
+    """Returns the import and include statements of a YANG module as (statement, module name, revision-date)
+
+    Args:
+        schema:     YANG module or submodule text
+    """
+    # Free text strings (descriptions, patterns...) could contain statements or braces
+    text = _COMMENT_PATTERN.sub(
+        lambda match: (
+            match.group(1)
+            if _IDENTIFIER_STRING_PATTERN.match(match.group(1) or "")
+            else ""
+        ),
+        schema,
+    )
+    dependencies = []
+    for match in _LINKAGE_PATTERN.finditer(text):
+        statement, name, body = match.groups()
+        revision = _REVISION_DATE_PATTERN.search(body) if body else None
+        dependencies.append((statement, name, revision.group(1) if revision else None))
+    return dependencies
+
+
+class ModuleIndex:
+    """Index of the YANG modules advertised by a NETCONF server
+
+    Modules are looked up by name (optionally with a revision), by namespace and by name prefix
+    using a sorted list of names.
+
+    Args:
+        modules:    Dictionary of modules keyed by module name as returned by build_module_index
+    """
+
+    def __init__(self, modules: dict):
+        self.modules = modules
+        self.names = sorted(modules)
+        self.by_namespace = {
+            module["namespace"]: name for name, module in modules.items()
+        }
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.modules
+
+    def __len__(self) -> int:
+        return len(self.modules)
+
+    def items(self):
+        return self.modules.items()
+
+    def get(self, name: str, revision: Optional[str] = None) -> Optional[dict]:
+        """Returns a module, None when it isn't advertised or is advertised with another revision"""
+        module = self.modules.get(name)
+        if module is None or (revision and module["revision"] != revision):
+            return None
+        return module
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Returns the module name of a module name, name@revision or namespace"""
+        name, _, revision = name.partition("@")
+        if self.get(name, revision or None):
+            return name
+        if not revision and name in self.by_namespace:
+            return self.by_namespace[name]
+        return None
+
+    def search(self, prefix: str, limit: int = None) -> List[str]:
+        """Returns the module names starting with prefix in alphabetical order"""
+        start = bisect.bisect_left(self.names, prefix)
+        matches = []
+        for name in self.names[start:]:
+            if not name.startswith(prefix) or (limit and len(matches) == limit):
+                break
+            matches.append(name)
+        return matches
@@ -1,9 +1,25 @@
-from netconf_tool.cli import cli
+import click
+from netconf_tool.lazy import LazyGroup
 
 
-@cli.group("yangcli")
+# Commands are imported once they are used
+@click.group(
+    "yangcli",
+    cls=LazyGroup,
+    lazy_subcommands={
+        "get-config": (
+            "netconf_tool.yangcli.get_config:netconf_tool_cli_yangcli_get_config",
+            "Print or Export the configuration selected by a...",
+        ),
+        "shell": (
+            "netconf_tool.yangcli.shell:netconf_tool_cli_yangcli_shell",
+            "Interactive yangcli shell which keeps one NETCONF...",
+        ),
+        "validate": (
+            "netconf_tool.yangcli.validate:netconf_tool_cli_yangcli_validate",
+            "Validates a CLI like command against the YANG...",
+        ),
+    },
+)
 def netconf_tool_cli_yangcli() -> None:
     """Attempts to build a dynamic XML payload based on a tradtional CLI input"""
-
-
-from netconf_tool.yangcli import get_config
@@ -1,19 +1,25 @@
 import click
-import json
-import xmltodict
 from ncclient import manager
 from ncclient.transport.errors import SSHError, AuthenticationError
 from loguru import logger
-from xml.dom import minidom
 from netconf_tool.yangcli import netconf_tool_cli_yangcli
-from netconf_tool.decorators import common_format_options, common_netconf_options
-from netconf_tool.helpers import build_xml_from_cli_commands
+from netconf_tool.broker.client import BrokerClient, BrokerError
+from netconf_tool.decorators import (
+    common_broker_options,
+    common_format_options,
+    common_netconf_options,
+    common_schema_tree_options,
+)
+from netconf_tool.streaming import export_data
+from netconf_tool.yangcli.paths import command_filter, complete_command
 
 
 @netconf_tool_cli_yangcli.command("get-config")
 @common_netconf_options
 @common_format_options
-@click.argument("command")
+@common_broker_options
+@common_schema_tree_options
+@click.argument("command", shell_complete=complete_command)
 @click.option(
     "--datastore",
     help="Specify which datastore to retrieve configuration from",
@@ -30,65 +36,73 @@ def netconf_tool_cli_yangcli_get_config(
     hostkey_verify: bool,
     command: str,
     datastore: str,
+    use_broker: bool,
+    broker_socket: str,
     format_json: bool,
     export_xml: str,
     export_json: str,
+    yang_dir: str,
+    cache_dir: str,
 ):
-    """Print or Export all NETCONF Server capabilities - note this command does not perform any validation and is just a test"""
-    filter = build_xml_from_cli_commands(command)
+    """Print or Export the configuration selected by a CLI like command, validated against the YANG modules of --yang-dir"""
+    try:
+        filter = command_filter(command, yang_dir, cache_dir, config_only=True)
+    except ValueError as err:
+        logger.error(f"Invalid command: {err}")
+        exit()
     if not filter:
         logger.error("Unable to build XML filter")
         exit()
 
     logger.debug(f"Filter that will be used for get-config: {filter}")
-    logger.info(f"Attempting to establish NETCONF session to {host}:{port}")
-
     try:
-        with manager.connect(
-            host=host,
-            port=port,
-            timeout=timeout,
-            username=username,
-            password=password,
-            device_params={"name": device_handler},
-            hostkey_verify=hostkey_verify,
-        ) as m:
-            logger.success(
-                f"Established NETCONF connection to {host}:{port} (Session ID: {m.session_id})"
-            )
-            configuration = m.get_config(source=datastore, filter=("subtree", filter))
-            xml_data = minidom.parseString(configuration.data_xml).toprettyxml(
-                indent=" ", newl=""
+        if use_broker:
+            data_xml = BrokerClient(broker_socket).get_config(
+                datastore=datastore,
+                filter=filter,
+                host=host,
+                port=port,
+                timeout=timeout,
+                username=username,
+                password=password,
+                device_handler=device_handler,
+                hostkey_verify=hostkey_verify,
             )
-
-            if export_xml:
-                with open(export_xml, "w") as out_file:
-                    out_file.write(xml_data)
+        else:
+            logger.info(f"Attempting to establish NETCONF session to {host}:{port}")
+            with manager.connect(
+                host=host,
+                port=port,
+                timeout=timeout,
+                username=username,
+                password=password,
+                device_params={"name": device_handler},
+                hostkey_verify=hostkey_verify,
+            ) as m:
                 logger.success(
-                    f"Exported get-config operation to {export_xml} in XML format"
+                    f"Established NETCONF connection to {host}:{port} (Session ID: {m.session_id})"
                 )
-                exit()
-
-            if export_json:
-                json_data = xmltodict.parse(xml_data)
-
-                with open(export_json, "w") as out_file:
-                    json.dump(json_data, out_file, indent=4)
-
-                logger.success(
-                    f"Exported get-config operation to {export_json} in JSON format"
+                configuration = m.get_config(
+                    source=datastore, filter=("subtree", filter)
                 )
-                exit()
-
-            if format_json:
-                json_data = xmltodict.parse(xml_data)
-                exit(json.dumps(json_data, indent=4))
-
-            exit(xml_data)
-
+                data_xml = configuration.data_xml
+    except BrokerError as err:
+        logger.error(err)
+        exit()
     except SSHError as err:
         logger.error(err)
+        exit()
     except AuthenticationError as err:
         logger.error("Unable to authenticate to NETCONF server")
+        exit()
     except Exception as err:
         logger.error(f"Generic Exception caught: {err}")
+        exit()
+
+    export_data(
+        data_xml,
+        operation="get-config",
+        format_json=format_json,
+        export_xml=export_xml,
+        export_json=export_json,
+    )
@@ -0,0 +1,50 @@
+import os
+from typing import Optional
+
+from netconf_tool.cache import DEFAULT_CACHE_DIR
+from netconf_tool.helpers import build_xml_from_cli_commands
+
+
+def command_filter(
+    command: str,
+    yang_dir: Optional[str] = None,
+    cache_dir: str = DEFAULT_CACHE_DIR,
+    config_only: bool = False,
+) -> str:
+    """Returns the subtree filter of a yangcli command, validated against the schema tree of yang_dir when
+    it is set and built without any validation otherwise
+
+    Args:
+        command:        CLI like command (eg. interfaces interface name=eth0 config)
+        yang_dir:       Directory of YANG modules
+        cache_dir:      Directory of the compiled schema tree
+        config_only:    Reject state data nodes
+
+    Raises:
+        ValueError: The command is not valid
+    """
+    if not yang_dir:
+        return build_xml_from_cli_commands(command)
+
+    from netconf_tool.schema import SchemaTree
+
+    return SchemaTree.load(yang_dir, cache_dir).build_filter(
+        command, config_only=config_only
+    )
+
+
+def complete_command(ctx, param, incomplete: str) -> list:
+    """click shell completion of the yangcli command argument using the schema tree of --yang-dir"""
+    yang_dir = ctx.params.get("yang_dir") or os.environ.get("NETCONF_TOOL_YANG_DIR")
+    if not yang_dir or not os.path.isdir(yang_dir):
+        return []
+
+    from netconf_tool.schema import SchemaTree
+
+    cache_dir = ctx.params.get("cache_dir") or os.environ.get(
+        "NETCONF_TOOL_CACHE_DIR", DEFAULT_CACHE_DIR
+    )
+    try:
+        return SchemaTree.load(yang_dir, cache_dir).complete(incomplete)
+    except Exception:
+        return []
@@ -0,0 +1,357 @@
+import cmd
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import click
+from ncclient import manager
+from ncclient.operations import RPCError
+from ncclient.transport.errors import SSHError, AuthenticationError, TransportError
+from loguru import logger
+from netconf_tool.yangcli import netconf_tool_cli_yangcli
+from netconf_tool.decorators import common_netconf_options, common_schema_tree_options
+from netconf_tool.helpers import build_xml_from_cli_commands
+from netconf_tool.streaming import export_data
+
+DATASTORES = ["running", "candidate"]
+
+
+class ResultCache:
+    """In memory cache of recent RPC replies keyed by operation, datastore and filter
+
+    Entries expire ttl seconds after the RPC and the least recently used entry is evicted once
+    there are more than max_entries, a ttl of 0 disables the cache.
+
+    Args:
+        ttl:            Seconds a reply is served from the cache
+        max_entries:    Maximum number of cached replies
+    """
+
+    def __init__(self, ttl: float = 30, max_entries: int = 128):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> Optional[Tuple[str, float]]:
+        """Returns the cached reply and its age in seconds, None when it isn't cached or expired"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            data_xml, created = entry
+            age = time.monotonic() - created
+            if age < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return data_xml, age
+            del self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: tuple, data_xml: str) -> None:
+        if not self.ttl:
+            return
+        self.entries[key] = (data_xml, time.monotonic())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class YangcliShell(cmd.Cmd):
+    """Interactive yangcli shell which keeps a single NETCONF session open for all commands
+
+    Args:
+        connect_options:    Keyword arguments of ncclient manager.connect
+        cache:              Cache of recent replies
+        schema:             SchemaTree used to validate commands and complete node names
+        datastore:          Datastore used by get-config
+        format_json:        Print replies as JSON instead of XML
+    """
+
+    identchars = cmd.Cmd.identchars + "-"
+
+    def __init__(
+        self,
+        connect_options: dict,
+        cache: ResultCache,
+        schema=None,
+        datastore: str = "running",
+        format_json: bool = False,
+    ):
+        super().__init__()
+        self.connect_options = connect_options
+        self.cache = cache
+        self.schema = schema
+        self.datastore = datastore
+        self.format_json = format_json
+        self.m = None
+        self.prompt = f"{connect_options['host']}> "
+
+    def connect(self) -> manager.Manager:
+        """Returns the NETCONF session, a new session is established when the previous one was lost"""
+        if self.m is not None and self.m.connected:
+            return self.m
+
+        host, port = self.connect_options["host"], self.connect_options["port"]
+        logger.info(f"Attempting to establish NETCONF session to {host}:{port}")
+        start = time.perf_counter()
+        self.m = manager.connect(**self.connect_options)
+        logger.success(
+            f"Established NETCONF connection to {host}:{port} (Session ID: {self.m.session_id}) in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+        return self.m
+
+    def close(self) -> None:
+        if self.m is not None and self.m.connected:
+            self.m.close_session()
+        self.m = None
+
+    # Commands may contain hyphens (get-config) while the methods use underscores
+    def parseline(self, line: str):
+        command, arg, line = super().parseline(line)
+        if command:
+            command = command.replace("-", "_")
+        return command, arg, line
+
+    def completenames(self, text: str, *ignored) -> list:
+        return [
+            name.replace("_", "-") for name in super().completenames(text, *ignored)
+        ]
+
+    def do_help(self, arg: str):
+        """List the available commands or show the help of a command"""
+        return super().do_help(arg.replace("-", "_"))
+
+    def emptyline(self):
+        # The default repeats the last command which would send the RPC again
+        pass
+
+    def default(self, line: str):
+        logger.error(
+            f"Unknown command {line.split()[0]}, type help for a list of commands"
+        )
+
+    def build_filter(self, command: str, config_only: bool) -> Optional[str]:
+        if not command:
+            logger.error(
+                "A CLI like command is required (eg. interfaces interface config)"
+            )
+            return None
+        try:
+            if self.schema is not None:
+                return self.schema.build_filter(command, config_only=config_only)
+            return build_xml_from_cli_commands(command)
+        except ValueError as err:
+            logger.error(f"Invalid command: {err}")
+            return None
+
+    def execute(self, operation: str, command: str) -> None:
+        """Sends the get or get-config RPC of a command unless the reply is cached and prints it"""
+        filter = self.build_filter(command, config_only=operation == "get-config")
+        if filter is None:
+            return
+
+        datastore = self.datastore if operation == "get-config" else None
+        key = (operation, datastore, filter)
+        cached = self.cache.get(key)
+        if cached is not None:
+            data_xml, age = cached
+            export_data(data_xml, operation, self.format_json, None, None)
+            logger.info(f"{operation} served from cache ({age:.1f}s old)")
+            return
+
+        logger.debug(f"Filter that will be used for {operation}: {filter}")
+        try:
+            m = self.connect()
+            start = time.perf_counter()
+            if operation == "get-config":
+                reply = m.get_config(source=datastore, filter=("subtree", filter))
+            else:
+                reply = m.get(filter=("subtree", filter))
+            latency = (time.perf_counter() - start) * 1000
+        except RPCError as err:
+            logger.error(f"{operation} failed: {err}")
+            return
+        except AuthenticationError as err:
+            logger.error("Unable to authenticate to NETCONF server")
+            return
+        except TransportError as err:
+            # Dropped so the next command establishes a new session
+            logger.error(err)
+            self.m = None
+            return
+        except Exception as err:
+            logger.error(f"Generic Exception caught: {err}")
+            return
+
+        data_xml = reply.data_xml
+        self.cache.put(key, data_xml)
+        export_data(data_xml, operation, self.format_json, None, None)
+        logger.info(f"{operation} took {latency:.1f} ms ({len(reply.xml)} bytes)")
+
+    def complete_node(self, text: str, line: str, begidx: int, endidx: int) -> list:
+        """Completes the node name being typed using the schema tree"""
+        if self.schema is None:
+            return []
+        _, _, command = line[:endidx].partition(" ")
+        completions = self.schema.complete(command.lstrip())
+        return [completion.rsplit(" ", 1)[-1] for completion in completions]
+
+    def do_get_config(self, arg: str):
+        """get-config <command>: Retrieve the configuration selected by a CLI like command from the current datastore"""
+        self.execute("get-config", arg)
+
+    complete_get_config = complete_node
+
+    def do_get(self, arg: str):
+        """get <command>: Retrieve the configuration and state data selected by a CLI like command"""
+        self.execute("get", arg)
+
+    complete_get = complete_node
+
+    def do_datastore(self, arg: str):
+        """datastore [running|candidate]: Show or change the datastore used by get-config"""
+        if not arg:
+            click.echo(self.datastore)
+        elif arg in DATASTORES:
+            self.datastore = arg
+        else:
+            logger.error(
+                f"Unsupported datastore {arg}, use one of {', '.join(DATASTORES)}"
+            )
+
+    def complete_datastore(self, text: str, *ignored) -> list:
+        return [datastore for datastore in DATASTORES if datastore.startswith(text)]
+
+    def do_format(self, arg: str):
+        """format [xml|json]: Show or change the format replies are printed in"""
+        if not arg:
+            click.echo("json" if self.format_json else "xml")
+        elif arg in ("xml", "json"):
+            self.format_json = arg == "json"
+        else:
+            logger.error(f"Unsupported format {arg}, use xml or json")
+
+    def do_cache(self, arg: str):
+        """cache [clear|ttl <seconds>]: Show the cache statistics, clear the cache or change the TTL of cached replies"""
+        action, _, value = arg.partition(" ")
+        if action == "clear":
+            self.cache.clear()
+        elif action == "ttl":
+            try:
+                self.cache.ttl = max(float(value), 0)
+            except ValueError:
+                logger.error(f"Invalid TTL {value}")
+        elif action:
+            logger.error(f"Unknown cache action {action}")
+        else:
+            click.echo(
+                f"entries={len(self.cache.entries)} hits={self.cache.hits} misses={self.cache.misses} ttl={self.cache.ttl:g}s"
+            )
+
+    def do_exit(self, arg: str):
+        """exit: Close the NETCONF session and leave the shell"""
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, arg: str):
+        click.echo()
+        return True
+
+
+@netconf_tool_cli_yangcli.command("shell")
+@common_netconf_options
+@common_schema_tree_options
+@click.option(
+    "--datastore",
+    help="Datastore used by get-config, can be changed in the shell with the datastore command",
+    type=click.Choice(DATASTORES),
+    default="running",
+)
+@click.option(
+    "--cache-ttl",
+    help="Seconds replies of recently used filters are served from memory, 0 disables the cache",
+    type=click.FloatRange(min=0),
+    default=30,
+    show_default=True,
+)
+@click.option(
+    "--format-json",
+    help="Print replies using xmltodict (JSON) instead of XML",
+    is_flag=True,
+)
+def netconf_tool_cli_yangcli_shell(
+    host: str,
+    port: int,
+    timeout: int,
+    username: str,
+    password: str,
+    device_handler: str,
+    hostkey_verify: bool,
+    yang_dir: str,
+    cache_dir: str,
+    datastore: str,
+    cache_ttl: float,
+    format_json: bool,
+):
+    """Interactive yangcli shell which keeps one NETCONF session open so commands run at RPC speed"""
+    schema = None
+    if yang_dir:
+        from netconf_tool.schema import SchemaTree
+
+        try:
+            schema = SchemaTree.load(yang_dir, cache_dir)
+        except ValueError as err:
+            logger.error(f"Unable to compile the YANG modules of {yang_dir}: {err}")
+            exit()
+
+    shell = YangcliShell(
+        connect_options={
+            "host": host,
+            "port": port,
+            "timeout": timeout,
+            "username": username,
+            "password": password,
+            "device_params": {"name": device_handler},
+            "hostkey_verify": hostkey_verify,
+        },
+        cache=ResultCache(ttl=cache_ttl),
+        schema=schema,
+        datastore=datastore,
+        format_json=format_json,
+    )
+    try:
+        shell.connect()
+    except SSHError as err:
+        logger.error(err)
+        exit()
+    except AuthenticationError as err:
+        logger.error("Unable to authenticate to NETCONF server")
+        exit()
+    except Exception as err:
+        logger.error(f"Generic Exception caught: {err}")
+        exit()
+
+    try:
+        import readline
+
+        # Node names contain hyphens, colons, @ and = which are completion delimiters by default
+        readline.set_completer_delims(" \t\n")
+    except ImportError:
+        pass
+
+    intro = "Type help for a list of commands"
+    try:
+        while True:
+            try:
+                shell.cmdloop(intro)
+                break
+            except KeyboardInterrupt:
+                click.echo("^C")
+                intro = ""
+    finally:
+        shell.close()
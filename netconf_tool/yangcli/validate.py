@@ -0,0 +1,34 @@
+import click
+from loguru import logger
+from netconf_tool.yangcli import netconf_tool_cli_yangcli
+from netconf_tool.decorators import common_schema_tree_options
+from netconf_tool.yangcli.paths import command_filter, complete_command
+
+
+@netconf_tool_cli_yangcli.command("validate")
+@common_schema_tree_options
+@click.argument("command", shell_complete=complete_command)
+@click.option(
+    "--config-only",
+    help="Reject state data (config false) nodes which are never returned by get-config",
+    is_flag=True,
+)
+def netconf_tool_cli_yangcli_validate(
+    yang_dir: str,
+    cache_dir: str,
+    command: str,
+    config_only: bool,
+):
+    """Validates a CLI like command against the YANG modules of --yang-dir and prints the subtree filter without connecting to a NETCONF server"""
+    if not yang_dir:
+        logger.error(
+            "--yang-dir (or NETCONF_TOOL_YANG_DIR) is required to validate commands"
+        )
+        exit()
+
+    try:
+        filter = command_filter(command, yang_dir, cache_dir, config_only=config_only)
+    except ValueError as err:
+        logger.error(f"Invalid command: {err}")
+        exit()
+    click.echo(filter)
@@ -19,6 +19,11 @@ setup(
         "pika>=1.3.1",
         "xmltodict>=0.13.0",
     ],
+    extras_require={
+        "msgpack": ["msgpack>=1.0.0"],
+        "zstd": ["zstandard>=0.19.0"],
+        "asyncio": ["asyncssh>=2.13.0"],
+    },
     entry_points="""
         [console_scripts]
         netconf-tool=netconf_tool.cli:cli